@@ -0,0 +1,375 @@
+// Clientside filtering mode for try.py (CLIENTSIDE_FILTERING=1). The server
+// ships the pre-aggregated cube once per data version into the cube-store;
+// filter and date-range changes are then answered here by rolling up that
+// cube, with the same rules as update_display. What the cube can't answer —
+// the first render of a view, which needs its figure layouts, or a change in
+// the set of traces — goes to the server through the view-request store.
+
+(function () {
+    // Digits table numbers are rounded to (table_query.ROUND_DIGITS), shipped
+    // with the cube
+    var roundDigits = 2;
+
+    // Halves to even, as numpy and pandas round
+    function round(value, digits) {
+        var scale = Math.pow(10, digits);
+        var scaled = value * scale;
+        var rounded = Math.round(scaled);
+        if (Math.abs(scaled % 1) === 0.5 && rounded % 2 !== 0) {
+            rounded -= 1;
+        }
+        return rounded / scale;
+    }
+
+    function sum(values) {
+        return values.reduce(function (total, value) { return total + value; }, 0);
+    }
+
+    function compare(a, b) {
+        return a < b ? -1 : a > b ? 1 : 0;
+    }
+
+    function quarterLabel(ordinal) {
+        return Math.floor(ordinal / 4) + ' Q' + (ordinal % 4 + 1);
+    }
+
+    // Cube rows matching the filters within slider positions [start, end]
+    function selectRows(cube, selections, start, end) {
+        var wanted = {};
+        Object.keys(selections).forEach(function (column) {
+            var values = selections[column];
+            if (!values || !values.length) {
+                return;
+            }
+            var categories = cube.categories[column];
+            wanted[column] = new Set(values.map(function (value) {
+                return categories.indexOf(value);
+            }));
+        });
+        var rows = [];
+        for (var i = 0; i < cube.positions.length; i++) {
+            if (cube.positions[i] < start || cube.positions[i] > end) {
+                continue;
+            }
+            var keep = true;
+            for (var column in wanted) {
+                if (!wanted[column].has(cube.codes[column][i])) {
+                    keep = false;
+                    break;
+                }
+            }
+            if (keep) {
+                rows.push(i);
+            }
+        }
+        return rows;
+    }
+
+    // Units per key over the selected rows; keys without projects are dropped,
+    // as in rollup and the prefix-sum tables
+    function rollup(cube, rows, key) {
+        var groups = new Map();
+        rows.forEach(function (i) {
+            var k = key(i);
+            var group = groups.get(k);
+            if (!group) {
+                group = {key: k, units: 0, projects: 0};
+                groups.set(k, group);
+            }
+            group.units += cube.units[i];
+            group.projects += cube.projects[i];
+        });
+        return Array.from(groups.values()).filter(function (group) { return group.projects > 0; });
+    }
+
+    function valueKind(value) {
+        return value === null || value === undefined || (typeof value === 'number' && isNaN(value)) ? null : typeof value;
+    }
+
+    // Columns and records laid out as table_query.table_columns and
+    // compact_records lay them out on the server: short ids c0, c1, ..., a type
+    // on numeric and text columns, and numbers rounded to roundDigits
+    function table(names, rows) {
+        var ids = names.map(function (name, i) { return 'c' + i; });
+        var columns = names.map(function (name, i) {
+            var kinds = new Set(rows.map(function (row) { return valueKind(row[i]); }));
+            kinds.delete(null);
+            var column = {name: String(name), id: ids[i]};
+            if (kinds.size === 1 && kinds.has('number')) {
+                column.type = 'numeric';
+            } else if (kinds.size === 0 || (kinds.size === 1 && kinds.has('string'))) {
+                column.type = 'text';
+            }
+            return column;
+        });
+        var data = rows.map(function (row) {
+            var record = {};
+            row.forEach(function (value, i) {
+                record[ids[i]] = typeof value === 'number' ? round(value, roundDigits) : value;
+            });
+            return record;
+        });
+        return {columns: columns, data: data};
+    }
+
+    function summaryTable(metrics, values) {
+        return table(['Metric', 'Value'], metrics.map(function (metric, i) { return [metric, values[i]]; }));
+    }
+
+    // Label x column pivot of (row, column, units) cells, missing cells as 0,
+    // plus each row as a percentage of its total
+    function pivotTables(indexName, rowKeys, columnKeys, cells) {
+        var main = [], percentage = [];
+        rowKeys.forEach(function (rowKey) {
+            var values = columnKeys.map(function (columnKey) {
+                var cell = cells.get(rowKey + '\u0000' + columnKey);
+                return cell === undefined ? 0 : cell;
+            });
+            var total = sum(values);
+            main.push([rowKey].concat(values));
+            percentage.push([rowKey].concat(values.map(function (value) {
+                return total ? round(value / total * 100, 2) : null;
+            })));
+        });
+        var names = [indexName].concat(columnKeys);
+        return [table(names, main), table(names, percentage)];
+    }
+
+    function firstIndex(values, better) {
+        var best = 0;
+        for (var i = 1; i < values.length; i++) {
+            if (better(values[i], values[best])) {
+                best = i;
+            }
+        }
+        return best;
+    }
+
+    // Group totals largest first, and the extremes the summary tables report
+    function ranked(groups) {
+        return groups.slice().sort(function (a, b) { return compare(a.key, b.key); })
+            .sort(function (a, b) { return b.units - a.units; });
+    }
+
+    function lastPositive(groups) {
+        var positive = groups.filter(function (group) { return group.units > 0; });
+        return positive[positive.length - 1];
+    }
+
+    // One trace per member, in sorted member order, as px draws color groups
+    function groupTraces(cells, member, x) {
+        var traces = [], byMember = new Map();
+        cells.forEach(function (cell) {
+            var name = member(cell);
+            var trace = byMember.get(name);
+            if (!trace) {
+                trace = {name: name, x: [], y: []};
+                byMember.set(name, trace);
+                traces.push(trace);
+            }
+            trace.x.push(x(cell));
+            trace.y.push(cell.units);
+        });
+        return traces;
+    }
+
+    var VIEWS = {
+        QUARTERLY: function (cube, rows) {
+            var cells = rollup(cube, rows, function (i) { return cube.quarters[cube.positions[i]]; })
+                .sort(function (a, b) { return a.key - b.key; });
+            if (!cells.length) {
+                return null;
+            }
+            var labels = cells.map(function (cell) { return quarterLabel(cell.key); });
+            var years = Array.from(new Set(cells.map(function (cell) { return Math.floor(cell.key / 4); })));
+            var quarters = Array.from(new Set(cells.map(function (cell) { return 'Q' + (cell.key % 4 + 1); }))).sort();
+            var pivot = new Map();
+            cells.forEach(function (cell) {
+                pivot.set(Math.floor(cell.key / 4) + '\u0000Q' + (cell.key % 4 + 1), cell.units);
+            });
+            var tables = pivotTables('Year', years, quarters, pivot);
+
+            var units = cells.map(function (cell) { return cell.units; });
+            var total = sum(units);
+            var max = firstIndex(units, function (a, b) { return a > b; });
+            var min = firstIndex(units, function (a, b) { return a < b; });
+            var summary = summaryTable(
+                ['Total Units', 'Average Units per Quarter', 'Quarter with Max Units', 'Max Units', 'Quarter with Min Units', 'Min Units'],
+                [total, round(total / units.length, 2), labels[max], units[max], labels[min], units[min]]
+            );
+            var trace = [{x: labels, y: units}];
+            return {tables: [summary].concat(tables), figures: [trace, trace, trace]};
+        },
+
+        DEVELOPER: function (cube, rows) {
+            var names = cube.categories['Developer Name'];
+            var developers = ranked(rollup(cube, rows, function (i) { return names[cube.codes['Developer Name'][i]]; }));
+            if (!developers.length) {
+                return null;
+            }
+            var total = sum(developers.map(function (group) { return group.units; }));
+            var top = developers.slice(0, 20);
+            var topTotal = sum(top.map(function (group) { return group.units; }));
+            var min = lastPositive(developers);
+            var summary = summaryTable(
+                ['Total Units', 'Total Developers', 'Total Units (Top 20 Developers)', 'Percentage of Units (Top 20 Developers)',
+                 'Developer with Max Units', 'Max Units', 'Developer with Min Units', 'Min Units'],
+                [total, developers.length, topTotal, (topTotal / total * 100).toFixed(2) + '%',
+                 developers[0].key, developers[0].units, min.key, min.units]
+            );
+
+            var shown = top.map(function (group) {
+                return {name: group.key, units: group.units, percentage: round(group.units / total * 100, 2)};
+            });
+            var other = total - topTotal;
+            shown.push({name: 'Other Developers', units: other, percentage: round(other / total * 100, 2)});
+            var main = table(['Developer Name', 'Total no. of units', 'Percentage'], shown.map(function (row) {
+                return [row.name, row.units, row.percentage];
+            }));
+
+            var labels = shown.map(function (row) { return row.name; });
+            var units = shown.map(function (row) { return row.units; });
+            var percentages = shown.map(function (row) { return row.percentage; });
+            return {
+                tables: [summary, main, null],
+                figures: [
+                    [{x: labels, y: units}, {x: labels, y: percentages}],
+                    [{x: units, y: labels}],
+                    [{labels: labels, values: units}]
+                ]
+            };
+        },
+
+        AREA_QUARTERLY: function (cube, rows) {
+            var areas = cube.categories.Area;
+            var cells = rollup(cube, rows, function (i) {
+                return cube.codes.Area[i] + ':' + cube.positions[i];
+            }).map(function (group) {
+                var parts = group.key.split(':');
+                var ordinal = cube.quarters[Number(parts[1])];
+                return {area: areas[Number(parts[0])], ordinal: ordinal, label: quarterLabel(ordinal), units: group.units};
+            }).sort(function (a, b) { return compare(a.area, b.area) || a.ordinal - b.ordinal; });
+            if (!cells.length) {
+                return null;
+            }
+            var names = Array.from(new Set(cells.map(function (cell) { return cell.area; })));
+            var labels = Array.from(new Set(cells.map(function (cell) { return cell.label; }))).sort();
+            var pivot = new Map();
+            cells.forEach(function (cell) { pivot.set(cell.area + '\u0000' + cell.label, cell.units); });
+            var tables = pivotTables('Area', names, labels, pivot);
+
+            var totals = ranked(names.map(function (name) {
+                return {key: name, units: sum(cells.filter(function (cell) { return cell.area === name; })
+                    .map(function (cell) { return cell.units; }))};
+            }));
+            var min = lastPositive(totals);
+            var summary = summaryTable(
+                ['Total Units', 'Total Areas', 'Area with Max Units', 'Max Units', 'Area with Min Units', 'Min Units'],
+                [sum(cells.map(function (cell) { return cell.units; })), names.length,
+                 totals[0].key, totals[0].units, min.key, min.units]
+            );
+            var traces = groupTraces(cells, function (cell) { return cell.area; }, function (cell) { return cell.label; });
+            return {tables: [summary].concat(tables), figures: [traces, traces, traces]};
+        },
+
+        ASSET_YEARLY: function (cube, rows) {
+            var assets = cube.categories['Asset Type'];
+            var cells = rollup(cube, rows, function (i) {
+                return cube.codes['Asset Type'][i] + ':' + Math.floor(cube.quarters[cube.positions[i]] / 4);
+            }).map(function (group) {
+                var parts = group.key.split(':');
+                return {asset: assets[Number(parts[0])], year: Number(parts[1]), units: group.units};
+            }).sort(function (a, b) { return compare(a.asset, b.asset) || a.year - b.year; });
+            if (!cells.length) {
+                return null;
+            }
+            var names = Array.from(new Set(cells.map(function (cell) { return cell.asset; })));
+            var years = Array.from(new Set(cells.map(function (cell) { return cell.year; }))).sort(function (a, b) { return a - b; });
+            var pivot = new Map();
+            cells.forEach(function (cell) { pivot.set(cell.asset + '\u0000' + cell.year, cell.units); });
+            var tables = pivotTables('Asset Type', names, years, pivot);
+
+            var totals = ranked(names.map(function (name) {
+                return {key: name, units: sum(cells.filter(function (cell) { return cell.asset === name; })
+                    .map(function (cell) { return cell.units; }))};
+            }));
+            var min = totals[totals.length - 1];
+            var summary = summaryTable(
+                ['Total Units', 'Total Asset Types', 'Asset Type with Max Units', 'Max Units', 'Asset Type with Min Units', 'Min Units'],
+                [sum(cells.map(function (cell) { return cell.units; })), names.length,
+                 totals[0].key, totals[0].units, min.key, min.units]
+            );
+            var traces = groupTraces(cells, function (cell) { return cell.asset; }, function (cell) { return cell.year; });
+            return {tables: [summary].concat(tables), figures: [traces, traces, traces]};
+        }
+    };
+
+    // The view's tables and trace data, or undefined when the cube can't answer
+    function computeView(cube, view, areas, developers, assetTypes, dateRange) {
+        if (!cube || !VIEWS[view] || !dateRange) {
+            return undefined;
+        }
+        if (cube.round_digits !== undefined) {
+            roundDigits = cube.round_digits;
+        }
+        var rows = selectRows(cube, {'Area': areas, 'Developer Name': developers, 'Asset Type': assetTypes},
+                              dateRange[0], dateRange[1]);
+        return VIEWS[view](cube, rows);
+    }
+
+    // New data for a figure the browser already shows, when its traces line up
+    // with the computed ones; otherwise undefined
+    function updateFigure(shown, traces) {
+        if (!shown || !shown.data || shown.data.length !== traces.length) {
+            return undefined;
+        }
+        for (var i = 0; i < traces.length; i++) {
+            if (traces[i].name !== undefined && shown.data[i].name !== traces[i].name) {
+                return undefined;
+            }
+        }
+        return Object.assign({}, shown, {
+            data: shown.data.map(function (trace, i) {
+                var update = Object.assign({}, traces[i]);
+                delete update.name;
+                return Object.assign({}, trace, update);
+            })
+        });
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        cube: {
+            // Outputs: message, body style, table data x3, table columns x3,
+            // figures x3, view-request
+            render: function (viewState, areas, developers, assetTypes, dateRange, cube,
+                              figure1, figure2, figure3, pending) {
+                var noUpdate = window.dash_clientside.no_update;
+                var unchanged = Array(3 + 3 + 3).fill(noUpdate);
+                var view = viewState && viewState.view;
+                var request = {view: view, areas: areas, developers: developers, asset_types: assetTypes, date_range: dateRange};
+                var serverSide = [noUpdate, noUpdate].concat(unchanged, [request]);
+
+                var result = computeView(cube, view, areas, developers, assetTypes, dateRange);
+                if (result === undefined) {
+                    return serverSide;
+                }
+                // Answered here; clearing a pending request makes Dash drop its
+                // late response instead of drawing it over this one
+                var cleared = pending ? null : noUpdate;
+                if (result === null) {
+                    return ['No data available for the selected filters.', {display: 'none'}].concat(unchanged, [cleared]);
+                }
+
+                var figures = [figure1, figure2, figure3].map(function (shown, i) {
+                    return updateFigure(shown, result.figures[i]);
+                });
+                if (figures.indexOf(undefined) !== -1) {
+                    return serverSide;
+                }
+                var data = result.tables.map(function (table) { return table ? table.data : noUpdate; });
+                var columnDefs = result.tables.map(function (table) { return table ? table.columns : noUpdate; });
+                return [null, null].concat(data, columnDefs, figures, [cleared]);
+            }
+        }
+    });
+})();
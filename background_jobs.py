@@ -0,0 +1,89 @@
+import functools
+import os
+import tempfile
+
+import dash
+
+from metrics import phase_listener
+from result_store import RESULT_STORE_DIR
+
+try:
+    import diskcache
+except ImportError:
+    # Background jobs need dash[diskcache] (see requirements.txt)
+    diskcache = None
+
+# Heavy callbacks as background jobs. With BACKGROUND_CALLBACKS=1 dashboard
+# renders estimated to read BACKGROUND_MIN_ROWS rows or more run in a process
+# Dash's DiskcacheManager starts per job, the result handed back through a
+# diskcache directory on local disk, so no broker is involved. The request
+# thread returns at once and the browser polls for progress and the result;
+# when the callback is triggered again while its job is still running, Dash
+# terminates the old job. Cheaper renders and cache hits are answered on the
+# request thread as usual. Jobs need the result store (result_store.py,
+# RESULT_STORE_DIR) so the other callbacks reading the same view find what the
+# job computed instead of computing it again.
+
+BACKGROUND_CALLBACKS = os.environ.get('BACKGROUND_CALLBACKS', '0') == '1'
+BACKGROUND_JOBS_DIR = os.environ.get('BACKGROUND_JOBS_DIR', os.path.join(tempfile.gettempdir(), 'dashboard-jobs'))
+# How often the browser asks for progress and the result
+BACKGROUND_POLL_MS = int(os.environ.get('BACKGROUND_POLL_MS', 500))
+# Renders reading fewer rows than this, and cached ones, stay on the request
+# thread: starting a job process and polling for it costs more than they do
+BACKGROUND_MIN_ROWS = int(os.environ.get('BACKGROUND_MIN_ROWS', 200_000))
+
+
+def job_manager(name):
+    # The manager for one app's jobs, or None when jobs are off
+    if not BACKGROUND_CALLBACKS:
+        return None
+    if diskcache is None:
+        raise RuntimeError('BACKGROUND_CALLBACKS=1 needs diskcache, multiprocess and psutil installed')
+    if not RESULT_STORE_DIR:
+        # A job's result would stay in its own process's cache, and every
+        # callback reading the view (page_table, zoom) would recompute it on the
+        # request thread
+        raise RuntimeError('BACKGROUND_CALLBACKS=1 needs RESULT_STORE_DIR set (gunicorn.conf.py sets it)')
+    return dash.DiskcacheManager(diskcache.Cache(os.path.join(BACKGROUND_JOBS_DIR, name)))
+
+
+def job_options(manager, progress, running, cancel=None):
+    # app.callback keywords running the callback as a job on `manager`; none
+    # when jobs are off, so it runs in the request thread as before. A change
+    # to any `cancel` input terminates the running job.
+    if manager is None:
+        return {}
+    return {'background': True, 'manager': manager, 'progress': progress, 'running': running,
+            'cancel': cancel, 'interval': BACKGROUND_POLL_MS}
+
+
+def runs_as_job(manager, rows, cached):
+    # Whether a render reading `rows` rows (`cached`: already computed) is
+    # worth a job
+    return manager is not None and not cached and rows >= BACKGROUND_MIN_ROWS
+
+
+def reporting_progress(manager, steps, describe):
+    # Dash passes a job with progress outputs its set_progress first. The job
+    # reports (done, total, describe(done, total)) for those outputs, advancing
+    # one step per phase the instrumented callbacks it calls complete;
+    # steps(*args) is how many phases a full computation goes through.
+    def decorator(func):
+        if manager is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(set_progress, *args):
+            total = steps(*args)
+            done = 0
+
+            def advance(phase):
+                nonlocal done
+                done = min(done + 1, total)
+                set_progress((done, total, describe(done, total)))
+
+            set_progress((0, total, describe(0, total)))
+            with phase_listener(advance):
+                return func(*args)
+        return wrapper
+    return decorator
@@ -0,0 +1,541 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+# Load generator for a running dashboard. Virtual analysts replay filter
+# sessions (view switches, area and developer picks, slider drags, table
+# paging) as the browser would: one _dash-update-component POST per callback
+# the interaction fires, with the stores the previous responses set. Run from
+# the repository root against a local instance:
+#
+#   python -m benchmarks.loadtest --url http://127.0.0.1:10000 --users 16 --duration 60
+#   python -m benchmarks.loadtest --app demo --url http://127.0.0.1:8050
+#   python -m benchmarks.loadtest --launch "gunicorn -c gunicorn.conf.py wsgi:server" --output after.json --compare before.json
+#
+# Sessions are synthesized from the options the app's layout offers, or read
+# from a JSONL file (--sessions), one session per line: a list of steps, each
+# the complete control state after one interaction, e.g.
+#
+#   [{"action": "view", "view": "DEVELOPER", "areas": null, "developers": null,
+#     "asset_types": null, "date_range": [0, 11], "page": 0, "sort_by": []}, ...]
+#   [{"action": "graphs", "graphs": ["handover_area", "total_units_area"]}, ...]
+#
+# --save-sessions writes the synthesized sessions in that format, so a later
+# run (after an optimisation) replays exactly the same traffic. Memory is read
+# from /proc for the server process and its children (the gunicorn workers).
+
+VIEWS = ['QUARTERLY', 'DEVELOPER', 'AREA_QUARTERLY', 'ASSET_YEARLY']
+# How often each interaction occurs in a synthesized try.py session
+TRY_ACTIONS = {'view': 2, 'areas': 3, 'developers': 2, 'asset_types': 1, 'slider': 3, 'page': 2, 'sort': 1,
+               'reset': 1, 'poll': 1}
+
+
+class DashClient:
+    # One analyst's connection: a keep-alive HTTP session to the app
+
+    def __init__(self, url, timeout):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate, br'
+
+    def get_json(self, path):
+        response = self.session.get(self.url + path, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def update(self, body):
+        # (status, response JSON or None, seconds)
+        started = time.perf_counter()
+        response = self.session.post(self.url + '/_dash-update-component', json=body, timeout=self.timeout)
+        elapsed = time.perf_counter() - started
+        payload = response.json() if response.status_code == 200 else None
+        return response.status_code, payload, elapsed
+
+
+def _component_id(text):
+    return json.loads(text) if text.startswith('{') else text
+
+
+def _concrete(component_id, index):
+    # Pattern-matching ids with the wildcard filled in
+    if isinstance(component_id, dict):
+        return {key: index if value in (['MATCH'], ['ALL']) else value for key, value in component_id.items()}
+    return component_id
+
+
+def _id_key(component_id):
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+    return component_id
+
+
+class Callback:
+    # A callback from /_dash-dependencies and the request bodies that call it
+
+    def __init__(self, dependency):
+        self.key = dependency['output']
+        self.outputs = [tuple(output.rsplit('.', 1)) for output in self.key.strip('.').split('...')]
+        self.inputs = [(_component_id(item['id']) if isinstance(item['id'], str) else item['id'], item['property'])
+                       for item in dependency['inputs']]
+        self.state = [(_component_id(item['id']) if isinstance(item['id'], str) else item['id'], item['property'])
+                      for item in dependency['state']]
+
+    def body(self, values, index=None):
+        # `values` maps property names (or (id, property) for ambiguous ones) to values
+        def entries(specs):
+            result = []
+            for component_id, prop in specs:
+                concrete = _concrete(component_id, index)
+                value = values.get((_id_key(concrete), prop), values.get(prop))
+                result.append({'id': concrete, 'property': prop, 'value': value})
+            return result
+        inputs = entries(self.inputs)
+        outputs = [{'id': _concrete(_component_id(component_id), index), 'property': prop}
+                   for component_id, prop in self.outputs]
+        return {
+            'output': self.key,
+            # Single-output callbacks take the output spec itself, not a list
+            'outputs': outputs if self.key.startswith('..') else outputs[0],
+            'inputs': inputs,
+            'state': entries(self.state),
+            'changedPropIds': [f"{_id_key(item['id'])}.{item['property']}" for item in inputs],
+        }
+
+
+def find_callback(dependencies, output_prefix):
+    for dependency in dependencies:
+        if dependency['output'].strip('.').startswith(output_prefix):
+            return Callback(dependency)
+    return None
+
+
+def find_component(tree, component_id):
+    # Props of the component with `component_id` in a /_dash-layout tree
+    if isinstance(tree, list):
+        for child in tree:
+            found = find_component(child, component_id)
+            if found is not None:
+                return found
+    elif isinstance(tree, dict):
+        props = tree.get('props')
+        if props is not None:
+            if props.get('id') == component_id:
+                return props
+            return find_component(props.get('children'), component_id)
+    return None
+
+
+def option_values(layout, component_id):
+    props = find_component(layout, component_id) or {}
+    return [option['value'] if isinstance(option, dict) else option for option in props.get('options') or []]
+
+
+# Synthesized sessions
+
+
+def _subset(rng, values, low, high):
+    return sorted(rng.sample(values, min(len(values), rng.randint(low, high)))) if values else None
+
+
+def synthesize_try_sessions(layout, n_sessions, steps, seed):
+    rng = random.Random(seed)
+    areas = option_values(layout, 'area-filter-dropdown')
+    developers = option_values(layout, 'developer-filter-dropdown')
+    asset_types = option_values(layout, 'asset-type-dropdown')
+    slider = find_component(layout, 'date-range-slider') or {'max': 0}
+    last = slider['max']
+    actions, weights = zip(*TRY_ACTIONS.items())
+    sessions = []
+    for _ in range(n_sessions):
+        state = {'view': 'QUARTERLY', 'areas': None, 'developers': None, 'asset_types': None,
+                 'date_range': [0, last], 'page': 0, 'sort_by': []}
+        # Opening the page renders the default view
+        session = [dict(state, action='load')]
+        while len(session) < steps:
+            action = rng.choices(actions, weights)[0]
+            if action == 'slider':
+                # A drag is a run of releases nudging one handle a quarter at a time
+                handle = rng.randint(0, 1)
+                for _ in range(rng.randint(2, 5)):
+                    low, high = state['date_range']
+                    if handle == 0:
+                        low = max(0, min(high, low + rng.choice([-1, 1])))
+                    else:
+                        high = min(last, max(low, high + rng.choice([-1, 1])))
+                    state = dict(state, date_range=[low, high], page=0)
+                    session.append(dict(state, action='slider'))
+                continue
+            if action == 'view':
+                state = dict(state, view=rng.choice([view for view in VIEWS if view != state['view']]),
+                             page=0, sort_by=[])
+            elif action == 'areas':
+                state = dict(state, areas=_subset(rng, areas, 0, 3), page=0)
+            elif action == 'developers':
+                state = dict(state, developers=_subset(rng, developers, 0, 5), page=0)
+            elif action == 'asset_types':
+                state = dict(state, asset_types=_subset(rng, asset_types, 0, 2), page=0)
+            elif action == 'reset':
+                # Starting over: filters cleared, the whole date range again
+                state = dict(state, areas=[], developers=[], asset_types=[], date_range=[0, last], page=0)
+            elif action == 'page':
+                state = dict(state, page=state['page'] + 1)
+            elif action == 'sort':
+                state = dict(state, sort_by=[{'column_id': f'c{rng.randint(0, 1)}',
+                                              'direction': rng.choice(['asc', 'desc'])}], page=0)
+            session.append(dict(state, action=action))
+        sessions.append(session[:steps])
+    return sessions
+
+
+def synthesize_demo_sessions(layout, n_sessions, steps, seed):
+    # Analysts add graphs one or a few at a time and now and then start over
+    rng = random.Random(seed)
+    graphs = option_values(layout, 'graph-selector')
+    sessions = []
+    for _ in range(n_sessions):
+        selected = []
+        session = []
+        for _ in range(steps):
+            if selected and rng.random() < 0.15:
+                selected = []
+            elif selected and rng.random() < 0.25:
+                selected = [graph for graph in selected if graph != rng.choice(selected)]
+            else:
+                remaining = [graph for graph in graphs if graph not in selected]
+                selected = selected + rng.sample(remaining, min(len(remaining), rng.randint(1, 3)))
+            session.append({'action': 'graphs', 'graphs': list(selected)})
+        sessions.append(session)
+    return sessions
+
+
+# Replaying steps as the callbacks they fire
+
+
+class TryApp:
+
+    def __init__(self, dependencies, layout):
+        self.render = find_callback(dependencies, 'display-container.children')
+        self.refresh = find_callback(dependencies, 'view-message.children')
+        self.page = find_callback(dependencies, '{"index":["MATCH"],"type":"paged-table"}.data')
+        self.sync = find_callback(dependencies, 'area-filter-dropdown.options')
+        if self.refresh is None:
+            raise SystemExit('No refresh_view callback: the app runs with CLIENTSIDE_FILTERING, '
+                             'where filter changes are answered in the browser')
+        version = find_component(layout, 'data-version') or {}
+        self.loaded_version = version.get('data')
+        table = find_component(layout, {'type': 'paged-table', 'index': 'main'}) or {}
+        self.page_size = table.get('page_size', 25)
+
+    def new_session(self):
+        return {'signature': None, 'n_intervals': 0}
+
+    def requests(self, step, session):
+        # (label, body, on_response) for each callback the step fires
+        controls = {
+            'data': {'view': step['view']},
+            ('area-filter-dropdown', 'value'): step['areas'],
+            ('developer-filter-dropdown', 'value'): step['developers'],
+            ('asset-type-dropdown', 'value'): step['asset_types'],
+            ('date-range-slider', 'value'): step['date_range'],
+        }
+        action = step['action']
+        if action == 'poll':
+            session['n_intervals'] += 1
+            yield 'sync_controls', self.sync.body({
+                'n_intervals': session['n_intervals'],
+                ('data-version', 'data'): self.loaded_version,
+                ('date-range-slider', 'value'): step['date_range'],
+            }), None
+            return
+        if action in ('load', 'view'):
+            # A fresh skeleton starts with an empty signature store
+            session['signature'] = None
+        if action == 'view':
+            yield 'render_view', self.render.body({'value': step['view']}), None
+        if action not in ('page', 'sort'):
+            def keep_signature(payload):
+                signature = payload['response'].get('view-signature')
+                session['signature'] = signature['data'] if signature else None
+            yield 'refresh_view', self.refresh.body({**controls, ('view-signature', 'data'): session['signature']}), keep_signature
+        tables = ['main'] if action in ('page', 'sort') else ['main', 'percentage']
+        for name in tables:
+            table_id = _id_key({'type': 'paged-table', 'index': name})
+            paging = {
+                (table_id, 'page_current'): step['page'] if name == 'main' else 0,
+                (table_id, 'page_size'): self.page_size,
+                (table_id, 'sort_by'): step['sort_by'] if name == 'main' else [],
+                (table_id, 'filter_query'): '',
+                (table_id, 'id'): {'type': 'paged-table', 'index': name},
+            }
+            yield 'page_table', self.page.body({**controls, **paging}, index=name), None
+
+
+class DemoApp:
+
+    def __init__(self, dependencies, layout):
+        self.update = find_callback(dependencies, 'graph-container.children')
+
+    def new_session(self):
+        return {}
+
+    def requests(self, step, session):
+        yield 'update_graphs', self.update.body({'value': step['graphs']}), None
+
+
+# Running the load
+
+
+def proc_children(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as fh:
+                children.extend(int(child) for child in fh.read().split())
+        except OSError:
+            continue
+    return children
+
+
+def process_rss(pid):
+    # Resident memory in bytes of `pid` and each of its descendants
+    rss = {}
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as fh:
+                for line in fh:
+                    if line.startswith('VmRSS:'):
+                        rss[current] = int(line.split()[1]) * 1024
+            pending.extend(proc_children(current))
+        except OSError:
+            continue
+    return rss
+
+
+class MemoryMonitor(threading.Thread):
+    # Samples the server's RSS per process every `interval` seconds
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.first, self.last, self.peak = {}, {}, {}
+        self._stopped = threading.Event()
+
+    def sample(self):
+        for pid, rss in process_rss(self.pid).items():
+            self.first.setdefault(pid, rss)
+            self.last[pid] = rss
+            self.peak[pid] = max(self.peak.get(pid, 0), rss)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.sample()
+
+    def report(self):
+        return {
+            str(pid): {'start_mb': self.first[pid] / 2**20, 'end_mb': self.last[pid] / 2**20,
+                       'peak_mb': self.peak[pid] / 2**20, 'growth_mb': (self.last[pid] - self.first[pid]) / 2**20}
+            for pid in sorted(self.first)
+        }
+
+
+def run_user(app, url, sessions, next_session, deadline, think_time, timeout, records):
+    client = DashClient(url, timeout)
+    rng = random.Random()
+    while time.monotonic() < deadline:
+        session = next_session()
+        if session is None:
+            return
+        state = app.new_session()
+        for step in session:
+            for label, body, on_response in app.requests(step, state):
+                if time.monotonic() >= deadline:
+                    return
+                try:
+                    status, payload, elapsed = client.update(body)
+                except requests.RequestException as error:
+                    records.append((label, None, 0.0, type(error).__name__))
+                    continue
+                # 204 is a callback raising PreventUpdate: a successful no-op
+                ok = status in (200, 204)
+                records.append((label, status, elapsed, None if ok else f'HTTP {status}'))
+                if status == 200 and on_response is not None:
+                    on_response(payload)
+            if think_time:
+                time.sleep(rng.uniform(0, 2 * think_time))
+
+
+def run_load(app, url, sessions, users, duration, max_sessions, think_time, timeout):
+    lock = threading.Lock()
+    counter = iter(range(max_sessions)) if max_sessions else itertools.count()
+
+    def next_session():
+        # Sessions are handed out round-robin until --max-sessions or the deadline
+        with lock:
+            number = next(counter, None)
+        return None if number is None else sessions[number % len(sessions)]
+
+    deadline = time.monotonic() + duration
+    records = []
+    threads = [
+        threading.Thread(target=run_user, args=(app, url, sessions, next_session, deadline, think_time, timeout, records))
+        for _ in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, time.perf_counter() - started
+
+
+def summarize(records, elapsed):
+    def stats(entries):
+        latencies = np.array([entry[2] for entry in entries if entry[3] is None])
+        errors = sum(1 for entry in entries if entry[3] is not None)
+        summary = {'requests': len(entries), 'errors': errors,
+                   'error_rate': errors / len(entries) if entries else 0.0,
+                   'throughput_rps': len(entries) / elapsed if elapsed else 0.0}
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            summary.update(p50_ms=p50, p95_ms=p95, p99_ms=p99, max_ms=latencies.max() * 1000)
+        return summary
+
+    by_label = {}
+    for record in records:
+        by_label.setdefault(record[0], []).append(record)
+    errors = {}
+    for record in records:
+        if record[3] is not None:
+            errors[record[3]] = errors.get(record[3], 0) + 1
+    return {'overall': stats(records), 'callbacks': {label: stats(entries) for label, entries in sorted(by_label.items())},
+            'error_kinds': errors, 'elapsed_s': elapsed}
+
+
+def print_report(report, previous=None):
+    columns = ['requests', 'throughput_rps', 'error_rate', 'p50_ms', 'p95_ms', 'p99_ms']
+    print(f"{'callback':<20}" + ''.join(f'{column:>16}' for column in columns))
+    rows = [('overall', report['summary']['overall'])] + list(report['summary']['callbacks'].items())
+    for label, stats in rows:
+        print(f'{label:<20}' + ''.join(
+            f"{stats.get(column, float('nan')):>16.{0 if column == 'requests' else 3}f}" for column in columns
+        ))
+    if report['summary']['error_kinds']:
+        print('errors:', ', '.join(f'{kind} x{count}' for kind, count in report['summary']['error_kinds'].items()))
+    for pid, memory in report.get('memory', {}).items():
+        print(f"pid {pid}: {memory['start_mb']:.1f} MB -> {memory['end_mb']:.1f} MB "
+              f"(peak {memory['peak_mb']:.1f} MB, growth {memory['growth_mb']:+.1f} MB)")
+    if previous is not None:
+        before, after = previous['summary']['overall'], report['summary']['overall']
+        print(f"vs previous: throughput {after['throughput_rps'] / before['throughput_rps']:.2f}x, "
+              f"p95 {after.get('p95_ms', float('nan')) / before.get('p95_ms', float('nan')):.2f}x, "
+              f"error rate {before['error_rate']:.3%} -> {after['error_rate']:.3%}")
+
+
+def wait_until_ready(url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'Server exited with code {process.returncode} before becoming ready')
+        try:
+            if requests.get(url, timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f'Server at {url} not ready after {timeout}s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay analyst filter sessions against a running dashboard.')
+    parser.add_argument('--url', default='http://127.0.0.1:10000')
+    parser.add_argument('--app', choices=['try', 'demo'], default='try')
+    parser.add_argument('--users', type=int, default=8, help='concurrent analysts')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run for')
+    parser.add_argument('--max-sessions', type=int, default=0, help='stop after this many sessions (0: no limit)')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause between interactions, seconds')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--sessions', help='JSONL file of recorded sessions to replay')
+    parser.add_argument('--save-sessions', help='write the synthesized sessions to this JSONL file')
+    parser.add_argument('--n-sessions', type=int, default=50)
+    parser.add_argument('--steps', type=int, default=20, help='interactions per synthesized session')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pid', type=int, help='server process whose (and whose workers\') memory to track')
+    parser.add_argument('--launch', help='start the server with this command and stop it afterwards')
+    parser.add_argument('--output', help='write the report to a JSON file')
+    parser.add_argument('--compare', help='earlier --output report to compare against')
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.launch:
+        process = subprocess.Popen(shlex.split(args.launch))
+        wait_until_ready(args.url, process, timeout=180)
+    pid = args.pid or (process.pid if process else None)
+    try:
+        probe = DashClient(args.url, args.timeout)
+        dependencies = probe.get_json('/_dash-dependencies')
+        layout = probe.get_json('/_dash-layout')
+        app = (TryApp if args.app == 'try' else DemoApp)(dependencies, layout)
+
+        if args.sessions:
+            with open(args.sessions) as fh:
+                sessions = [json.loads(line) for line in fh if line.strip()]
+        else:
+            synthesize = synthesize_try_sessions if args.app == 'try' else synthesize_demo_sessions
+            sessions = synthesize(layout, args.n_sessions, args.steps, args.seed)
+        if args.save_sessions:
+            with open(args.save_sessions, 'w') as fh:
+                fh.writelines(json.dumps(session) + '\n' for session in sessions)
+
+        monitor = MemoryMonitor(pid) if pid else None
+        if monitor:
+            monitor.sample()
+            monitor.start()
+        records, elapsed = run_load(app, args.url, sessions, args.users, args.duration, args.max_sessions,
+                                    args.think_time, args.timeout)
+        if monitor:
+            monitor.stop()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        'meta': {'url': args.url, 'app': args.app, 'users': args.users, 'duration': args.duration,
+                 'think_time': args.think_time, 'sessions': len(sessions), 'seed': args.seed,
+                 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'summary': summarize(records, elapsed),
+    }
+    if monitor:
+        report['memory'] = monitor.report()
+    previous = None
+    if args.compare:
+        with open(args.compare) as fh:
+            previous = json.load(fh)
+    print_report(report, previous)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+    return 1 if report['summary']['overall']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmarks.run import VIEWS, filter_scenarios, load_dashboard
+from benchmarks.synthetic import generate_raw_frame
+from cube import CUBE_DIMENSIONS
+from dashboard_data import DashboardData, SQLData
+from demo_graphs import GRAPH_REGISTRY, QUARTER_COLUMNS, GraphPlanner
+from loader import clean_demo_sheet, clean_final_sheet, read_snapshot, save_snapshot
+from partitions import PartitionCatalog, PartitionedData, write_partitions
+from query_backends import DuckDBBackend
+from result_cache import _PayloadEncoder
+
+# Checks that the pandas and DuckDB query backends (query_backends.py) give the
+# same results on synthetic data: every try.py grouping under every filter
+# scenario, whole update_display results per view, and every demo.py graph's
+# aggregate and figure. Both backends read the same snapshot file. The
+# partitioned archive (partitions.py) is checked against the pandas backend the
+# same way, for try.py. Exits non-zero on any difference. Run from the repository root:
+#
+#   python -m benchmarks.parity
+#   python -m benchmarks.parity --size 1000000 --seed 3
+
+# The groupings update_display asks its backend for, one per view
+GROUPINGS = [['Year', 'Quarter'], ['Developer Name'], ['Area', 'QuarterOrdinal'], ['Asset Type', 'Year']]
+
+
+def write_snapshot(frame, directory, name):
+    # Stored the way loader.load_dataset stores a cleaned frame
+    path = os.path.join(directory, f'{name}.feather')
+    save_snapshot(frame.reset_index(drop=True), path)
+    return path
+
+
+def difference(expected, actual):
+    # None when equal, else what differs
+    try:
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True))
+        elif isinstance(expected, pd.Series):
+            pd.testing.assert_series_equal(expected, actual)
+        elif expected != actual:
+            return 'results differ'
+    except AssertionError as error:
+        return str(error).strip().splitlines()[0]
+    return None
+
+
+def payload(result):
+    return json.loads(json.dumps(result, cls=_PayloadEncoder))
+
+
+def compare_try(dashboard, pandas_data, other, name, results):
+    # `other` against the pandas backend: every grouping, then whole views
+    scenarios = filter_scenarios(pandas_data)
+    for scenario, (areas, developers, asset_types, (start, end)) in scenarios.items():
+        for by in GROUPINGS:
+            results[f'{name}.{"+".join(by)}.{scenario}'] = difference(
+                pandas_data.backend.units_by(by, areas, developers, asset_types, start, end),
+                other.backend.units_by(by, areas, developers, asset_types, start, end),
+            )
+
+    # Whole view results, through the callback without its cache
+    update_display = inspect.unwrap(dashboard.update_display)
+    previous = dashboard.data
+    try:
+        for scenario, (areas, developers, asset_types, date_range) in scenarios.items():
+            for view in VIEWS:
+                outcomes = []
+                for current in [pandas_data, other]:
+                    dashboard.data = current
+                    outcomes.append(payload(update_display(view, areas, developers, asset_types, date_range)))
+                results[f'{name}.view.{view}.{scenario}'] = difference(*outcomes)
+    finally:
+        dashboard.data = previous
+
+
+def check_try(dashboard, directory, size, seed, results):
+    frame = clean_final_sheet(generate_raw_frame(size, seed=seed))
+    path = write_snapshot(frame, directory, 'final')
+    pandas_data = DashboardData(read_snapshot(path), f'parity-{size}')
+    sql_data = SQLData(path, f'parity-{size}')
+    results['try.quarters'] = difference(list(pandas_data.quarters), list(sql_data.quarters))
+    for column in ['Area', 'Developer Name', 'Asset Type']:
+        results[f'try.members.{column}'] = difference(pandas_data.members(column), sql_data.members(column))
+    # The same cube rows; their order within a quarter is the engine's
+    results['try.cube'] = difference(
+        pandas_data.cube.sort_values(CUBE_DIMENSIONS, ignore_index=True),
+        sql_data.backend.cube().sort_values(CUBE_DIMENSIONS, ignore_index=True),
+    )
+    for key in ['quarters', 'categories']:
+        results[f'try.columnar.{key}'] = difference(pandas_data.columnar_cube()[key], sql_data.columnar_cube()[key])
+    compare_try(dashboard, pandas_data, sql_data, 'try', results)
+
+    root = os.path.join(directory, 'partitions')
+    write_partitions(frame, root, 'Synthetic')
+    partitioned = PartitionedData(PartitionCatalog(root))
+    results['partitions.quarters'] = difference(list(pandas_data.quarters), list(partitioned.quarters))
+    for column in ['Area', 'Developer Name']:
+        results[f'partitions.members.{column}'] = difference(pandas_data.members(column), partitioned.members(column))
+    compare_try(dashboard, pandas_data, partitioned, 'partitions', results)
+
+
+def check_demo(directory, size, seed, results):
+    path = write_snapshot(clean_demo_sheet(generate_raw_frame(size, seed=seed)), directory, 'demo')
+    pandas_planner = GraphPlanner(read_snapshot(path))
+    sql_planner = GraphPlanner(engine=DuckDBBackend(path, QUARTER_COLUMNS))
+    for spec in GRAPH_REGISTRY:
+        if spec['chart'] != 'cumulative_lines':
+            results[f'demo.{spec["value"]}.aggregate'] = difference(
+                pandas_planner.aggregate(spec), sql_planner.aggregate(spec)
+            )
+        results[f'demo.{spec["value"]}.figure'] = difference(
+            payload(pandas_planner.figure(spec)), payload(sql_planner.figure(spec))
+        )
+
+
+def run(size, seed):
+    dashboard = load_dashboard()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        check_try(dashboard, directory, size, seed, results)
+        check_demo(directory, size, seed, results)
+    return results
+
+
+def report(results):
+    for name, problem in results.items():
+        print(f'{name:<60} {"ok" if problem is None else "MISMATCH: " + problem}')
+    failures = sum(problem is not None for problem in results.values())
+    print(f'{len(results) - failures} of {len(results)} checks match')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the pandas, DuckDB and partitioned backends agree.')
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    return 1 if report(run(args.size, args.seed)) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import argparse
+import json
+import sys
+
+from benchmarks.run import VIEWS, filter_scenarios, load_dashboard
+from benchmarks.synthetic import generate_raw_frame
+from compression import available_encodings
+from dashboard_data import DashboardData
+from loader import clean_final_sheet
+
+# Response sizes of the try.py callbacks per view, as the browser receives
+# them: the refresh_view response for a first render (every table column and
+# figure sent whole) and the first page of the view's main table, each
+# uncompressed and with every encoding the server offers. Run from the
+# repository root:
+#
+#   python -m benchmarks.payload
+#   python -m benchmarks.payload --size 1000000 --output payload.json
+
+PAGED_TABLE_MATCH = json.dumps({'index': ['MATCH'], 'type': 'paged-table'}, separators=(',', ':'))
+
+
+def control_inputs(view, areas, developers, asset_types, date_range):
+    return [
+        {'id': 'view-state', 'property': 'data', 'value': {'view': view}},
+        {'id': 'area-filter-dropdown', 'property': 'value', 'value': areas},
+        {'id': 'developer-filter-dropdown', 'property': 'value', 'value': developers},
+        {'id': 'asset-type-dropdown', 'property': 'value', 'value': asset_types},
+        {'id': 'date-range-slider', 'property': 'value', 'value': date_range},
+    ]
+
+
+def refresh_request(dashboard, controls):
+    key = next(key for key in dashboard.app.callback_map if key.startswith('..view-message.children'))
+    outputs = []
+    for output in key.strip('.').split('...'):
+        component_id, prop = output.rsplit('.', 1)
+        outputs.append({'id': json.loads(component_id) if component_id.startswith('{') else component_id,
+                        'property': prop})
+    return {'output': key, 'outputs': outputs, 'inputs': controls,
+            'state': [{'id': 'view-signature', 'property': 'data', 'value': None}], 'changedPropIds': []}
+
+
+def page_request(dashboard, controls):
+    table_id = dashboard.paged_table_id('main')
+    return {
+        'output': f'..{PAGED_TABLE_MATCH}.data...{PAGED_TABLE_MATCH}.page_count..',
+        'outputs': [{'id': table_id, 'property': 'data'}, {'id': table_id, 'property': 'page_count'}],
+        'inputs': controls + [
+            {'id': table_id, 'property': 'page_current', 'value': 0},
+            {'id': table_id, 'property': 'page_size', 'value': dashboard.PAGE_SIZE},
+            {'id': table_id, 'property': 'sort_by', 'value': []},
+            {'id': table_id, 'property': 'filter_query', 'value': ''},
+        ],
+        'state': [{'id': table_id, 'property': 'id', 'value': table_id}],
+        'changedPropIds': [],
+    }
+
+
+def response_sizes(client, body):
+    sizes = {}
+    for encoding in ['identity'] + available_encodings():
+        response = client.post('/_dash-update-component', json=body, headers={'Accept-Encoding': encoding})
+        if response.status_code != 200:
+            raise RuntimeError(f'{body["output"]}: HTTP {response.status_code}')
+        sizes[encoding] = len(response.get_data())
+    return sizes
+
+
+def run(size, seed):
+    dashboard = load_dashboard()
+    if not dashboard.PAGED_TABLES:
+        raise SystemExit('Payload sizes are measured for the server-side mode; unset CLIENTSIDE_FILTERING')
+    previous = dashboard.data
+    dashboard.data = DashboardData(clean_final_sheet(generate_raw_frame(size, seed=seed)), f'payload-{size}')
+    client = dashboard.app.server.test_client()
+    results = {}
+    try:
+        for scenario, (areas, developers, asset_types, date_range) in filter_scenarios(dashboard.data).items():
+            for view in VIEWS:
+                controls = control_inputs(view, areas, developers, asset_types, date_range)
+                results[f'{view}.{scenario}.refresh'] = response_sizes(client, refresh_request(dashboard, controls))
+                results[f'{view}.{scenario}.page'] = response_sizes(client, page_request(dashboard, controls))
+    finally:
+        dashboard.data = previous
+    return results
+
+
+def report(results):
+    encodings = ['identity'] + available_encodings()
+    print(f"{'response':<50}" + ''.join(f'{encoding:>10}' for encoding in encodings))
+    for name, sizes in results.items():
+        print(f'{name:<50}' + ''.join(f'{sizes[encoding]:>10}' for encoding in encodings))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure try.py callback response sizes per view.')
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the sizes to a JSON file')
+    args = parser.parse_args(argv)
+
+    results = run(args.size, args.seed)
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import argparse
+import importlib
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_raw_frame
+from dashboard_data import DashboardData
+from demo_graphs import GraphPlanner, graph_options
+from loader import clean_demo_sheet, clean_final_sheet
+
+# Timed, repeatable benchmarks of every try.py view and demo.py graph option on
+# synthetic data. Run from the repository root:
+#
+#   python -m benchmarks.run                          # compare against the saved baseline
+#   python -m benchmarks.run --save-baseline          # record a new baseline
+#   python -m benchmarks.run --sizes 10000 5000000 --fail-on-regression
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+VIEWS = ['QUARTERLY', 'DEVELOPER', 'AREA_QUARTERLY', 'ASSET_YEARLY']
+
+
+def load_dashboard():
+    # try.py can't be imported with a plain import statement (`try` is a keyword)
+    return importlib.import_module('try')
+
+
+def time_call(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {'median': statistics.median(timings), 'min': min(timings), 'repeat': repeat}
+
+
+def filter_scenarios(data):
+    # (areas, developers, asset types, date range) combinations a user would pick
+    n_quarters = len(data.quarters)
+    full_range = [0, n_quarters - 1]
+    developers = data.frame['Developer Name'].value_counts().index[:200].tolist()
+    return {
+        'unfiltered': (None, None, None, full_range),
+        'two_areas': (['East', 'North'], None, None, full_range),
+        'top_200_developers': (None, developers, None, full_range),
+        'villa_plot': (None, None, ['Villa', 'Plot'], full_range),
+        'half_window': (None, None, None, [n_quarters // 4, n_quarters // 4 + n_quarters // 2]),
+        'combined': (['East', 'South'], developers[:50], ['Apartment'], [1, max(1, n_quarters - 2)]),
+    }
+
+
+def bench_try(dashboard, raw, size, repeat, results):
+    results[f'try.load@{size}'] = time_call(
+        lambda: DashboardData(clean_final_sheet(raw.copy()), 'bench'), repeat=max(1, repeat // 2), warmup=0
+    )
+    previous = dashboard.data
+    dashboard.data = DashboardData(clean_final_sheet(raw.copy()), f'bench-{size}')
+    # Call the undecorated callback so the result cache doesn't hide the work
+    update_display = inspect.unwrap(dashboard.update_display)
+    try:
+        for scenario, (areas, developers, asset_types, date_range) in filter_scenarios(dashboard.data).items():
+            for view in VIEWS:
+                results[f'try.{view}.{scenario}@{size}'] = time_call(
+                    lambda: update_display(view, areas, developers, asset_types, date_range), repeat
+                )
+    finally:
+        dashboard.data = previous
+
+
+def bench_demo(raw, size, repeat, results):
+    data = clean_demo_sheet(raw.copy())
+    results[f'demo.load@{size}'] = time_call(lambda: GraphPlanner(data), repeat=max(1, repeat // 2), warmup=0)
+    values = [option['value'] for option in graph_options]
+    for value in values:
+        # Cold: a fresh planner per call, so no shared intermediates survive
+        results[f'demo.{value}.cold@{size}'] = time_call(lambda: GraphPlanner(data).build([value]), repeat)
+    results[f'demo.all_graphs.cold@{size}'] = time_call(lambda: GraphPlanner(data).build(values), repeat)
+    planner = GraphPlanner(data)
+    results[f'demo.all_graphs.warm@{size}'] = time_call(lambda: planner.build(values), repeat)
+
+
+def run(sizes, repeat, seed):
+    dashboard = load_dashboard()
+    results = {}
+    for size in sizes:
+        raw = generate_raw_frame(size, seed=seed)
+        print(f'# {size} rows', file=sys.stderr)
+        bench_try(dashboard, raw, size, repeat, results)
+        bench_demo(raw, size, repeat, results)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'sizes': sizes,
+            'seed': seed,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    regressions = []
+    print(f"{'benchmark':<60} {'median ms':>10} {'baseline':>10} {'ratio':>7}")
+    for name, timing in report['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        median_ms = timing['median'] * 1000
+        if reference is None:
+            print(f'{name:<60} {median_ms:>10.2f} {"-":>10} {"-":>7}')
+            continue
+        ratio = timing['median'] / reference['median'] if reference['median'] else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        print(f"{name:<60} {median_ms:>10.2f} {reference['median'] * 1000:>10.2f} {ratio:>7.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard views on synthetic TruEstimate data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the new baseline')
+    parser.add_argument('--output', help='also write this run to a JSON file')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='median slowdown ratio reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    regressions = compare(report, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+        print(f'Saved baseline to {args.baseline}', file=sys.stderr)
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) slower than {args.threshold}x baseline', file=sys.stderr)
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# Synthetic TruEstimate sheets with the real schema, for benchmarking the
+# dashboards without the proprietary workbook. Raw values carry the same kind of
+# noise the cleaning chain deals with (case/whitespace variants, Asset Type
+# synonyms, missing dates and units), and developer popularity is Zipf-skewed.
+
+AREAS = ['East', 'North', 'South', 'Central', 'West']
+AREA_WEIGHTS = [0.3, 0.28, 0.22, 0.12, 0.08]
+
+ASSET_TYPES = ['Apartment', 'Flat', ' apartment ', 'Villa', 'Plot', 'Land', 'Plot/Land']
+ASSET_TYPE_WEIGHTS = [0.5, 0.08, 0.02, 0.15, 0.15, 0.07, 0.03]
+
+CONFIGURATIONS = ['1 BHK', '2 BHK', '3 BHK', '4 BHK', '2, 3 BHK']
+CONFIGURATION_WEIGHTS = [0.1, 0.35, 0.35, 0.1, 0.1]
+
+
+def developer_names(n_developers):
+    return np.array([f'Developer {i:05d}' for i in range(n_developers)], dtype=object)
+
+
+def developer_weights(n_developers, skew=1.1):
+    # A handful of large developers launch most projects, with a long tail
+    weights = 1.0 / np.arange(1, n_developers + 1) ** skew
+    return weights / weights.sum()
+
+
+def generate_raw_frame(n_rows, seed=0, start='2022-01-01', years=4, n_developers=None):
+    rng = np.random.default_rng(seed)
+    if n_developers is None:
+        n_developers = int(min(20000, max(50, n_rows // 50)))
+
+    area = np.array(AREAS, dtype=object)[rng.choice(len(AREAS), n_rows, p=AREA_WEIGHTS)]
+    # Case and whitespace noise, plus rows the cleaner drops
+    noisy = rng.random(n_rows)
+    area = np.where(noisy < 0.1, np.char.lower(area.astype(str)).astype(object), area)
+    area = np.where((noisy >= 0.1) & (noisy < 0.15), np.char.add(' ', area.astype(str)).astype(object), area)
+    area = np.where(noisy > 0.98, 'nan', area)
+
+    asset_type = np.array(ASSET_TYPES, dtype=object)[rng.choice(len(ASSET_TYPES), n_rows, p=ASSET_TYPE_WEIGHTS)]
+    configuration = np.array(CONFIGURATIONS, dtype=object)[rng.choice(len(CONFIGURATIONS), n_rows, p=CONFIGURATION_WEIGHTS)]
+
+    developers = developer_names(n_developers)
+    developer = developers[rng.choice(n_developers, n_rows, p=developer_weights(n_developers))]
+
+    span_days = int(years * 365.25)
+    launch = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, span_days, n_rows), unit='D')
+    handover = launch + pd.to_timedelta(rng.integers(365, 6 * 365, n_rows), unit='D')
+    launch = pd.Series(launch).mask(rng.random(n_rows) < 0.01)
+    handover = pd.Series(handover).mask(rng.random(n_rows) < 0.03)
+
+    units = np.round(rng.lognormal(mean=5.0, sigma=0.9, size=n_rows))
+    units[rng.random(n_rows) < 0.01] = np.nan
+
+    return pd.DataFrame({
+        'Launch Date': launch,
+        'Handover date': handover,
+        'Area': area,
+        'Developer Name': developer,
+        'Asset Type': asset_type,
+        'Configuration': configuration,
+        'Total no. of units': units,
+        'Project Area (Acres)': np.round(rng.lognormal(mean=1.5, sigma=0.8, size=n_rows), 2),
+    })
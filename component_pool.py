@@ -0,0 +1,64 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Concurrent construction of a callback's independent components. Tasks are
+# (function, args) pairs and results come back in task order, whatever order
+# they finish in. COMPONENT_BUILD_MODE picks how they run:
+#
+#   serial     one after another in the calling thread (default)
+#   threads    on a thread pool; overlaps the parts of plotly and pandas that
+#              release the GIL
+#   processes  on a process pool, for the pure-Python plotly validation. Task
+#              functions must be module-level and their arguments picklable.
+#              Workers fork from a forkserver that has the figure builders
+#              imported, not from the threaded server. They still import the
+#              parent's __main__ again, so this mode is for serving under
+#              gunicorn (wsgi.py); a dashboard run as a script would reload
+#              its dataset in every worker and builds on threads instead.
+
+BUILD_MODE = os.environ.get('COMPONENT_BUILD_MODE', 'serial')
+BUILD_WORKERS = int(os.environ.get('COMPONENT_BUILD_WORKERS', min(8, os.cpu_count() or 1)))
+
+# Modules the task functions live in, imported once by the forkserver
+PRELOAD_MODULES = ['figure_dicts', 'view_figures', 'demo_graphs']
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _executor():
+    # One pool per process: neither threads nor pool pipes survive gunicorn's fork
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if BUILD_MODE == 'processes':
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(PRELOAD_MODULES)
+                _pool = ProcessPoolExecutor(BUILD_WORKERS, mp_context=context)
+            else:
+                _pool = ThreadPoolExecutor(BUILD_WORKERS, thread_name_prefix='component-build')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def running_as_script():
+    # Called from a dashboard's `if __name__ == '__main__'` block: pool workers
+    # would import the script, and with it the whole dataset, once each
+    global BUILD_MODE
+    if BUILD_MODE == 'processes':
+        logger.warning('COMPONENT_BUILD_MODE=processes needs the app served through wsgi.py; building on threads')
+        BUILD_MODE = 'threads'
+
+
+def build_components(tasks):
+    if BUILD_MODE == 'serial' or len(tasks) < 2:
+        return [func(*args) for func, args in tasks]
+    executor = _executor()
+    futures = [executor.submit(func, *args) for func, args in tasks]
+    return [future.result() for future in futures]
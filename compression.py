@@ -0,0 +1,65 @@
+import gzip
+import os
+import time
+
+import flask
+
+try:
+    import brotli
+except ImportError:
+    # gzip only; brotli is preferred when installed (see requirements.txt)
+    brotli = None
+
+# Compression of the apps' JSON responses (_dash-update-component, the layout
+# and the callback graph). Callback responses are mostly repeated keys and
+# digits and shrink several-fold, which is what users on slow mobile links
+# wait on. Brotli is used when the client accepts it and the module is
+# installed, gzip otherwise; small bodies go out as they are.
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 500))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+# Brotli's higher qualities cost more CPU per response than they save in transfer
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(accept_encodings):
+    # Best encoding a werkzeug MIMEAccept-style Accept-Encoding allows, or None
+    for encoding in available_encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def install_compression(app):
+    # Call after install_metrics: Flask runs after_request hooks in reverse, so
+    # this one encodes the body before metrics records its size on the wire
+    server = app.server
+
+    @server.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.status_code != 200
+                or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(flask.request.accept_encodings)
+        body = response.get_data()
+        if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+            return response
+        started = time.perf_counter()
+        response.set_data(compress(body, encoding))
+        flask.g.compression_seconds = time.perf_counter() - started
+        flask.g.uncompressed_response_bytes = len(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    return app
@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+# Pre-aggregated cube of the cleaned frame. Every dashboard view is a roll-up of
+# these dimensions, so callbacks slice this small frame instead of raw rows.
+CUBE_DIMENSIONS = ['Area', 'Developer Name', 'Asset Type', 'Year', 'Quarter']
+UNITS = 'Total no. of units'
+PROJECTS = 'Projects'
+
+# Dimensions the dashboard filters on, each backed by one bitmap per value. The
+# date range is not among them: the cube is sorted by quarter ordinal and date
+# windows are located by binary search instead.
+FILTER_DIMENSIONS = ['Area', 'Developer Name', 'Asset Type']
+
+
+def quarter_ordinal(year, quarter):
+    return year * 4 + quarter - 1
+
+
+def quarter_label(ordinal):
+    return f'{ordinal // 4} Q{ordinal % 4 + 1}'
+
+
+def quarter_labels(ordinals):
+    return [quarter_label(int(ordinal)) for ordinal in ordinals]
+
+
+def build_cube(df):
+    cube = df.groupby(CUBE_DIMENSIONS, observed=True, sort=True).agg(**{
+        UNITS: (UNITS, 'sum'),
+        PROJECTS: (UNITS, 'size'),
+    }).reset_index()
+    cube['QuarterOrdinal'] = quarter_ordinal(cube['Year'], cube['Quarter'])
+    cube = cube.sort_values('QuarterOrdinal', kind='stable', ignore_index=True)
+    for column in FILTER_DIMENSIONS:
+        if not isinstance(cube[column].dtype, pd.CategoricalDtype):
+            cube[column] = cube[column].astype('category')
+    return cube
+
+
+def apply_cube_delta(cube, added, removed):
+    # Cube of the frame after `removed` rows were taken out and `added` rows put
+    # in, from the cube before. Only the changed rows are aggregated; the merge
+    # itself is cube-sized, and the result matches build_cube on the new frame.
+    parts = [cube[CUBE_DIMENSIONS + [UNITS, PROJECTS]]]
+    if len(added):
+        parts.append(build_cube(added)[CUBE_DIMENSIONS + [UNITS, PROJECTS]])
+    if len(removed):
+        negated = build_cube(removed)[CUBE_DIMENSIONS + [UNITS, PROJECTS]]
+        negated[[UNITS, PROJECTS]] = -negated[[UNITS, PROJECTS]]
+        parts.append(negated)
+    parts = [part.astype({column: object for column in FILTER_DIMENSIONS}) for part in parts]
+    merged = pd.concat(parts, ignore_index=True).groupby(CUBE_DIMENSIONS, sort=True)[[UNITS, PROJECTS]].sum()
+    merged = merged[merged[PROJECTS] > 0].reset_index()
+    merged['QuarterOrdinal'] = quarter_ordinal(merged['Year'], merged['Quarter'])
+    merged = merged.sort_values('QuarterOrdinal', kind='stable', ignore_index=True)
+    for column in FILTER_DIMENSIONS:
+        merged[column] = merged[column].astype('category')
+    return merged
+
+
+def columnar_cube(cube, quarters):
+    # Compact column-oriented copy of the cube for the browser: per-row codes
+    # into each filter dimension's categories, slider positions on the quarter
+    # axis, and the measures. Plain lists, so it goes out as JSON unchanged.
+    return {
+        'quarters': [int(ordinal) for ordinal in quarters],
+        'categories': {column: [str(value) for value in cube[column].cat.categories] for column in FILTER_DIMENSIONS},
+        'codes': {column: cube[column].cat.codes.tolist() for column in FILTER_DIMENSIONS},
+        'positions': np.searchsorted(quarters, cube['QuarterOrdinal'].to_numpy()).tolist(),
+        'units': np.nan_to_num(cube[UNITS].to_numpy(dtype='float64')).tolist(),
+        'projects': cube[PROJECTS].astype('int64').tolist(),
+    }
+
+
+# Dense bitmaps cost one bit per (value, cube row); dimensions that would need
+# more than this (e.g. thousands of developers) use sorted posting lists instead.
+BITMAP_MAX_BYTES = 32 * 1024 * 1024
+
+
+class FilterIndex:
+    # Packed bitmap per distinct value of each filter dimension, built once per
+    # cube. A filter is then an OR of bitmaps within a dimension, an AND across
+    # dimensions and a single take. High-cardinality dimensions keep the row
+    # positions of each value instead, and are turned into a bitmap only for the
+    # rows and values a request touches.
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.size = len(cube)
+        self.n_bytes = (self.size + 7) // 8
+        self.ordinals = cube['QuarterOrdinal'].to_numpy()
+        # Distinct quarters in order; the RangeSlider positions index into this
+        self.quarters = np.unique(self.ordinals)
+        self.lookup = {}
+        self.bitmaps = {}
+        self.postings = {}
+        rows = np.arange(self.size)
+        for column in FILTER_DIMENSIONS:
+            codes = cube[column].cat.codes.to_numpy()
+            categories = cube[column].cat.categories
+            self.lookup[column] = {value: code for code, value in enumerate(categories)}
+            if len(categories) * self.n_bytes <= BITMAP_MAX_BYTES:
+                bitmaps = np.zeros((len(categories), self.n_bytes), dtype=np.uint8)
+                np.bitwise_or.at(bitmaps, (codes, rows >> 3), (128 >> (rows & 7)).astype(np.uint8))
+                self.bitmaps[column] = bitmaps
+            else:
+                # Row positions grouped by code, ascending within each code
+                order = np.argsort(codes, kind='stable')
+                offsets = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+                self.postings[column] = (order, offsets)
+
+    def row_range(self, start, end):
+        # Rows whose quarter ordinal falls in [start, end], by binary search
+        lo = np.searchsorted(self.ordinals, start, side='left')
+        hi = np.searchsorted(self.ordinals, end, side='right')
+        return lo, hi
+
+    def _dimension_bitmap(self, column, values, first_byte, last_byte):
+        lookup = self.lookup[column]
+        codes = [lookup[value] for value in values if value in lookup]
+        if not codes:
+            return np.zeros(last_byte - first_byte, dtype=np.uint8)
+        if column in self.bitmaps:
+            return np.bitwise_or.reduce(self.bitmaps[column][codes, first_byte:last_byte], axis=0)
+
+        order, offsets = self.postings[column]
+        first_row, last_row = first_byte * 8, last_byte * 8
+        bits = np.zeros(last_row - first_row, dtype=bool)
+        for code in codes:
+            positions = order[offsets[code]:offsets[code + 1]]
+            window = positions[np.searchsorted(positions, first_row):np.searchsorted(positions, last_row)]
+            bits[window - first_row] = True
+        return np.packbits(bits)
+
+    def mask(self, lo, hi, **selections):
+        # Only the bytes covering rows [lo, hi) are combined
+        first_byte, last_byte = lo // 8, (hi + 7) // 8
+        bitmap = None
+        for column, values in selections.items():
+            if values is None:
+                continue
+            dimension = self._dimension_bitmap(column, values, first_byte, last_byte)
+            bitmap = dimension if bitmap is None else bitmap & dimension
+        if bitmap is None:
+            return None
+        offset = lo - first_byte * 8
+        return np.unpackbits(bitmap)[offset:offset + hi - lo].astype(bool)
+
+
+def slice_cube(index, areas=None, developers=None, asset_types=None, quarter_range=None):
+    lo, hi = (0, index.size) if quarter_range is None else index.row_range(*quarter_range)
+    # Empty multi-selects mean "no filter", matching the dashboard dropdowns
+    mask = index.mask(lo, hi, **{
+        'Area': areas or None,
+        'Developer Name': developers or None,
+        'Asset Type': asset_types or None,
+    })
+    if mask is None:
+        return index.cube.iloc[lo:hi]
+    return index.cube.take(lo + np.flatnonzero(mask))
+
+
+def rollup(cube, by, measures=(UNITS,)):
+    # Roll the cube up to the given dimensions; sums of partial sums equal the
+    # row-level aggregate, so views see the same numbers as a raw groupby.
+    result = cube.groupby(by, observed=True, sort=False)[list(measures)].sum().reset_index()
+    # Decode dictionary-encoded keys so tables and figures see plain labels, then
+    # sort on the labels (observed groupby doesn't keep category order everywhere)
+    for column in by:
+        if isinstance(result[column].dtype, pd.CategoricalDtype):
+            result[column] = result[column].astype(object)
+    return result.sort_values(by, ignore_index=True)
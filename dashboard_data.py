@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from cube import apply_cube_delta, build_cube, columnar_cube, FilterIndex, CUBE_DIMENSIONS, FILTER_DIMENSIONS, UNITS
+from heavy_hitters import MemberRankings
+from loader import read_snapshot
+from prefix_sums import PrefixSumTable
+from query_backends import DuckDBBackend, PandasBackend
+
+# Above this share of changed rows an update rebuilds the cube from scratch
+DELTA_MAX_FRACTION = 0.5
+
+
+def row_keys(frame):
+    # One 64-bit key per row: the hash of the columns the cube is built from,
+    # mixed with how many equal rows came before it so duplicates stay
+    # distinguishable. Other columns (and their inferred types) don't matter here.
+    columns = frame[CUBE_DIMENSIONS].assign(**{UNITS: frame[UNITS].astype('float64')})
+    hashes = pd.util.hash_pandas_object(columns, index=False)
+    occurrence = hashes.groupby(hashes.to_numpy()).cumcount().to_numpy().astype(np.uint64)
+    return hashes.to_numpy() ^ (occurrence * np.uint64(0x9E3779B97F4A7C15))
+
+
+class DashboardData:
+    # Everything the try.py callbacks read, derived once from a cleaned frame.
+    # Callbacks go through a single module-level instance, so a new dataset can
+    # be swapped in (or a synthetic one benchmarked) by replacing that reference.
+
+    def __init__(self, frame, version, cube=None, rankings=None):
+        self.frame = frame
+        self.version = version
+        self._row_keys = None
+        self._columnar = None
+
+        # Pre-aggregate once at load; callbacks slice and roll up this cube
+        self.cube = build_cube(frame) if cube is None else cube
+        self.filter_index = FilterIndex(self.cube)
+
+        # Distinct quarter ordinals for the RangeSlider; labels are rendered from them
+        self.quarters = self.filter_index.quarters
+
+        # Prefix sums along the quarter axis, overall and per filter dimension, so
+        # slider windows are answered by array lookups when the filters allow it
+        self.prefix_tables = {
+            dimension: PrefixSumTable.from_cube(self.cube, dimension, self.quarters)
+            for dimension in [None] + FILTER_DIMENSIONS
+        }
+
+        # Developers ranked by units per area and asset type over the whole
+        # quarter axis, unless the developers are too many to keep totals for
+        if rankings is None and MemberRankings.fits(self.cube):
+            rankings = MemberRankings(self.cube)
+        self.rankings = rankings
+
+        # Answers update_display's aggregations; with QUERY_BACKEND=duckdb
+        # try.py serves SQLData instead
+        self.backend = PandasBackend(self)
+
+    def row_keys(self):
+        if self._row_keys is None:
+            self._row_keys = row_keys(self.frame)
+        return self._row_keys
+
+    def members(self, column):
+        # Distinct values of a filter column, for its dropdown
+        return sorted(self.frame[column].unique())
+
+    def columnar_cube(self):
+        # What the clientside filtering mode ships to the browser, once per version
+        if self._columnar is None:
+            self._columnar = dict(columnar_cube(self.cube, self.quarters), version=self.version)
+        return self._columnar
+
+    def refreshed(self, path, version):
+        # updated() for the version stored in the snapshot at `path`
+        return self.updated(read_snapshot(path), version)
+
+    def updated(self, frame, version):
+        # DashboardData for a new version of the frame plus the rows that changed
+        # (added and removed, None after a full rebuild). Only those rows are
+        # aggregated and merged into the existing cube and developer rankings;
+        # the index and prefix tables are rebuilt from the cube, which is small
+        # next to the frame.
+        new_keys = row_keys(frame)
+        old_keys = self.row_keys()
+        added = frame[~np.isin(new_keys, old_keys)]
+        removed = self.frame[~np.isin(old_keys, new_keys)]
+        if len(added) + len(removed) > DELTA_MAX_FRACTION * max(len(frame), 1):
+            return DashboardData(frame, version), None
+
+        cube = apply_cube_delta(self.cube, added, removed)
+        rankings = None
+        if self.rankings is not None and MemberRankings.fits(cube):
+            rankings = self.rankings.updated(cube, added, removed)
+        updated = DashboardData(frame, version, cube, rankings)
+        updated._row_keys = new_keys
+        return updated, pd.concat([added, removed], ignore_index=True)
+
+
+class SQLData:
+    # DashboardData's counterpart with QUERY_BACKEND=duckdb: the snapshot stays
+    # on disk and every aggregation, the quarter axis and the dropdown values are
+    # queries to DuckDB over it (query_backends.DuckDBBackend). No frame, cube or
+    # index is held in memory, so the dataset only has to fit on disk.
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.backend = DuckDBBackend(path)
+        self.quarters = self.backend.quarters
+        self._members = {}
+        self._columnar = None
+
+    def members(self, column):
+        if column not in self._members:
+            self._members[column] = self.backend.members(column)
+        return self._members[column]
+
+    def columnar_cube(self):
+        # The clientside mode ships the cube, aggregated by DuckDB on first use
+        if self._columnar is None:
+            self._columnar = dict(columnar_cube(self.backend.cube(), self.quarters), version=self.version)
+        return self._columnar
+
+    def refreshed(self, path, version):
+        # SQLData over the new snapshot plus the rows that changed (None when
+        # most did); nothing needs merging, the changes only tell the result
+        # cache which selections stay valid
+        updated = SQLData(path, version)
+        changes = updated.backend.changed_rows(self.backend)
+        if len(changes) > DELTA_MAX_FRACTION * max(updated.backend.row_count(), 1):
+            return updated, None
+        return updated, changes
@@ -0,0 +1,169 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+from dash import Patch
+
+# WebGL rendering and point decimation for dense line figures. Figures are
+# handled in their plotly JSON form: scatter traces switch to scattergl once a
+# figure holds more than WEBGL_POINT_THRESHOLD points, and any trace longer than
+# MAX_TRACE_POINTS is downsampled with Largest-Triangle-Three-Buckets, which
+# keeps the peaks and troughs a plain stride would skip. Zooming re-fetches the
+# visible x range at full resolution (or decimated again, if still too long).
+
+WEBGL_POINT_THRESHOLD = int(os.environ.get('WEBGL_POINT_THRESHOLD', 5000))
+MAX_TRACE_POINTS = int(os.environ.get('MAX_TRACE_POINTS', 2000))
+
+# Per-point arrays, subset together with x and y
+PER_POINT_PROPS = ['x', 'y', 'text', 'hovertext', 'customdata']
+
+
+def lttb_indices(x, y, n_out):
+    # Indices of the `n_out` points LTTB keeps: the first and last, and from each
+    # bucket in between the point forming the largest triangle with the point
+    # kept before it and the average of the next bucket
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i == n_out - 3:
+            next_x, next_y = x[n - 1], y[n - 1]
+        else:
+            next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _is_line(trace):
+    return trace.get('type', 'scatter') in ('scatter', 'scattergl') and trace.get('y') is not None
+
+
+def _x_kind(x):
+    values = np.asarray(x)
+    if values.dtype.kind in 'iuf':
+        return 'number'
+    if values.dtype.kind == 'M' or (len(values) and isinstance(values[0], (datetime.date, np.datetime64))):
+        return 'date'
+    return 'category'
+
+
+def _categories(traces):
+    # Category axis order: distinct x values in order of first appearance
+    categories = {}
+    for trace in traces:
+        if _x_kind(trace['x']) == 'category':
+            for value in trace['x']:
+                categories.setdefault(value, len(categories))
+    return categories
+
+
+def _positions(x, kind, categories):
+    if kind == 'number':
+        return np.asarray(x, dtype=float)
+    if kind == 'date':
+        return pd.to_datetime(np.asarray(x)).asi8.astype(float)
+    return np.array([categories[value] for value in x], dtype=float)
+
+
+def _range_position(value, kind):
+    # Relayout ranges are category indices on category axes, date strings on date axes
+    return float(pd.Timestamp(value).value) if kind == 'date' else float(value)
+
+
+def needs_decimation(figure, max_points=MAX_TRACE_POINTS):
+    return any(_is_line(trace) and 'stackgroup' not in trace and len(trace['y']) > max_points
+               for trace in figure.get('data', []))
+
+
+def prepare_figure(figure, x_range=None, max_points=MAX_TRACE_POINTS, webgl_threshold=WEBGL_POINT_THRESHOLD):
+    # Copy of a plotly JSON figure fit for sending: WebGL traces when dense and
+    # long traces decimated, within `x_range` (axis units) when given. The
+    # figure passed in is left untouched, so cached full-resolution figures can
+    # be prepared again for any zoom.
+    data = [dict(trace) for trace in figure.get('data', [])]
+    lines = [trace for trace in data if _is_line(trace) and trace.get('x') is not None]
+    if not lines:
+        return figure
+
+    if sum(len(trace['y']) for trace in lines) > webgl_threshold:
+        for trace in lines:
+            # Stacked areas and curved lines have no WebGL equivalent
+            if 'stackgroup' not in trace and trace.get('line', {}).get('shape', 'linear') == 'linear':
+                trace['type'] = 'scattergl'
+
+    categories = _categories(lines)
+    categorical_reduced = False
+    for trace in lines:
+        n = len(trace['y'])
+        # Stacked traces have to keep every x to stack on each other
+        if 'stackgroup' in trace or (n <= max_points and x_range is None):
+            continue
+        kind = _x_kind(trace['x'])
+        positions = _positions(trace['x'], kind, categories)
+        y = np.asarray(trace['y'], dtype=float)
+        keep = np.flatnonzero(np.isfinite(y))
+        if x_range is not None:
+            lo, hi = (_range_position(value, kind) for value in x_range)
+            inside = np.flatnonzero((positions[keep] >= lo) & (positions[keep] <= hi))
+            if len(inside):
+                # One point past each edge so lines run to the plot border
+                keep = keep[max(inside[0] - 1, 0):inside[-1] + 2]
+        keep = keep[lttb_indices(positions[keep], y[keep], max_points)]
+        gaps = np.flatnonzero(~np.isfinite(y))
+        if len(gaps) and len(keep):
+            # One missing point per gap between kept points, so lines still break there
+            before = np.searchsorted(gaps, keep)
+            keep = np.union1d(keep, gaps[before[:-1][np.diff(before) > 0]])
+        if len(keep) == n:
+            continue
+        for prop in PER_POINT_PROPS:
+            values = trace.get(prop)
+            if values is not None and not isinstance(values, str) and len(values) == n:
+                trace[prop] = np.asarray(values)[keep]
+        categorical_reduced = categorical_reduced or kind == 'category'
+
+    layout = dict(figure.get('layout', {}))
+    if categorical_reduced:
+        # Keep dropped categories on the axis so the remaining points stay in place
+        layout['xaxis'] = dict(layout.get('xaxis', {}), categoryorder='array', categoryarray=list(categories))
+    return dict(figure, data=data, layout=layout)
+
+
+def zoom_window(relayout):
+    # (handled, x_range) for a relayoutData event: the zoomed x range, None for a
+    # reset to the full range, and handled=False for events that leave the x axis alone
+    relayout = relayout or {}
+    if 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        return True, (relayout['xaxis.range[0]'], relayout['xaxis.range[1]'])
+    if 'xaxis.range' in relayout:
+        return True, tuple(relayout['xaxis.range'])
+    if relayout.get('xaxis.autorange'):
+        return True, None
+    return False, None
+
+
+def zoom_patch(figure, relayout):
+    # Patch re-sampling a full-resolution figure's traces for the x range the
+    # user zoomed to; None when the event or the figure needs no re-fetch
+    handled, x_range = zoom_window(relayout)
+    if not handled or not needs_decimation(figure):
+        return None
+    prepared = prepare_figure(figure, x_range)
+    patch = Patch()
+    for i, trace in enumerate(prepared['data']):
+        if _is_line(trace):
+            for prop in PER_POINT_PROPS:
+                if prop in trace:
+                    patch['data'][i][prop] = trace[prop]
+    categoryarray = prepared['layout'].get('xaxis', {}).get('categoryarray')
+    if categoryarray is not None:
+        patch['layout']['xaxis']['categoryarray'] = categoryarray
+    return patch
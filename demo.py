@@ -1,300 +1,110 @@
-import pandas as pd
-from dash import Dash, dcc, html, Input, Output
-import plotly.graph_objects as go
-import plotly.express as px
-
-# Load and clean data
-data = pd.read_excel('/mnt/data/TruEstimate Final Sheet Project (3).xlsx', header=1)
-data['Launch Date'] = pd.to_datetime(data['Launch Date'], errors='coerce')
-data['Handover date'] = pd.to_datetime(data['Handover date'], errors='coerce')
-data['Developer Name'] = data['Developer Name'].str.strip()
-data['Area'] = data['Area'].str.title()
-filtered_data = data[data['Launch Date'] > '2022-10-01']
-
-# Calculate time to handover
-filtered_data['Handover Time (Months)'] = (filtered_data['Handover date'] - filtered_data['Launch Date']).dt.days // 30
+import os
+
+from dash import Dash, dcc, html, Input, Output, State, MATCH
+from dash.exceptions import PreventUpdate
+
+from background_jobs import job_manager, job_options, reporting_progress
+from compression import install_compression
+from decimation import zoom_patch, zoom_window
+from demo_graphs import GRAPHS_BY_VALUE, QUARTER_COLUMNS, GraphPlanner, graph_id, graph_options
+from loader import load_dataset, clean_demo_sheet, ensure_snapshot
+from metrics import MetricsRegistry, cache_collector, install_metrics, instrument_callback
+from partitions import PartitionCatalog
+from query_backends import DuckDBBackend, QUERY_BACKEND
+from result_cache import memoize_callback
+from result_store import shared_result_cache
+
+DATA_SOURCE = '/mnt/data/TruEstimate Final Sheet Project (3).xlsx'
+
+# With DEMO_PARTITIONS set to a partitioned archive of demo sheets
+# (partitions.py), the dashboard reads only DEMO_CITY's partitions from it
+DEMO_PARTITIONS = os.environ.get('DEMO_PARTITIONS')
+DEMO_CITY = os.environ.get('DEMO_CITY', 'Bangalore')
+
+# Graphs are declared in demo_graphs.GRAPH_REGISTRY; the planner shares derived
+# columns, slices and aggregates across every selected graph, and with
+# QUERY_BACKEND=duckdb pushes the aggregates down to SQL over the snapshot
+if DEMO_PARTITIONS:
+    catalog = PartitionCatalog(DEMO_PARTITIONS)
+    filtered_data, data_version = catalog.load([DEMO_CITY]), catalog.version
+    planner = GraphPlanner(filtered_data)
+elif QUERY_BACKEND == 'duckdb':
+    # Graphs are aggregated by DuckDB straight from the columnar snapshot; the
+    # frame is never loaded into this process
+    snapshot, data_version = ensure_snapshot(DATA_SOURCE, clean_demo_sheet, header=1)
+    planner = GraphPlanner(engine=DuckDBBackend(snapshot, QUARTER_COLUMNS))
+else:
+    # Load and clean data (served from the columnar snapshot when the workbook is unchanged)
+    filtered_data, data_version = load_dataset(DATA_SOURCE, clean_demo_sheet, header=1)
+    planner = GraphPlanner(filtered_data)
+
+# Memoized callback results, keyed by normalized graph selection and data
+# version; shared by all workers through the result store when one is configured
+result_cache = shared_result_cache('update_graphs')
+result_cache.retain(data_version)
 
 # Initialize Dash app
 app = Dash(__name__)
 
-# Define graph options
-graph_options = [
-    {'label': 'Handover by Area Over Time', 'value': 'handover_area'},
-    {'label': 'New Launches by Area Over Time', 'value': 'new_launches_area'},
-    {'label': 'Total Project Size Over Time', 'value': 'total_project_size'},
-    {'label': 'Asset Type Distribution Over Time', 'value': 'asset_type_distribution'},
-    {'label': 'Number of Projects by Area Over Time (Cumulative)', 'value': 'projects_area_cumulative'},
-    {'label': 'Developer Dominance in Unit Volume (Swapped Axes)', 'value': 'developer_unit_volume'},
-    {'label': 'Time to Handover by Developer and Asset Type (Median)', 'value': 'handover_time_developer'},
-    {'label': 'Total Number of Units by Area Over Time', 'value': 'total_units_area'},
-    # More specific graphs for each area and configuration
-    {'label': 'Asset Type by Area Over Time (Units) - North', 'value': 'asset_type_north_units'},
-    {'label': 'Asset Type by Area Over Time (Units) - East', 'value': 'asset_type_east_units'},
-    {'label': 'Asset Type by Area Over Time (Units) - South', 'value': 'asset_type_south_units'},
-    {'label': 'Asset Type by Area Over Time (Units) - West', 'value': 'asset_type_west_units'},
-    {'label': 'Asset Type by Area Over Time (Projects) - North', 'value': 'asset_type_north_projects'},
-    {'label': 'Asset Type by Area Over Time (Projects) - East', 'value': 'asset_type_east_projects'},
-    {'label': 'Asset Type by Area Over Time (Projects) - South', 'value': 'asset_type_south_projects'},
-    {'label': 'Asset Type by Area Over Time (Projects) - West', 'value': 'asset_type_west_projects'},
-    # Developer Dominance by Asset Type and Area
-    {'label': 'Developer Dominance (Total Units) - Apartment', 'value': 'developer_dominance_apartment'},
-    {'label': 'Developer Dominance (Total Units) - Plot', 'value': 'developer_dominance_plot'},
-    {'label': 'Developer Dominance (Total Units) - Villa', 'value': 'developer_dominance_villa'},
-    # Configuration breakdown by area over time
-    {'label': 'Apartment Configuration by Area Over Time - North', 'value': 'config_north_apartment'},
-    {'label': 'Apartment Configuration by Area Over Time - East', 'value': 'config_east_apartment'},
-    {'label': 'Apartment Configuration by Area Over Time - South', 'value': 'config_south_apartment'},
-    {'label': 'Apartment Configuration by Area Over Time - West', 'value': 'config_west_apartment'}
-]
+# Per-callback latency histograms, served on /metrics
+metrics_registry = install_metrics(app, MetricsRegistry())
+metrics_registry.add_collector(cache_collector('update_graphs', result_cache))
+
+# Compressed JSON responses for clients that accept gzip/brotli
+install_compression(app)
+
+# Graph renders as background jobs when BACKGROUND_CALLBACKS=1 (background_jobs.py)
+jobs = job_manager('demo')
 
 # Layout
 app.layout = html.Div([
     html.H1("TruEstate Bangalore Real Estate Market Dashboard"),
     dcc.Dropdown(id='graph-selector', options=graph_options, value=['handover_area'], multi=True),
+    # Progress of the background job rendering the graphs, shown while it runs
+    html.Div([html.Progress(id='graph-progress', value='0', max='1'), html.Span(id='graph-progress-label')],
+             id='graph-progress-box', style={'display': 'none'}),
     html.Div(id='graph-container')
 ])
 
-# Callback for rendering
-@app.callback(Output('graph-container', 'children'), [Input('graph-selector', 'value')])
-def update_graphs(selected_graphs):
-    graphs = []
-
-    # Handover by Area Over Time
-    if 'handover_area' in selected_graphs:
-        handover_by_area = filtered_data.groupby([filtered_data['Handover date'].dt.to_period('Q'), 'Area']).size().unstack()
-        fig_handover_area = go.Figure()
-        for area in handover_by_area.columns:
-            fig_handover_area.add_trace(go.Scatter(
-                x=handover_by_area.index.astype(str),
-                y=handover_by_area[area],
-                mode='lines+markers',
-                name=area
-            ))
-        fig_handover_area.update_layout(title="Handover by Area Over Time", xaxis_title="Time", yaxis_title="Projects")
-        graphs.append(dcc.Graph(figure=fig_handover_area))
-    
-    # New Launches by Area Over Time
-    if 'new_launches_area' in selected_graphs:
-        new_launches = filtered_data.groupby([filtered_data['Launch Date'].dt.to_period('Q'), 'Area']).size().unstack()
-        fig_new_launches = go.Figure()
-        for area in new_launches.columns:
-            fig_new_launches.add_trace(go.Scatter(
-                x=new_launches.index.astype(str),
-                y=new_launches[area],
-                mode='lines+markers',
-                name=area
-            ))
-        fig_new_launches.update_layout(title="New Launches by Area Over Time", xaxis_title="Time", yaxis_title="Projects")
-        graphs.append(dcc.Graph(figure=fig_new_launches))
-
-    # Total Project Size Over Time
-    if 'total_project_size' in selected_graphs:
-        project_size_trend = filtered_data.groupby(filtered_data['Launch Date'].dt.to_period('Q'))['Project Area (Acres)'].sum()
-        fig_project_size = go.Figure(go.Scatter(
-            x=project_size_trend.index.astype(str),
-            y=project_size_trend.values,
-            mode='lines+markers',
-            name='Total Project Size'
-        ))
-        fig_project_size.update_layout(title="Total Project Size Over Time", xaxis_title="Quarter", yaxis_title="Total Size (Acres)")
-        graphs.append(dcc.Graph(figure=fig_project_size))
-
-    # Asset Type Distribution Over Time
-    if 'asset_type_distribution' in selected_graphs:
-        asset_type_trend = filtered_data.groupby([filtered_data['Launch Date'].dt.to_period('Q'), 'Asset Type']).size().unstack()
-        fig_asset_type = go.Figure()
-        for asset_type in asset_type_trend.columns:
-            fig_asset_type.add_trace(go.Scatter(
-                x=asset_type_trend.index.astype(str),
-                y=asset_type_trend[asset_type],
-                mode='lines+markers',
-                name=f'{asset_type} Projects'
-            ))
-        fig_asset_type.update_layout(title="Asset Type Distribution Over Time", xaxis_title="Quarter", yaxis_title="Projects")
-        graphs.append(dcc.Graph(figure=fig_asset_type))
-
-    # Number of Projects by Area Over Time (Cumulative)
-    if 'projects_area_cumulative' in selected_graphs:
-        projects_trend = filtered_data.groupby([filtered_data['Launch Date'].dt.to_period('Q'), 'Area']).size().unstack().cumsum()
-        fig_projects_cumulative = go.Figure()
-        for area in projects_trend.columns:
-            fig_projects_cumulative.add_trace(go.Scatter(
-                x=projects_trend.index.astype(str),
-                y=projects_trend[area],
-                mode='lines+markers',
-                name=f'Projects in {area}'
-            ))
-        fig_projects_cumulative.update_layout(title="Number of Projects by Area Over Time (Cumulative)", xaxis_title="Quarter", yaxis_title="Cumulative Projects")
-        graphs.append(dcc.Graph(figure=fig_projects_cumulative))
-
-    # Developer Dominance in Unit Volume (Swapped Axes)
-    if 'developer_unit_volume' in selected_graphs:
-        dev_unit_counts = filtered_data.groupby('Developer Name')['Total no. of units'].sum().sort_values()
-        fig_dev_unit_volume = px.bar(
-            x=dev_unit_counts.values,
-            y=dev_unit_counts.index,
-            orientation='h',
-            title="Developer Dominance in Unit Volume (Swapped Axes)",
-            labels={'x': 'Total Units', 'y': 'Developer'}
-        )
-        graphs.append(dcc.Graph(figure=fig_dev_unit_volume))
-
-    # Time to Handover by Developer and Asset Type (Median)
-    if 'handover_time_developer' in selected_graphs:
-        handover_median = filtered_data.groupby(['Developer Name', 'Asset Type'])['Handover Time (Months)'].median().unstack()
-        fig_handover_time = go.Figure()
-        for asset_type in handover_median.columns:
-            fig_handover_time.add_trace(go.Bar(
-                x=handover_median.index,
-                y=handover_median[asset_type],
-                name=asset_type
-            ))
-        fig_handover_time.update_layout(title="Time to Handover by Developer and Asset Type (Median)", xaxis_title="Developer", yaxis_title="Median Handover Time (Months)")
-        graphs.append(dcc.Graph(figure=fig_handover_time))
-    
-    # Repeat similar setup for each specific graph option
-    # Asset Type by Area Over Time (Units) - East
-    if 'asset_type_east_units' in selected_graphs:
-        east_data = filtered_data[filtered_data['Area'] == 'East']
-        asset_type_east_units = east_data.groupby([east_data['Launch Date'].dt.to_period('Q'), 'Asset Type'])['Total no. of units'].sum().unstack()
-        fig_asset_type_east_units = go.Figure()
-        for asset_type in asset_type_east_units.columns:
-            fig_asset_type_east_units.add_trace(go.Scatter(
-                x=asset_type_east_units.index.astype(str),
-                y=asset_type_east_units[asset_type],
-                mode='lines+markers',
-                name=asset_type
-            ))
-        fig_asset_type_east_units.update_layout(title="Asset Type by Area Over Time (Units) - East", xaxis_title="Quarter", yaxis_title="Total Units")
-        graphs.append(dcc.Graph(figure=fig_asset_type_east_units))
 
-    # Asset Type by Area Over Time (Units) - South
-    if 'asset_type_south_units' in selected_graphs:
-        south_data = filtered_data[filtered_data['Area'] == 'South']
-        asset_type_south_units = south_data.groupby([south_data['Launch Date'].dt.to_period('Q'), 'Asset Type'])['Total no. of units'].sum().unstack()
-        fig_asset_type_south_units = go.Figure()
-        for asset_type in asset_type_south_units.columns:
-            fig_asset_type_south_units.add_trace(go.Scatter(
-                x=asset_type_south_units.index.astype(str),
-                y=asset_type_south_units[asset_type],
-                mode='lines+markers',
-                name=asset_type
-            ))
-        fig_asset_type_south_units.update_layout(title="Asset Type by Area Over Time (Units) - South", xaxis_title="Quarter", yaxis_title="Total Units")
-        graphs.append(dcc.Graph(figure=fig_asset_type_south_units))
-
-    # Asset Type by Area Over Time (Units) - West
-    if 'asset_type_west_units' in selected_graphs:
-        west_data = filtered_data[filtered_data['Area'] == 'West']
-        asset_type_west_units = west_data.groupby([west_data['Launch Date'].dt.to_period('Q'), 'Asset Type'])['Total no. of units'].sum().unstack()
-        fig_asset_type_west_units = go.Figure()
-        for asset_type in asset_type_west_units.columns:
-            fig_asset_type_west_units.add_trace(go.Scatter(
-                x=asset_type_west_units.index.astype(str),
-                y=asset_type_west_units[asset_type],
-                mode='lines+markers',
-                name=asset_type
-            ))
-        fig_asset_type_west_units.update_layout(title="Asset Type by Area Over Time (Units) - West", xaxis_title="Quarter", yaxis_title="Total Units")
-        graphs.append(dcc.Graph(figure=fig_asset_type_west_units))
-
-    # Developer Dominance (Total Units) - Apartment
-    if 'developer_dominance_apartment' in selected_graphs:
-        apartment_data = filtered_data[filtered_data['Asset Type'] == 'Apartment']
-        dev_apartment_units = apartment_data.groupby('Developer Name')['Total no. of units'].sum().sort_values()
-        fig_dev_apartment_units = px.bar(
-            x=dev_apartment_units.values,
-            y=dev_apartment_units.index,
-            orientation='h',
-            title="Developer Dominance (Total Units) - Apartment",
-            labels={'x': 'Total Units', 'y': 'Developer'}
-        )
-        graphs.append(dcc.Graph(figure=fig_dev_apartment_units))
-
-    # Developer Dominance (Total Units) - Plot
-    if 'developer_dominance_plot' in selected_graphs:
-        plot_data = filtered_data[filtered_data['Asset Type'] == 'Plot']
-        dev_plot_units = plot_data.groupby('Developer Name')['Total no. of units'].sum().sort_values()
-        fig_dev_plot_units = px.bar(
-            x=dev_plot_units.values,
-            y=dev_plot_units.index,
-            orientation='h',
-            title="Developer Dominance (Total Units) - Plot",
-            labels={'x': 'Total Units', 'y': 'Developer'}
-        )
-        graphs.append(dcc.Graph(figure=fig_dev_plot_units))
-
-    # Developer Dominance (Total Units) - Villa
-    if 'developer_dominance_villa' in selected_graphs:
-        villa_data = filtered_data[filtered_data['Asset Type'] == 'Villa']
-        dev_villa_units = villa_data.groupby('Developer Name')['Total no. of units'].sum().sort_values()
-        fig_dev_villa_units = px.bar(
-            x=dev_villa_units.values,
-            y=dev_villa_units.index,
-            orientation='h',
-            title="Developer Dominance (Total Units) - Villa",
-            labels={'x': 'Total Units', 'y': 'Developer'}
-        )
-        graphs.append(dcc.Graph(figure=fig_dev_villa_units))
-
-    # Apartment Configuration by Area Over Time - North
-    if 'config_north_apartment' in selected_graphs:
-        north_data = filtered_data[(filtered_data['Area'] == 'North') & (filtered_data['Asset Type'] == 'Apartment')]
-        config_north_apartment = north_data.groupby([north_data['Launch Date'].dt.to_period('Q'), 'Configuration']).size().unstack()
-        fig_config_north_apartment = go.Figure()
-        for config in config_north_apartment.columns:
-            fig_config_north_apartment.add_trace(go.Scatter(
-                x=config_north_apartment.index.astype(str),
-                y=config_north_apartment[config],
-                mode='lines+markers',
-                name=config
-            ))
-        fig_config_north_apartment.update_layout(title="Apartment Configuration by Area Over Time - North", xaxis_title="Quarter", yaxis_title="Total Units")
-        graphs.append(dcc.Graph(figure=fig_config_north_apartment))
-
-    # Apartment Configuration by Area Over Time - East
-    if 'config_east_apartment' in selected_graphs:
-        east_data = filtered_data[(filtered_data['Area'] == 'East') & (filtered_data['Asset Type'] == 'Apartment')]
-        config_east_apartment = east_data.groupby([east_data['Launch Date'].dt.to_period('Q'), 'Configuration']).size().unstack()
-        fig_config_east_apartment = go.Figure()
-        for config in config_east_apartment.columns:
-            fig_config_east_apartment.add_trace(go.Scatter(
-                x=config_east_apartment.index.astype(str),
-                y=config_east_apartment[config],
-                mode='lines+markers',
-                name=config
-            ))
-        fig_config_east_apartment.update_layout(title="Apartment Configuration by Area Over Time - East", xaxis_title="Quarter", yaxis_title="Total Units")
-        graphs.append(dcc.Graph(figure=fig_config_east_apartment))
-
-    # Apartment Configuration by Area Over Time - South
-    if 'config_south_apartment' in selected_graphs:
-        south_data = filtered_data[(filtered_data['Area'] == 'South') & (filtered_data['Asset Type'] == 'Apartment')]
-        config_south_apartment = south_data.groupby([south_data['Launch Date'].dt.to_period('Q'), 'Configuration']).size().unstack()
-        fig_config_south_apartment = go.Figure()
-        for config in config_south_apartment.columns:
-            fig_config_south_apartment.add_trace(go.Scatter(
-                x=config_south_apartment.index.astype(str),
-                y=config_south_apartment[config],
-                mode='lines+markers',
-                name=config
-            ))
-        fig_config_south_apartment.update_layout(title="Apartment Configuration by Area Over Time - South", xaxis_title="Quarter", yaxis_title="Total Units")
-        graphs.append(dcc.Graph(figure=fig_config_south_apartment))
-
-    # Apartment Configuration by Area Over Time - West
-    if 'config_west_apartment' in selected_graphs:
-        west_data = filtered_data[(filtered_data['Area'] == 'West') & (filtered_data['Asset Type'] == 'Apartment')]
-        config_west_apartment = west_data.groupby([west_data['Launch Date'].dt.to_period('Q'), 'Configuration']).size().unstack()
-        fig_config_west_apartment = go.Figure()
-        for config in config_west_apartment.columns:
-            fig_config_west_apartment.add_trace(go.Scatter(
-                x=config_west_apartment.index.astype(str),
-                y=config_west_apartment[config],
-                mode='lines+markers',
-                name=config
-            ))
-        fig_config_west_apartment.update_layout(title="Apartment Configuration by Area Over Time - West", xaxis_title="Quarter", yaxis_title="Total Units")
-        graphs.append(dcc.Graph(figure=fig_config_west_apartment))
-
-    return graphs
+def graph_selection_label(selected_graphs):
+    # Metrics label: the graph itself for single selections, else 'multi'
+    selected_graphs = selected_graphs or []
+    return selected_graphs[0] if len(selected_graphs) == 1 else 'multi'
+
+
+# Callback for rendering; one progress step per selected graph's input, and the figures
+@app.callback(
+    Output('graph-container', 'children'), [Input('graph-selector', 'value')],
+    **job_options(
+        jobs,
+        progress=[Output('graph-progress', 'value'), Output('graph-progress', 'max'),
+                  Output('graph-progress-label', 'children')],
+        running=[(Output('graph-progress-box', 'style'), {}, {'display': 'none'})]
+    )
+)
+@reporting_progress(jobs, lambda selected_graphs: len(selected_graphs or []) + 1,
+                    lambda done, total: f' {done} of {total} steps')
+@instrument_callback(metrics_registry, graph_selection_label)
+@memoize_callback(result_cache, lambda: data_version)
+def update_graphs(selected_graphs):
+    return planner.build(selected_graphs)
+
+
+# Zooming into a dense graph re-fetches the visible range at higher resolution
+@app.callback(
+    Output(graph_id(MATCH), 'figure'),
+    [Input(graph_id(MATCH), 'relayoutData')],
+    [State(graph_id(MATCH), 'id')],
+    prevent_initial_call=True
+)
+@instrument_callback(metrics_registry, lambda relayout, graph: graph['index'])
+def refine_graph(relayout, graph):
+    # Autosize, legend and drag-mode events leave the x axis alone; nothing to compute
+    handled, _ = zoom_window(relayout)
+    if not handled:
+        raise PreventUpdate
+    patch = zoom_patch(planner.figure(GRAPHS_BY_VALUE[graph['index']]), relayout)
+    if patch is None:
+        raise PreventUpdate
+    return patch
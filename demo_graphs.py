@@ -0,0 +1,286 @@
+import os
+
+import numpy as np
+import pandas as pd
+from dash import dcc
+
+from component_pool import build_components
+from cube import PROJECTS
+from decimation import prepare_figure
+from figure_dicts import axis_title, express_figure, figure
+from heavy_hitters import top_k
+from metrics import current_timer
+from prefix_sums import PrefixSumTable
+
+# Declarative registry of the demo.py graphs. Each entry names its slice of the
+# data (filter), the axis it is plotted along (dimension), the column that
+# splits it into traces (series), the measure and the chart type; the planner
+# computes every derived column, slice and aggregate once and feeds all
+# selected graphs from them.
+
+UNITS = 'Total no. of units'
+LAUNCH_QUARTER = 'Launch Quarter'
+HANDOVER_QUARTER = 'Handover Quarter'
+
+# Developers the horizontal bar graphs show, the leaders by units; 0 shows all
+DEMO_TOP_DEVELOPERS = int(os.environ.get('DEMO_TOP_DEVELOPERS', 0))
+
+AREAS = ['North', 'East', 'South', 'West']
+ASSET_TYPES = ['Apartment', 'Plot', 'Villa']
+
+
+def _graph(value, label, chart, dimension=None, series=None, measure=None, agg='size', filter=None,
+           x_title=None, y_title=None, name='{}'):
+    # measure=None counts projects; the title is always the option label
+    return {
+        'value': value, 'label': label, 'chart': chart, 'dimension': dimension, 'series': series,
+        'measure': measure, 'agg': agg, 'filter': tuple(sorted((filter or {}).items())),
+        'x_title': x_title, 'y_title': y_title, 'name': name,
+    }
+
+
+GRAPH_REGISTRY = [
+    _graph('handover_area', 'Handover by Area Over Time', 'lines',
+           dimension=HANDOVER_QUARTER, series='Area', x_title='Time', y_title='Projects'),
+    _graph('new_launches_area', 'New Launches by Area Over Time', 'lines',
+           dimension=LAUNCH_QUARTER, series='Area', x_title='Time', y_title='Projects'),
+    _graph('total_project_size', 'Total Project Size Over Time', 'lines',
+           dimension=LAUNCH_QUARTER, measure='Project Area (Acres)', agg='sum',
+           x_title='Quarter', y_title='Total Size (Acres)', name='Total Project Size'),
+    _graph('asset_type_distribution', 'Asset Type Distribution Over Time', 'lines',
+           dimension=LAUNCH_QUARTER, series='Asset Type', x_title='Quarter', y_title='Projects', name='{} Projects'),
+    _graph('projects_area_cumulative', 'Number of Projects by Area Over Time (Cumulative)', 'cumulative_lines',
+           dimension=LAUNCH_QUARTER, series='Area', x_title='Quarter', y_title='Cumulative Projects', name='Projects in {}'),
+    _graph('developer_unit_volume', 'Developer Dominance in Unit Volume (Swapped Axes)', 'hbar',
+           dimension='Developer Name', measure=UNITS, agg='sum'),
+    _graph('handover_time_developer', 'Time to Handover by Developer and Asset Type (Median)', 'bars',
+           dimension='Developer Name', series='Asset Type', measure='Handover Time (Months)', agg='median',
+           x_title='Developer', y_title='Median Handover Time (Months)'),
+    _graph('total_units_area', 'Total Number of Units by Area Over Time', 'lines',
+           dimension=LAUNCH_QUARTER, series='Area', measure=UNITS, agg='sum', x_title='Quarter', y_title='Total Units'),
+]
+
+# More specific graphs for each area and configuration
+for area in AREAS:
+    GRAPH_REGISTRY.append(_graph(
+        f'asset_type_{area.lower()}_units', f'Asset Type by Area Over Time (Units) - {area}', 'lines',
+        dimension=LAUNCH_QUARTER, series='Asset Type', measure=UNITS, agg='sum', filter={'Area': area},
+        x_title='Quarter', y_title='Total Units'))
+for area in AREAS:
+    GRAPH_REGISTRY.append(_graph(
+        f'asset_type_{area.lower()}_projects', f'Asset Type by Area Over Time (Projects) - {area}', 'lines',
+        dimension=LAUNCH_QUARTER, series='Asset Type', filter={'Area': area},
+        x_title='Quarter', y_title='Projects'))
+
+# Developer Dominance by Asset Type and Area
+for asset_type in ASSET_TYPES:
+    GRAPH_REGISTRY.append(_graph(
+        f'developer_dominance_{asset_type.lower()}', f'Developer Dominance (Total Units) - {asset_type}', 'hbar',
+        dimension='Developer Name', measure=UNITS, agg='sum', filter={'Asset Type': asset_type}))
+
+# Configuration breakdown by area over time
+for area in AREAS:
+    GRAPH_REGISTRY.append(_graph(
+        f'config_{area.lower()}_apartment', f'Apartment Configuration by Area Over Time - {area}', 'lines',
+        dimension=LAUNCH_QUARTER, series='Configuration', filter={'Area': area, 'Asset Type': 'Apartment'},
+        x_title='Quarter', y_title='Total Units'))
+
+GRAPHS_BY_VALUE = {spec['value']: spec for spec in GRAPH_REGISTRY}
+
+# Derived period columns and the date columns they are the quarter of
+QUARTER_COLUMNS = {LAUNCH_QUARTER: 'Launch Date', HANDOVER_QUARTER: 'Handover date'}
+
+
+def graph_id(value):
+    return {'type': 'demo-graph', 'index': value}
+
+
+graph_options = [{'label': spec['label'], 'value': spec['value']} for spec in GRAPH_REGISTRY]
+
+
+class GraphPlanner:
+    # Derived columns are added once at load; slices and aggregates are computed
+    # the first time a graph needs them and shared by every later graph/request.
+
+    def __init__(self, data=None, engine=None):
+        # SQL engine every aggregate is pushed down to (query_backends.py), in
+        # which case no frame is kept here; None computes them from `data`
+        self.engine = engine
+        self.data = None
+        if engine is None:
+            self.data = data.assign(**{
+                period: data[column].dt.to_period('Q') for period, column in QUARTER_COLUMNS.items()
+            })
+        self._slices = {}
+        self._aggregates = {}
+        self._prefix = {}
+
+    def slice(self, filter):
+        frame = self._slices.get(filter)
+        if frame is None:
+            with current_timer().phase('filter'):
+                frame = self.data
+                if filter:
+                    mask = np.ones(len(frame), dtype=bool)
+                    for column, value in filter:
+                        mask &= (frame[column] == value).to_numpy()
+                    frame = frame[mask]
+            self._slices[filter] = frame
+        return frame
+
+    def aggregate(self, spec):
+        key = (spec['filter'], spec['dimension'], spec['series'], spec['measure'], spec['agg'])
+        result = self._aggregates.get(key)
+        timer = current_timer()
+        if result is None:
+            with timer.phase('aggregate'):
+                keys = [spec['dimension']] + ([spec['series']] if spec['series'] else [])
+                if self.engine is not None:
+                    result = self.engine.grouped(spec['filter'], keys, spec['measure'], spec['agg'])
+                else:
+                    grouped = self.slice(spec['filter']).groupby(keys)
+                    result = grouped.size() if spec['measure'] is None else grouped[spec['measure']].agg(spec['agg'])
+                    if spec['series']:
+                        result = result.unstack()
+            self._aggregates[key] = result
+        timer.rows = (timer.rows or 0) + len(result)
+        return result
+
+    def prefix_table(self, spec):
+        # Launch counts per series member along the quarter axis, for cumulative curves
+        key = (spec['filter'], spec['dimension'], spec['series'])
+        entry = self._prefix.get(key)
+        if entry is None and self.engine is not None:
+            with current_timer().phase('aggregate'):
+                # Launches per (quarter, member) cell, counted by the engine; the
+                # quarter axis includes quarters whose rows have no series value
+                quarters = pd.PeriodIndex(self.engine.grouped(spec['filter'], [spec['dimension']], None, 'size').index)
+                counts = self.engine.grouped(spec['filter'], [spec['dimension'], spec['series']], None, 'size')
+                quarter_idx, member_idx = np.nonzero(counts.fillna(0).to_numpy())
+                table = PrefixSumTable(
+                    spec['series'], counts.columns, len(quarters), member_idx,
+                    quarters.get_indexer(counts.index[quarter_idx]),
+                    {PROJECTS: counts.to_numpy()[quarter_idx, member_idx]}
+                )
+            entry = self._prefix[key] = (table, quarters)
+        elif entry is None:
+            with current_timer().phase('aggregate'):
+                frame = self.slice(spec['filter'])
+                periods = frame[spec['dimension']]
+                quarters = pd.PeriodIndex(periods.dropna().unique()).sort_values()
+                members = pd.Categorical(frame[spec['series']])
+                table = PrefixSumTable(
+                    spec['series'], members.categories, len(quarters), members.codes,
+                    quarters.get_indexer(periods), {PROJECTS: np.ones(len(frame))}
+                )
+            entry = self._prefix[key] = (table, quarters)
+        return entry
+
+    def plan(self, selected_graphs):
+        # Selected graphs in registry order, whatever order they were picked in
+        selected = set(selected_graphs or [])
+        return [spec for spec in GRAPH_REGISTRY if spec['value'] in selected]
+
+    def build(self, selected_graphs):
+        # Inputs come from the shared caches one graph at a time; the figures
+        # themselves are independent and go to the component pool together.
+        # Dense series go out as WebGL and decimated; demo.py re-fetches them on zoom
+        plan = self.plan(selected_graphs)
+        timer = current_timer()
+        inputs = []
+        for spec in plan:
+            inputs.append(self.chart_input(spec))
+            timer.mark('inputs')
+        with timer.phase('figures'):
+            figures = build_components([(CHART_BUILDERS[spec['chart']], (spec, result))
+                                        for spec, result in zip(plan, inputs)])
+        return [
+            dcc.Graph(id=graph_id(spec['value']), figure=prepare_figure(figure))
+            for spec, figure in zip(plan, figures)
+        ]
+
+    def chart_input(self, spec):
+        return CHART_INPUTS[spec['chart']](self, spec)
+
+    def figure(self, spec):
+        # One graph's full-resolution plotly JSON
+        result = self.chart_input(spec)
+        with current_timer().phase('figures'):
+            return CHART_BUILDERS[spec['chart']](spec, result)
+
+
+def _cumulative_frame(planner, spec):
+    table, quarters = planner.prefix_table(spec)
+    cumulative = table.cumulative(0, len(quarters) - 1, PROJECTS)
+    present = table.cells[PROJECTS] > 0
+    has_launches = present.any(axis=0)
+    return pd.DataFrame(
+        np.where(present, cumulative, np.nan)[:, has_launches].T,
+        index=quarters[has_launches],
+        columns=table.members
+    )
+
+
+def _sorted_aggregate(planner, spec):
+    # Ascending, so the largest bar is drawn on top. With DEMO_TOP_DEVELOPERS
+    # only the leaders are selected and sorted, not every developer.
+    result = planner.aggregate(spec)
+    if 0 < DEMO_TOP_DEVELOPERS < len(result):
+        return result.iloc[top_k(result.to_numpy(), DEMO_TOP_DEVELOPERS)[::-1]]
+    return result.sort_values()
+
+
+# Figure builders take the spec and its input and return plotly JSON, built as
+# dicts (see figure_dicts); they are module-level so component_pool can run
+# them on worker threads or processes
+
+
+def _titled_layout(spec):
+    return {
+        'title': {'text': spec['label']},
+        'xaxis': {'title': axis_title(spec['x_title'])},
+        'yaxis': {'title': axis_title(spec['y_title'])},
+    }
+
+
+def _line_figure(spec, result):
+    x = result.index.astype(str).to_numpy()
+    if isinstance(result, pd.DataFrame):
+        data = [
+            {'mode': 'lines+markers', 'name': spec['name'].format(member), 'x': x,
+             'y': result[member].to_numpy(), 'type': 'scatter'}
+            for member in result.columns
+        ]
+    else:
+        data = [{'mode': 'lines+markers', 'name': spec['name'], 'x': x, 'y': result.to_numpy(), 'type': 'scatter'}]
+    return figure(data, _titled_layout(spec))
+
+
+def _hbar_figure(spec, result):
+    frame = pd.DataFrame({'x': result.to_numpy(), 'y': result.index.to_numpy()})
+    return express_figure('bar', frame, x='x', y='y', orientation='h', title=spec['label'],
+                          labels={'x': 'Total Units', 'y': 'Developer'})
+
+
+def _bar_figure(spec, result):
+    x = result.index.to_numpy()
+    data = [
+        {'name': spec['name'].format(member), 'x': x, 'y': result[member].to_numpy(), 'type': 'bar'}
+        for member in result.columns
+    ]
+    return figure(data, _titled_layout(spec))
+
+
+CHART_INPUTS = {
+    'lines': GraphPlanner.aggregate,
+    'cumulative_lines': _cumulative_frame,
+    'hbar': _sorted_aggregate,
+    'bars': GraphPlanner.aggregate,
+}
+
+CHART_BUILDERS = {
+    'lines': _line_figure,
+    'cumulative_lines': _line_figure,
+    'hbar': _hbar_figure,
+    'bars': _bar_figure,
+}
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+# Figures as plain plotly JSON dicts, without building graph objects. The
+# dashboards only use a handful of chart types with fixed options, so the
+# traces plotly express would emit for them are written out directly from the
+# frame's numpy arrays, and styling comes from shared layout dicts. Nothing is
+# validated on the way: the property names and values below are the ones
+# plotly itself produces for these charts, so what is rendered is unchanged.
+
+# The default template, resolved once and shared by every figure
+TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+COLORWAY = TEMPLATE['layout']['colorway']
+
+
+def merge_layout(layout, *updates):
+    # Nested merge, like Figure.update_layout on dicts: later values win
+    merged = dict(layout)
+    for update in updates:
+        for key, value in update.items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = merge_layout(merged[key], value)
+            else:
+                merged[key] = value
+    return merged
+
+
+def figure(data, layout):
+    return {'data': data, 'layout': dict(layout, template=TEMPLATE)}
+
+
+def _groups(frame, color):
+    # (member, row positions) per distinct `color` value, in order of first appearance
+    if color is None:
+        return [(None, slice(None))]
+    codes, members = pd.factorize(frame[color])
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(members) + 1))
+    return [(member, order[bounds[i]:bounds[i + 1]]) for i, member in enumerate(members)]
+
+
+def _cartesian_trace(kind, member, color_index, markers, orientation):
+    color = COLORWAY[color_index % len(COLORWAY)]
+    if kind == 'bar':
+        return {
+            'alignmentgroup': 'True', 'marker': {'color': color, 'pattern': {'shape': ''}},
+            'offsetgroup': member, 'orientation': orientation, 'textposition': 'auto', 'type': 'bar',
+        }
+    if kind == 'area':
+        return {
+            'fillpattern': {'shape': ''}, 'line': {'color': color}, 'marker': {'symbol': 'circle'},
+            'mode': 'lines', 'orientation': orientation, 'stackgroup': '1', 'type': 'scatter',
+        }
+    return {
+        'line': {'color': color, 'dash': 'solid'}, 'marker': {'symbol': 'circle'},
+        'mode': 'lines+markers' if markers else 'lines', 'orientation': orientation, 'type': 'scatter',
+    }
+
+
+def express_figure(kind, frame, x=None, y=None, color=None, title=None, markers=False, orientation='v',
+                   values=None, names=None, labels=None):
+    # The dict px.<kind>(frame, ...) turns into for kind in line, bar, area and
+    # pie, one trace per `color` member
+    labels = labels or {}
+    label = lambda column: labels.get(column, column)
+    layout = {'legend': {'tracegroupgap': 0}, 'title': {'text': title}}
+
+    if kind == 'pie':
+        data = [{
+            'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+            'hovertemplate': f'{label(names)}=%{{label}}<br>{label(values)}=%{{value}}<extra></extra>',
+            'labels': frame[names].to_numpy(), 'legendgroup': '', 'name': '', 'showlegend': True,
+            'values': frame[values].to_numpy(), 'type': 'pie',
+        }]
+        return figure(data, layout)
+
+    xs, ys = frame[x].to_numpy(), frame[y].to_numpy()
+    hover = f'{label(x)}=%{{x}}<br>{label(y)}=%{{y}}<extra></extra>'
+    data = []
+    for i, (member, rows) in enumerate(_groups(frame, color)):
+        name = '' if member is None else str(member)
+        trace = _cartesian_trace(kind, name, i, markers, orientation)
+        trace.update({
+            'hovertemplate': hover if member is None else f'{label(color)}={member}<br>{hover}',
+            'legendgroup': name, 'name': name, 'showlegend': member is not None,
+            'x': xs[rows], 'xaxis': 'x', 'y': ys[rows], 'yaxis': 'y',
+        })
+        data.append(trace)
+
+    layout['xaxis'] = {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': label(x)}}
+    layout['yaxis'] = {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': label(y)}}
+    if color is not None:
+        layout['legend']['title'] = {'text': label(color)}
+    if kind == 'bar':
+        layout['barmode'] = 'relative'
+    return figure(data, layout)
+
+
+def axis_title(text):
+    # go.Layout leaves an empty title object behind for a None title
+    return {} if text is None else {'text': text}
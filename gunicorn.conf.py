@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+
+# Production settings for serving the dashboard under gunicorn (see Procfile).
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+
+# Load the app, and with it the memory-mapped snapshot and the cube, once in the
+# master before forking; workers share those pages read-only instead of each
+# parsing and holding their own copy.
+preload_app = True
+
+accesslog = '-'
+
+# Workers flush their metrics here so /metrics on any worker reports all of them
+os.environ.setdefault('METRICS_DIR', os.path.join(os.environ.get('TMPDIR', '/tmp'), 'dashboard-metrics'))
+
+# Callback results computed by any worker are served to all of them from here;
+# the store survives restarts, minus rows of datasets no longer loaded
+os.environ.setdefault('RESULT_STORE_DIR', os.path.join(os.environ.get('TMPDIR', '/tmp'), 'dashboard-results'))
+
+
+def on_starting(server):
+    # Start every deployment from empty histograms
+    metrics_dir = os.environ['METRICS_DIR']
+    if os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            os.remove(os.path.join(metrics_dir, name))
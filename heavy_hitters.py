@@ -0,0 +1,262 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import PROJECTS, UNITS
+
+# Top-K rankings of one dimension's members by units, e.g. the DEVELOPER view's
+# top 20 developers plus "Other Developers". Rankings come from per-member
+# totals by partial selection, so only the K leaders are ever sorted, never the
+# whole member list. MemberRankings keeps the whole-axis totals and rankings of
+# every (Area, Asset Type) cell at load and moves them forward with each
+# incremental update; windowed queries rank the sliced cube in one pass. Above
+# HEAVY_HITTERS_EXACT_MAX members that pass is approximate (a Misra-Gries
+# summary), with the error bound reported alongside the ranking.
+
+# Leaders a ranking keeps, the DEVELOPER view's top 20
+HEAVY_HITTERS_K = int(os.environ.get('HEAVY_HITTERS_K', 20))
+# Members above which windowed rankings are summarized instead of counted exactly
+HEAVY_HITTERS_EXACT_MAX = int(os.environ.get('HEAVY_HITTERS_EXACT_MAX', 1_000_000))
+# Counters the approximate summary keeps; more counters, smaller error
+HEAVY_HITTERS_COUNTERS = int(os.environ.get('HEAVY_HITTERS_COUNTERS', 4096))
+# Cube rows merged into the summary at a time
+HEAVY_HITTERS_CHUNK_ROWS = 65536
+# Memory the per-cell totals MemberRankings keeps may take; beyond it every
+# ranking is computed per query
+RANKINGS_MAX_BYTES = int(os.environ.get('RANKINGS_MAX_BYTES', 64 * 1024 * 1024))
+
+
+def top_k(values, k):
+    # Positions of the `k` largest values, largest first and ties in position
+    # order, without sorting the rest: one partition finds the k-th largest, and
+    # only the values at or above it are sorted
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        threshold = np.partition(values, n - k)[n - k]
+        candidates = np.flatnonzero(values >= threshold)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order[:k]]
+
+
+class Ranking:
+    # The `k` members with the most units, largest first, and what all members
+    # add up to. `count` and `minimum` (the member with the fewest units above
+    # zero, as (member, units)) are None for approximate rankings, whose leaders'
+    # units are lower bounds at most `error` below the true totals.
+
+    def __init__(self, dimension, members, units, k, total, count, minimum, error=0.0):
+        leaders = top_k(units, k)
+        self.top = pd.DataFrame({
+            dimension: np.asarray(members[leaders], dtype=object),
+            UNITS: units[leaders],
+        })
+        self.total = total
+        self.count = count
+        self.minimum = minimum
+        self.error = error
+
+    @property
+    def remainder(self):
+        # Units of the members outside the top
+        return self.total - self.top[UNITS].sum()
+
+    @classmethod
+    def exact(cls, dimension, members, units, present, k):
+        # From every member's total; `present` marks members with any projects
+        positions = np.flatnonzero(present)
+        values = units[positions]
+        minimum = None
+        positive = np.flatnonzero(values > 0)
+        if len(positive):
+            # Last of the smallest, as it would come last in the descending order
+            lowest = positive[values[positive] == values[positive].min()][-1]
+            minimum = (members[positions[lowest]], values[lowest])
+        return cls(dimension, members[positions], values, k, values.sum(), len(positions), minimum)
+
+    @classmethod
+    def from_totals(cls, totals, dimension, k):
+        # From a units_by([dimension]) frame
+        return cls.exact(dimension, pd.Index(totals[dimension]), totals[UNITS].to_numpy(),
+                         np.ones(len(totals), dtype=bool), k)
+
+
+def rank_cube(cube, dimension, k, counters=HEAVY_HITTERS_COUNTERS):
+    # Ranking of the (sliced) cube's `dimension` members in one pass over its
+    # rows: bincounts into per-member totals, or a Misra-Gries summary when the
+    # dimension has more than HEAVY_HITTERS_EXACT_MAX members
+    members = cube[dimension].cat.categories
+    codes = cube[dimension].cat.codes.to_numpy()
+    units = np.nan_to_num(cube[UNITS].to_numpy(dtype='float64'))
+    if len(members) <= HEAVY_HITTERS_EXACT_MAX or (units < 0).any():
+        # The summary's bound only holds for non-negative weights
+        totals = np.bincount(codes, weights=units, minlength=len(members))
+        present = np.bincount(codes, weights=cube[PROJECTS].to_numpy(), minlength=len(members)) > 0
+        return Ranking.exact(dimension, members, totals, present, k)
+    keys, estimates, error = misra_gries(codes, units, counters)
+    return Ranking(dimension, members[keys], estimates, k, units.sum(), None, None, error)
+
+
+def misra_gries(keys, weights, counters, chunk_rows=HEAVY_HITTERS_CHUNK_ROWS):
+    # Weighted Misra-Gries summary of a stream of (key, weight >= 0) pairs,
+    # merged a chunk at a time: the summary and the chunk are added up per key
+    # and, when more than `counters` keys remain, every total drops by the
+    # (counters + 1)-th largest, which leaves at most `counters` positive.
+    # Returns (keys, estimates, error): each estimate is at most `error` below
+    # the key's true total, error <= sum(weights) / (counters + 1), and every key
+    # whose total exceeds `error` is kept.
+    summary_keys = np.zeros(0, dtype=np.int64)
+    summary_weights = np.zeros(0)
+    error = 0.0
+    for first in range(0, len(keys), chunk_rows):
+        merged_keys, inverse = np.unique(
+            np.concatenate([summary_keys, keys[first:first + chunk_rows]]), return_inverse=True
+        )
+        merged = np.bincount(inverse, weights=np.concatenate([summary_weights, weights[first:first + chunk_rows]]))
+        if len(merged) > counters:
+            cut = np.partition(merged, len(merged) - counters - 1)[len(merged) - counters - 1]
+            merged = merged - cut
+            error += cut
+            kept = merged > 0
+            merged_keys, merged = merged_keys[kept], merged[kept]
+        summary_keys, summary_weights = merged_keys, merged
+    return summary_keys, summary_weights, error
+
+
+class MemberRankings:
+    # Whole-axis units and project counts of every `dimension` member in each
+    # (Area, Asset Type) cell of the cube, with the all-areas and all-types
+    # margins, and the top-K ranking of each cell and margin, selected at load.
+    # Any area and asset type selection over the whole quarter axis is then a
+    # lookup, or a sum of the selected cells' totals and one partial selection.
+
+    def __init__(self, cube, dimension='Developer Name', k=HEAVY_HITTERS_K, cells=None):
+        self.dimension = dimension
+        self.k = k
+        self.axes = [cube['Area'].cat.categories, cube['Asset Type'].cat.categories, cube[dimension].cat.categories]
+        if cells is None:
+            cells = self._cells(cube, self.axes)
+        # Units and projects, shaped (areas + 1, asset types + 1, members); the
+        # last area and asset type are the margins
+        self.units, self.projects = cells
+        self._rankings = {}
+        for area in range(len(self.axes[0]) + 1):
+            for asset_type in range(len(self.axes[1]) + 1):
+                self._rankings[area, asset_type] = self._rank([area], [asset_type], None, k)
+
+    @staticmethod
+    def fits(cube, dimension='Developer Name'):
+        # Whether the totals stay within RANKINGS_MAX_BYTES
+        sizes = [len(cube[column].cat.categories) for column in ['Area', 'Asset Type']]
+        cells = (sizes[0] + 1) * (sizes[1] + 1) * len(cube[dimension].cat.categories)
+        return 2 * 8 * cells <= RANKINGS_MAX_BYTES
+
+    def _cells(self, cube, axes, sign=1):
+        # Per-cell totals of `cube`'s rows on the given axes, margins included;
+        # rows whose labels aren't on the axes are left out
+        shape = tuple(len(axis) for axis in axes)
+        positions = [axis.get_indexer(cube[column].astype(object))
+                     for axis, column in zip(axes, ['Area', 'Asset Type', self.dimension])]
+        keep = (positions[0] >= 0) & (positions[1] >= 0) & (positions[2] >= 0)
+        flat = np.ravel_multi_index([position[keep] for position in positions], shape)
+        cells = []
+        for measure in [UNITS, PROJECTS]:
+            values = sign * np.nan_to_num(cube[measure].to_numpy(dtype='float64')[keep])
+            counts = np.bincount(flat, weights=values, minlength=int(np.prod(shape))).reshape(shape)
+            cells.append(self._with_margins(counts))
+        return cells
+
+    @staticmethod
+    def _with_margins(counts):
+        areas, asset_types, members = counts.shape
+        cells = np.zeros((areas + 1, asset_types + 1, members))
+        cells[:areas, :asset_types] = counts
+        cells[areas, :asset_types] = counts.sum(axis=0)
+        cells[:areas, asset_types] = counts.sum(axis=1)
+        cells[areas, asset_types] = counts.sum(axis=(0, 1))
+        return cells
+
+    def _positions(self, axis, values):
+        # Cells selected on an axis: the margin when nothing is selected
+        if not values:
+            return [len(self.axes[axis])]
+        positions = self.axes[axis].get_indexer(list(values))
+        return list(positions[positions >= 0])
+
+    def _rank(self, areas, asset_types, members, k):
+        units = self.units[np.ix_(areas, asset_types)].sum(axis=(0, 1))
+        present = self.projects[np.ix_(areas, asset_types)].sum(axis=(0, 1)) > 0
+        if members is not None:
+            selected = np.zeros(len(present), dtype=bool)
+            positions = self.axes[2].get_indexer(list(members))
+            selected[positions[positions >= 0]] = True
+            present &= selected
+        return Ranking.exact(self.dimension, self.axes[2], units, present, k)
+
+    def ranking(self, areas, members, asset_types, k):
+        # Ranking over the whole quarter axis under the dashboard's filters
+        areas, asset_types = self._positions(0, areas), self._positions(1, asset_types)
+        if not members and k == self.k and len(areas) == 1 and len(asset_types) == 1:
+            return self._rankings[areas[0], asset_types[0]]
+        return self._rank(areas, asset_types, members or None, k)
+
+    def updated(self, cube, added, removed):
+        # Rankings after `added` rows came in and `removed` rows went out, with
+        # `cube` the cube after the change. The totals move by the changed rows'
+        # cells; only the cells and margins they fall into are ranked again.
+        axes = [cube['Area'].cat.categories, cube['Asset Type'].cat.categories, cube[self.dimension].cat.categories]
+        units, projects = [np.zeros((len(axes[0]), len(axes[1]), len(axes[2]))) for _ in range(2)]
+        # Old totals onto the new axes; members that left have no units left
+        old = [axis.get_indexer(previous) for axis, previous in zip(axes, self.axes)]
+        kept = [np.flatnonzero(positions >= 0) for positions in old]
+        target = np.ix_(*[positions[rows] for positions, rows in zip(old, kept)])
+        source = np.ix_(*kept)
+        units[target] = self.units[:-1, :-1][source]
+        projects[target] = self.projects[:-1, :-1][source]
+        cells = [self._with_margins(units), self._with_margins(projects)]
+
+        touched = set()
+        for frame, sign in [(added, 1), (removed, -1)]:
+            if not len(frame):
+                continue
+            delta = frame.groupby(['Area', 'Asset Type', self.dimension], observed=True).agg(**{
+                UNITS: (UNITS, 'sum'), PROJECTS: (UNITS, 'size'),
+            }).reset_index()
+            for total, change in zip(cells, self._cells(delta, axes, sign)):
+                total += change
+            touched |= set(zip(axes[0].get_indexer(delta['Area'].astype(object)),
+                               axes[1].get_indexer(delta['Asset Type'].astype(object))))
+
+        rankings = MemberRankings.__new__(MemberRankings)
+        rankings.dimension, rankings.k, rankings.axes = self.dimension, self.k, axes
+        rankings.units, rankings.projects = cells
+        rankings._rankings = {}
+        areas, asset_types = len(axes[0]), len(axes[1])
+        touched = {(area, asset_type) for area, asset_type in touched if area >= 0 and asset_type >= 0}
+        touched |= {(area, asset_types) for area, _ in touched} | {(areas, asset_type) for _, asset_type in touched}
+        touched.add((areas, asset_types))
+        for area in range(areas + 1):
+            for asset_type in range(asset_types + 1):
+                labels = (axes[0][area] if area < areas else None, axes[1][asset_type] if asset_type < asset_types else None)
+                previous = self._cell(*labels)
+                if (area, asset_type) in touched or previous is None:
+                    rankings._rankings[area, asset_type] = rankings._rank([area], [asset_type], None, self.k)
+                else:
+                    rankings._rankings[area, asset_type] = self._rankings[previous]
+        return rankings
+
+    def _cell(self, area, asset_type):
+        # Key of the cell for these labels (None: the margin), None if absent
+        positions = []
+        for axis, label in [(self.axes[0], area), (self.axes[1], asset_type)]:
+            if label is None:
+                positions.append(len(axis))
+            elif label in axis:
+                positions.append(axis.get_loc(label))
+            else:
+                return None
+        return tuple(positions)
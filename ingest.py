@@ -0,0 +1,266 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from openpyxl import load_workbook
+
+# Streaming workbook ingestion. Rows are read from the sheet in read-only mode
+# and handled a chunk at a time: categorical columns are normalized through
+# lookup tables (each distinct raw value is normalized once), and cleaned chunks
+# are staged as Arrow files before being written out as one Feather file. Peak
+# memory is set by the chunk size, not by the size of the sheet.
+
+DEFAULT_CHUNK_ROWS = int(os.environ.get('INGEST_CHUNK_ROWS', 50_000))
+
+# Cell text pd.read_excel reads as missing by default
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null',
+}
+
+
+def _column_names(header_row):
+    # Same naming as pd.read_excel: blank headers become "Unnamed: i" and
+    # repeated ones get ".1", ".2" suffixes
+    names, seen = [], {}
+    for i, value in enumerate(header_row):
+        name = f'Unnamed: {i}' if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _cell(value):
+    # Cell conversions pd.read_excel applies: NA text is missing and integral
+    # floats are ints
+    if type(value) is str:
+        return None if value in NA_STRINGS else value
+    if type(value) is float and value.is_integer():
+        return int(value)
+    return value
+
+
+def _chunk_frame(rows, columns):
+    width = len(columns)
+    padding = (None,) * width
+    rows = [tuple(_cell(value) for value in row[:width]) + padding[len(row):] for row in rows]
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def iter_sheet_chunks(source, sheet_name=0, header=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Yields DataFrames of at most `chunk_rows` rows; always at least one, so an
+    # empty sheet still produces its columns
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            sheet = workbook.worksheets[sheet_name]
+        else:
+            sheet = workbook[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        for _ in range(header):
+            next(rows, None)
+        header_row = list(next(rows, ()))
+        # Formatted but empty cells past the last heading aren't columns
+        while header_row and header_row[-1] is None:
+            header_row.pop()
+        columns = _column_names(header_row)
+
+        chunk, emitted = [], False
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                yield _chunk_frame(chunk, columns)
+                chunk, emitted = [], True
+        if chunk or not emitted:
+            yield _chunk_frame(chunk, columns)
+    finally:
+        workbook.close()
+
+
+class CategoryLookup:
+    # Raw cell value -> code of its normalized category. `normalize` returns the
+    # category for a raw value (missing cells arrive as NaN) or None to drop the
+    # row, which is encoded as -1.
+
+    def __init__(self, normalize):
+        self.normalize = normalize
+        self.categories = []
+        self._codes = {}
+        self._raw_codes = {}
+
+    def _code(self, raw):
+        code = self._raw_codes.get(raw)
+        if code is None:
+            category = self.normalize(raw)
+            if category is None:
+                code = -1
+            else:
+                code = self._codes.get(category)
+                if code is None:
+                    code = self._codes[category] = len(self.categories)
+                    self.categories.append(category)
+            self._raw_codes[raw] = code
+        return code
+
+    def encode(self, values):
+        raw_codes, uniques = pd.factorize(values)
+        # The extra last slot is what factorize's -1 (missing) indexes
+        table = np.empty(len(uniques) + 1, dtype=np.int32)
+        for i, raw in enumerate(uniques):
+            table[i] = self._code(raw)
+        table[-1] = self._code(np.nan)
+        return table[raw_codes]
+
+    def dictionary(self, used_codes):
+        # Sorted categories among `used_codes`, as astype('category') would give,
+        # and the array remapping lookup codes onto them
+        used = sorted(set(int(code) for code in used_codes if code >= 0), key=lambda code: self.categories[code])
+        remap = np.full(len(self.categories), -1, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        return remap, [self.categories[code] for code in used]
+
+    def categorical(self, codes):
+        remap, categories = self.dictionary(np.unique(codes))
+        return pd.Categorical.from_codes(remap[codes], categories)
+
+
+def _to_arrow(series):
+    # Columns mixing numbers, dates and text are staged as strings (missing kept)
+    try:
+        return pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.where(series.isna(), series.astype(str)), from_pandas=True)
+
+
+def _resolve_type(types):
+    # One Arrow type per column across all chunks
+    types = {t for t in types if not pa.types.is_null(t)}
+    if not types:
+        return pa.float64()
+    if len(types) == 1:
+        return types.pop()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+
+def _cast(column, target):
+    if pa.types.is_string(target) and not pa.types.is_string(column.type):
+        # Chunks that were all numbers or dates join a mixed column as the str()
+        # of the cell values, which were ints when integral
+        values = column.to_pandas()
+        if pa.types.is_floating(column.type):
+            values = values.map(lambda v: str(int(v)) if v.is_integer() else str(v), na_action='ignore')
+        else:
+            values = values.map(str, na_action='ignore')
+        return pa.array(values, type=pa.string(), from_pandas=True)
+    return column.cast(target)
+
+
+def _index_type(n_categories):
+    for index_type in (pa.int8(), pa.int16(), pa.int32()):
+        if n_categories < np.iinfo(index_type.to_pandas_dtype()).max:
+            return index_type
+    return pa.int64()
+
+
+class ChunkedFeatherWriter:
+    # Collects cleaned chunks and writes them as a single uncompressed Feather
+    # file ordered by `order_by`. Each chunk is sorted and staged on disk; at
+    # finish the staged files are memory-mapped and copied out key by key, so
+    # the sort never holds more than the mapped pages it is copying. The output
+    # is one record batch, i.e. one contiguous buffer per column, which is what
+    # lets loader.read_snapshot map columns instead of concatenating them.
+
+    def __init__(self, order_by, staging_dir=None):
+        self.order_by = order_by
+        self.staging_dir = tempfile.mkdtemp(prefix='ingest-', dir=staging_dir)
+        self.columns = None
+        self.types = {}
+        self.keys = set()
+        self.paths = []
+
+    def append(self, frame):
+        frame = frame.sort_values(self.order_by, kind='stable')
+        table = pa.Table.from_arrays(
+            [_to_arrow(frame[column]) for column in frame.columns], names=[str(c) for c in frame.columns]
+        )
+        if self.columns is None:
+            self.columns = table.column_names
+        for field in table.schema:
+            self.types.setdefault(field.name, set()).add(field.type)
+        self.keys.update(np.unique(frame[self.order_by].to_numpy()).tolist())
+
+        path = os.path.join(self.staging_dir, f'{len(self.paths):06d}.arrow')
+        with ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+        self.paths.append(path)
+
+    def finish(self, path, dictionaries=None):
+        # `dictionaries` maps code columns to (remap, categories) from CategoryLookup.dictionary
+        dictionaries = dictionaries or {}
+        try:
+            fields, values = [], {}
+            for column in self.columns:
+                if column in dictionaries:
+                    categories = dictionaries[column][1]
+                    fields.append(pa.field(column, pa.dictionary(_index_type(len(categories)), pa.string())))
+                    values[column] = pa.array(categories, pa.string())
+                else:
+                    fields.append(pa.field(column, _resolve_type(self.types[column])))
+            schema = pa.schema(fields)
+
+            staged = [ipc.open_file(pa.memory_map(p)).read_all() for p in self.paths]
+            keys = [table.column(self.order_by).to_numpy() for table in staged]
+            options = ipc.IpcWriteOptions(compression=None)
+            ordered = os.path.join(self.staging_dir, 'ordered.arrow')
+            with ipc.new_file(ordered, schema, options=options) as writer:
+                for key in sorted(self.keys):
+                    for table, table_keys in zip(staged, keys):
+                        lo = np.searchsorted(table_keys, key, side='left')
+                        hi = np.searchsorted(table_keys, key, side='right')
+                        if lo == hi:
+                            continue
+                        writer.write_table(self._batch(table.slice(lo, hi - lo), schema, dictionaries, values))
+            self._write_single_batch(ordered, path, schema, options)
+        finally:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def _write_single_batch(self, ordered, path, schema, options):
+        # The sorted file has a batch per key and staged chunk. Each column is
+        # joined into one array and staged on its own, one column in memory at
+        # a time, and the output batch is written from those mapped columns.
+        table = ipc.open_file(pa.memory_map(ordered)).read_all()
+        columns = []
+        for i, field in enumerate(schema):
+            column_path = os.path.join(self.staging_dir, f'column-{i:04d}.arrow')
+            column = table.column(field.name).combine_chunks()
+            column_schema = pa.schema([field])
+            with ipc.new_file(column_path, column_schema, options=options) as writer:
+                writer.write_batch(pa.record_batch([column], schema=column_schema))
+            del column
+            columns.append(ipc.open_file(pa.memory_map(column_path)).get_batch(0).column(0))
+        with ipc.new_file(path, schema, options=options) as writer:
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+
+    def _batch(self, table, schema, dictionaries, values):
+        arrays = []
+        for field in schema:
+            column = table.column(field.name)
+            if field.name in dictionaries:
+                remap = dictionaries[field.name][0]
+                indices = pa.array(remap[column.to_numpy()], type=field.type.index_type)
+                arrays.append(pa.DictionaryArray.from_arrays(indices, values[field.name]))
+            else:
+                arrays.append(_cast(column, field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
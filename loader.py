@@ -0,0 +1,287 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from ingest import DEFAULT_CHUNK_ROWS, CategoryLookup, ChunkedFeatherWriter, iter_sheet_chunks
+
+# Cleaned frames are cached as Arrow IPC (Feather v2) snapshots so web processes
+# don't pay the openpyxl parse and cleaning chain on every boot.
+SNAPSHOT_DIR = os.environ.get(
+    'SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', '.snapshots')
+)
+
+# Bump whenever a cleaner or the snapshot layout changes so existing snapshots
+# are rebuilt.
+CLEANING_VERSION = 5
+
+# Dashboard filter dimensions stored as categorical codes
+CATEGORICAL_COLUMNS = ['Area', 'Developer Name', 'Asset Type']
+
+MANIFEST_NAME = 'manifest.json'
+
+logger = logging.getLogger(__name__)
+
+
+# Asset Type spellings found in the sheets and the type each one means
+ASSET_TYPE_SYNONYMS = {
+    'Plot': 'Plot',
+    'Land': 'Plot',
+    'Plot/Land': 'Plot',
+    'Plot Land': 'Plot',
+    'Villa': 'Villa',
+    'Apartment': 'Apartment',
+    'Flat': 'Apartment'
+}
+ASSET_TYPES = ['Apartment', 'Villa', 'Plot']
+
+
+def normalize_area(value):
+    # Missing cells arrive as NaN and read as "nan", like .astype(str) would
+    area = str(value).strip().title()
+    if area == 'Unknown' or area.lower() == 'nan' or area == '':
+        return None
+    return area
+
+
+def normalize_developer(value):
+    return str(value).strip()
+
+
+def normalize_asset_type(value):
+    # Standardize 'Asset Type' to include all variations
+    asset_type = str(value).strip().title()
+    asset_type = ASSET_TYPE_SYNONYMS.get(asset_type, asset_type)
+    return asset_type if asset_type in ASSET_TYPES else None
+
+
+def final_sheet_lookups():
+    return {
+        'Area': CategoryLookup(normalize_area),
+        'Developer Name': CategoryLookup(normalize_developer),
+        'Asset Type': CategoryLookup(normalize_asset_type),
+    }
+
+
+def _clean_final_rows(df, lookups):
+    # Row filtering and derived columns for the "Final" sheet, shared by the
+    # in-memory and streaming paths; categorical columns come back as lookup codes
+    launch_date = pd.to_datetime(df['Launch Date'], errors='coerce')
+    codes = {column: lookups[column].encode(df[column]) for column in CATEGORICAL_COLUMNS}
+    keep = (launch_date > '2022-01-01').to_numpy() & (codes['Area'] >= 0) & (codes['Asset Type'] >= 0)
+
+    df = df[keep].copy()
+    df['Launch Date'] = launch_date[keep]
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = codes[column][keep]
+
+    df['Year'] = df['Launch Date'].dt.year
+    df['Quarter'] = df['Launch Date'].dt.quarter
+    # Dense integer quarter ordinal; "2023 Q2" style labels are only built at render time
+    df['QuarterOrdinal'] = df['Year'] * 4 + df['Quarter'] - 1
+    return df
+
+
+def clean_final_sheet(df):
+    # Data Preprocessing for the "Final" sheet used by try.py
+    lookups = final_sheet_lookups()
+    df = _clean_final_rows(df, lookups)
+
+    # Dictionary-encode the filter dimensions; the snapshot keeps the encoding
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = lookups[column].categorical(df[column].to_numpy())
+
+    # Keep the working data sorted by quarter so date windows are contiguous slices
+    return df.sort_values('QuarterOrdinal', kind='stable')
+
+
+def stream_final_sheet(source, path, sheet_name=0, header=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # clean_final_sheet without holding the sheet in memory: rows are cleaned a
+    # chunk at a time and the Feather file at `path` is written from disk
+    lookups = final_sheet_lookups()
+    used = {column: np.zeros(0, dtype=bool) for column in CATEGORICAL_COLUMNS}
+    writer = ChunkedFeatherWriter('QuarterOrdinal', staging_dir=os.path.dirname(path))
+    for chunk in iter_sheet_chunks(source, sheet_name, header, chunk_rows):
+        chunk = _clean_final_rows(chunk, lookups)
+        for column in CATEGORICAL_COLUMNS:
+            seen = np.bincount(chunk[column].to_numpy(), minlength=len(lookups[column].categories)) > 0
+            seen[:len(used[column])] |= used[column]
+            used[column] = seen
+        writer.append(chunk)
+    writer.finish(path, {
+        column: lookups[column].dictionary(np.flatnonzero(used[column])) for column in CATEGORICAL_COLUMNS
+    })
+
+
+# Cleaners that can write their snapshot straight from the workbook
+STREAMING_CLEANERS = {clean_final_sheet: stream_final_sheet}
+
+
+def clean_demo_sheet(data):
+    # Load and clean data for the Bangalore dashboard in demo.py
+    data['Launch Date'] = pd.to_datetime(data['Launch Date'], errors='coerce')
+    data['Handover date'] = pd.to_datetime(data['Handover date'], errors='coerce')
+    data['Developer Name'] = data['Developer Name'].str.strip()
+    data['Area'] = data['Area'].str.title()
+    filtered_data = data[data['Launch Date'] > '2022-10-01'].copy()
+
+    # Calculate time to handover
+    filtered_data['Handover Time (Months)'] = (filtered_data['Handover date'] - filtered_data['Launch Date']).dt.days // 30
+    return filtered_data
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, MANIFEST_NAME)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest):
+    path = os.path.join(SNAPSHOT_DIR, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def source_fingerprint(source):
+    # The content hash is only recomputed when mtime or size change, so an
+    # unchanged workbook costs one stat() per boot.
+    source = os.path.abspath(source)
+    stat = os.stat(source)
+    manifest = _read_manifest()
+    entry = manifest.get(source)
+    if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return entry['sha256']
+
+    sha256 = _file_sha256(source)
+    manifest[source] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha256}
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    _write_manifest(manifest)
+    return sha256
+
+
+def snapshot_key(source, cleaner, sheet_name=0, header=0):
+    key = '|'.join([
+        source_fingerprint(source),
+        str(sheet_name),
+        str(header),
+        cleaner.__name__,
+        str(CLEANING_VERSION),
+    ])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:20]
+
+
+def snapshot_path(source, cleaner, key):
+    stem = os.path.splitext(os.path.basename(source))[0].replace(' ', '_')
+    return os.path.join(SNAPSHOT_DIR, f'{stem}.{cleaner.__name__}.{key}.feather')
+
+
+def _arrow_safe(df):
+    # Excel columns often mix numbers, dates and free text; Arrow needs one type
+    # per column, so such columns are stored as strings (missing values kept).
+    df = df.reset_index(drop=True)
+    for column in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def _remove_stale_snapshots(source, cleaner, keep):
+    stem = os.path.splitext(os.path.basename(source))[0].replace(' ', '_')
+    prefix = f'{stem}.{cleaner.__name__}.'
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if name.startswith(prefix) and name.endswith('.feather') and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def save_snapshot(frame, path):
+    # Uncompressed and in one record batch (to_feather splits every 64K rows),
+    # so read_snapshot can map each column without decoding or concatenating
+    frame.to_feather(path, compression='uncompressed', chunksize=max(len(frame), 1))
+
+
+def copied_columns(frame, table):
+    # Columns that could have been views of the mapped file (numeric, no nulls)
+    # but came back as private, writeable copies
+    return [
+        column for column in frame.columns
+        if frame[column].dtype.kind in 'fiuM' and table.column(column).null_count == 0
+        and frame[column].to_numpy().flags.writeable
+    ]
+
+
+def read_snapshot(path):
+    # Memory-map the snapshot. When the file is uncompressed and holds one
+    # record batch, numeric columns come back as read-only views of the mapped
+    # file rather than private copies, so every worker process shares the same
+    # page-cache pages. Otherwise the frame is still returned, copied into this
+    # process, and the reason is logged.
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except OSError:
+        logger.warning('Could not memory-map snapshot %s; reading it into memory', path)
+        return feather.read_table(path, memory_map=False).to_pandas(split_blocks=True)
+    frame = table.to_pandas(split_blocks=True)
+    copied = copied_columns(frame, table)
+    if copied:
+        batches = max((column.num_chunks for column in table.columns), default=0)
+        logger.warning(
+            'Snapshot %s is not mapped (%d record batches, or compressed); %d columns copied into this process',
+            path, batches, len(copied)
+        )
+    return frame
+
+
+def ensure_snapshot(source, cleaner, sheet_name=0, header=0):
+    # Path of the cleaned snapshot, written first if the workbook changed, and
+    # the data-version token identifying it. Nothing is kept in memory, so the
+    # SQL backend can query the file without the frame ever being loaded.
+    key = snapshot_key(source, cleaner, sheet_name, header)
+    path = snapshot_path(source, cleaner, key)
+    if os.path.exists(path):
+        return path, key
+
+    # Write to a temp file and rename so concurrent boots never read a partial snapshot.
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    streaming = STREAMING_CLEANERS.get(cleaner)
+    if streaming is not None:
+        # Large workbooks: stream rows into the snapshot
+        streaming(source, tmp_path, sheet_name=sheet_name, header=header)
+    else:
+        df = cleaner(pd.read_excel(source, sheet_name=sheet_name, header=header))
+        save_snapshot(_arrow_safe(df), tmp_path)
+    os.replace(tmp_path, path)
+    _remove_stale_snapshots(source, cleaner, path)
+    return path, key
+
+
+def load_dataset(source, cleaner, sheet_name=0, header=0):
+    # Returns the cleaned frame and a data-version token identifying it. The
+    # frame is always read from the snapshot, also right after writing it, and
+    # both writers store it mapped (see read_snapshot), so workers share the
+    # file's pages rather than each keeping a heap copy.
+    path, key = ensure_snapshot(source, cleaner, sheet_name, header)
+    return read_snapshot(path), key
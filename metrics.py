@@ -0,0 +1,336 @@
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import flask
+
+# Per-callback latency metrics exposed in the Prometheus text format on
+# /metrics. Callbacks are wrapped with instrument_callback(); inside a callback,
+# current_timer() records per-phase timings (mark() closes the phase that just
+# ran, phase() times a nested block) and the result row count. Serialization
+# time and response size (before and after compression) are taken from the
+# Flask response after Dash encodes it.
+#
+# Metrics live in the worker process. When METRICS_DIR is set (the gunicorn
+# config does this) each worker also flushes its state there and /metrics
+# merges every worker's file, so any worker can answer a scrape.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 100000)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+FLUSH_INTERVAL = 1.0
+
+# Values collectors report (see cache_collector): type, help text, and how
+# the workers' values combine. Worker-local counts add up; the shared store's
+# size is the same seen from every worker, so any one of them reports it.
+COLLECTED_METRICS = {
+    'dashboard_result_cache_hits_total': ('counter', 'Callback results served from the result cache', sum),
+    'dashboard_result_cache_misses_total': ('counter', 'Callback results the result cache had to compute', sum),
+    'dashboard_result_cache_bytes': ('gauge', "Bytes held in the workers' result caches", sum),
+    'dashboard_result_store_hits_total': ('counter', 'Callback results served from the shared result store', sum),
+    'dashboard_result_store_errors_total': ('counter', 'Shared result store operations that failed', sum),
+    'dashboard_result_store_entries': ('gauge', 'Results in the shared result store', max),
+    'dashboard_result_store_bytes': ('gauge', 'Bytes of results in the shared result store', max),
+}
+
+
+class Histogram:
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # labels tuple -> [bucket counts..., +Inf count, sum]
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[len(self.buckets)] += 1
+        series[-1] += value
+
+
+class MetricsRegistry:
+
+    def __init__(self, label_names=('callback', 'view')):
+        self.label_names = label_names
+        self.histograms = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self.histogram('dashboard_callback_seconds', 'Callback wall time, including cache hits', LATENCY_BUCKETS)
+        self.histogram('dashboard_callback_phase_seconds', 'Time spent per callback phase', LATENCY_BUCKETS)
+        self.histogram('dashboard_callback_result_rows', 'Rows in the aggregated result behind a callback', ROW_BUCKETS)
+        self.histogram('dashboard_response_bytes', 'Serialized callback response size', BYTE_BUCKETS)
+        self.histogram('dashboard_response_wire_bytes', 'Callback response size as sent, after compression', BYTE_BUCKETS)
+
+    def histogram(self, name, help, buckets):
+        self.histograms[name] = Histogram(name, help, buckets)
+        return self.histograms[name]
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self.histograms[name].observe(labels, value)
+        self._maybe_flush()
+
+    def add_collector(self, collector):
+        # collector() returns (metric, labels, value) samples of COLLECTED_METRICS,
+        # e.g. cache counters; they are flushed and merged like the histograms
+        self.collectors.append(collector)
+
+    def _state(self):
+        samples = [[name, sorted(labels.items()), value]
+                   for collector in self.collectors for name, labels, value in collector()]
+        with self._lock:
+            state = {
+                name: [[list(labels), list(series)] for labels, series in histogram.series.items()]
+                for name, histogram in self.histograms.items()
+            }
+        state['samples'] = samples
+        return state
+
+    def _maybe_flush(self):
+        if not METRICS_DIR:
+            return
+        now = time.monotonic()
+        if now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        self.flush()
+
+    def flush(self):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(self._state(), fh)
+        os.replace(tmp_path, path)
+
+    def _merged_state(self):
+        if not METRICS_DIR:
+            state = self._state()
+            state['samples'] = self._merged_samples([state['samples']])
+            return state
+        self.flush()
+        merged = {}
+        samples = []
+        for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+            try:
+                with open(path) as fh:
+                    state = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            samples.append(state.pop('samples', []))
+            for name, entries in state.items():
+                target = merged.setdefault(name, {})
+                for labels, series in entries:
+                    key = tuple(labels)
+                    if key in target:
+                        target[key] = [a + b for a, b in zip(target[key], series)]
+                    else:
+                        target[key] = series
+        merged = {name: [[list(k), v] for k, v in entries.items()] for name, entries in merged.items()}
+        merged['samples'] = self._merged_samples(samples)
+        return merged
+
+    @staticmethod
+    def _merged_samples(workers):
+        # {metric: {labels: value}}, each series combined across the workers
+        values = {}
+        for samples in workers:
+            for name, labels, value in samples:
+                if name in COLLECTED_METRICS:
+                    values.setdefault(name, {}).setdefault(tuple(map(tuple, labels)), []).append(value)
+        return {
+            name: {labels: COLLECTED_METRICS[name][2](series) for labels, series in entries.items()}
+            for name, entries in values.items()
+        }
+
+    def render(self):
+        lines = []
+        state = self._merged_state()
+        for name, histogram in self.histograms.items():
+            lines.append(f'# HELP {name} {histogram.help}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, series in sorted(state.get(name, []), key=lambda entry: entry[0]):
+                names = self.label_names + (('phase',) if len(labels) > len(self.label_names) else ())
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(names, labels))
+                for bound, count in zip(histogram.buckets, series):
+                    lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {series[len(histogram.buckets)]}')
+                lines.append(f'{name}_count{{{label_text}}} {series[len(histogram.buckets)]}')
+                lines.append(f'{name}_sum{{{label_text}}} {series[-1]}')
+        samples = state.get('samples', {})
+        for name, (kind, help, _) in COLLECTED_METRICS.items():
+            if name not in samples:
+                continue
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(samples[name].items()):
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f'{name}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PhaseTimer:
+
+    def __init__(self, listener=None):
+        self.phases = {}
+        self.rows = None
+        # Called with each phase's name as it completes (background job progress)
+        self.listener = listener
+        self._last = time.perf_counter()
+        self._nested = 0.0
+
+    def mark(self, name):
+        # Attribute the time since the previous mark to `name`, minus nested phases
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._last - self._nested
+        self._last = now
+        self._nested = 0.0
+        if self.listener is not None:
+            self.listener(name)
+
+    @contextmanager
+    def phase(self, name):
+        # Exclusive time: phases nested inside this one are not counted twice
+        started = time.perf_counter()
+        outer_nested, self._nested = self._nested, 0.0
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - self._nested
+            self._nested = outer_nested + elapsed
+            if self.listener is not None:
+                self.listener(name)
+
+
+_local = threading.local()
+
+
+def current_timer():
+    # Outside an instrumented callback (benchmarks, scripts) this is a throwaway
+    timer = getattr(_local, 'timer', None)
+    return timer if timer is not None else PhaseTimer()
+
+
+@contextmanager
+def phase_listener(listener):
+    # Callbacks instrumented on this thread meanwhile report their phases to `listener`
+    _local.listener = listener
+    try:
+        yield
+    finally:
+        _local.listener = None
+
+
+def instrument_callback(registry, label):
+    # `label` maps the callback arguments to the view label of its metrics
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            labels = (func.__name__, label(*args))
+            timer = _local.timer = PhaseTimer(getattr(_local, 'listener', None))
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                _local.timer = None
+                finished = time.perf_counter()
+                registry.observe('dashboard_callback_seconds', labels, finished - started)
+                for phase, elapsed in timer.phases.items():
+                    registry.observe('dashboard_callback_phase_seconds', labels + (phase,), elapsed)
+                if timer.rows is not None:
+                    registry.observe('dashboard_callback_result_rows', labels, timer.rows)
+                if flask.has_request_context():
+                    flask.g.metrics_labels = labels
+                    flask.g.metrics_callback_finished = finished
+        return wrapper
+    return decorator
+
+
+def marks_output(func):
+    # Outermost decorator of a Dash callback that calls an instrumented one and
+    # then builds its outputs from the result: notes when the outputs are done,
+    # so that work is timed as the "outputs" phase rather than as serialization
+    @functools.wraps(func)
+    def wrapper(*args):
+        try:
+            return func(*args)
+        finally:
+            if flask.has_request_context():
+                flask.g.metrics_output_built = time.perf_counter()
+    return wrapper
+
+
+def install_metrics(app, registry):
+    # Adds the /metrics route and records serialization time and response size
+    server = app.server
+
+    @server.after_request
+    def record_response(response):
+        labels = getattr(flask.g, 'metrics_labels', None)
+        if labels is not None and not response.direct_passthrough:
+            # Serialization starts once the Dash callback has returned: when the
+            # instrumented callback is the Dash callback itself, as soon as it
+            # finishes, otherwise at marks_output's mark
+            built = getattr(flask.g, 'metrics_output_built', None)
+            if built is not None:
+                outputs = built - flask.g.metrics_callback_finished
+                registry.observe('dashboard_callback_phase_seconds', labels + ('outputs',), outputs)
+            else:
+                built = flask.g.metrics_callback_finished
+            # compression.install_compression, when installed, has already
+            # encoded the body and noted its own time and the original size
+            compression = getattr(flask.g, 'compression_seconds', 0.0)
+            serialization = time.perf_counter() - built - compression
+            registry.observe('dashboard_callback_phase_seconds', labels + ('serialization',), serialization)
+            wire_bytes = len(response.get_data())
+            if 'compression_seconds' in flask.g:
+                registry.observe('dashboard_callback_phase_seconds', labels + ('compression',), compression)
+            registry.observe('dashboard_response_bytes', labels, getattr(flask.g, 'uncompressed_response_bytes', wire_bytes))
+            registry.observe('dashboard_response_wire_bytes', labels, wire_bytes)
+        return response
+
+    @server.route('/metrics')
+    def metrics_endpoint():
+        return flask.Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
+
+
+def cache_collector(name, cache):
+    # Result cache counters, reported alongside the histograms
+    def collect():
+        stats = cache.stats()
+        labels = {'cache': name}
+        samples = [
+            ('dashboard_result_cache_hits_total', labels, stats['hits']),
+            ('dashboard_result_cache_misses_total', labels, stats['misses']),
+            ('dashboard_result_cache_bytes', labels, stats['bytes']),
+        ]
+        if 'store_bytes' in stats:
+            # The shared result store behind the worker's LRU (result_store.py)
+            samples += [
+                ('dashboard_result_store_hits_total', labels, stats['store_hits']),
+                ('dashboard_result_store_errors_total', labels, stats['store_errors']),
+                ('dashboard_result_store_entries', labels, stats['store_entries']),
+                ('dashboard_result_store_bytes', labels, stats['store_bytes']),
+            ]
+        return samples
+    return collect
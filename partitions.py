@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_DIMENSIONS, FILTER_DIMENSIONS, FilterIndex, build_cube, columnar_cube, rollup, slice_cube, UNITS
+from heavy_hitters import Ranking
+from loader import clean_demo_sheet, clean_final_sheet, load_dataset, read_snapshot, save_snapshot
+from metrics import current_timer
+from result_cache import LRUResultCache
+
+# Datasets too large to load whole, stored partitioned by city and launch year:
+#
+#   <root>/catalog.json
+#   <root>/city=<city>/year=<year>.feather     (year=none for rows without a launch date)
+#
+# Partitions are written like the loader's snapshots (save_snapshot), so they are
+# memory-mapped rather than parsed. The catalog records each partition's row
+# count, launch date span, quarters and filter values; the dashboards read only
+# the catalog at startup and load a partition the first time a request's
+# filters and date range touch it, keeping its cube in a bounded cache.
+#
+# Build or refresh a city's partitions from its workbook:
+#
+#   python -m partitions --root data/partitions/final --city Bangalore \
+#       --source "./data/TruEstimate Final Sheet Project (5).xlsx" --sheet Final
+
+CATALOG_NAME = 'catalog.json'
+DATE_COLUMN = 'Launch Date'
+# Partitions whose cubes stay loaded, and the memory they may take
+PARTITION_CACHE_ENTRIES = int(os.environ.get('PARTITION_CACHE_ENTRIES', 64))
+PARTITION_CACHE_BYTES = int(os.environ.get('PARTITION_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def _write_atomic(path, write):
+    # Temp file and rename, so readers never see a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def partition_entry(frame, root, city, year):
+    # Writes one partition and returns its catalog entry
+    name = 'none' if year is None else str(year)
+    relative = os.path.join(f'city={city}', f'year={name}.feather')
+    path = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame = frame.reset_index(drop=True)
+    _write_atomic(path, lambda tmp_path: save_snapshot(frame, tmp_path))
+    dates = frame[DATE_COLUMN].dropna()
+    entry = {
+        'city': city,
+        'year': year,
+        'path': relative,
+        'rows': len(frame),
+        'min_date': dates.min().isoformat() if len(dates) else None,
+        'max_date': dates.max().isoformat() if len(dates) else None,
+        'members': {
+            column: sorted(str(value) for value in frame[column].dropna().unique())
+            for column in FILTER_DIMENSIONS if column in frame
+        },
+    }
+    if set(CUBE_DIMENSIONS) <= set(frame.columns):
+        # Quarters with cube rows, the slider positions this partition adds
+        entry['quarters'] = sorted(int(ordinal) for ordinal in build_cube(frame)['QuarterOrdinal'].unique())
+    return entry
+
+
+def write_partitions(frame, root, city):
+    # Replaces `city`'s partitions with `frame` split by launch year
+    os.makedirs(root, exist_ok=True)
+    years = frame[DATE_COLUMN].dt.year
+    entries = [
+        partition_entry(frame[(years == year).to_numpy()], root, city, int(year))
+        for year in sorted(years.dropna().unique())
+    ]
+    if years.isna().any():
+        entries.append(partition_entry(frame[years.isna().to_numpy()], root, city, None))
+
+    catalog_path = os.path.join(root, CATALOG_NAME)
+    catalog = PartitionCatalog(root).entries if os.path.exists(catalog_path) else []
+    written = {entry['path'] for entry in entries}
+    for entry in catalog:
+        # Years this city no longer has
+        if entry['city'] == city and entry['path'] not in written:
+            os.remove(os.path.join(root, entry['path']))
+    catalog = [entry for entry in catalog if entry['city'] != city] + entries
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as fh:
+            json.dump({'partitions': catalog}, fh, indent=2, sort_keys=True)
+    _write_atomic(catalog_path, write)
+    return entries
+
+
+class PartitionCatalog:
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, CATALOG_NAME), 'rb') as fh:
+            content = fh.read()
+        self.entries = json.loads(content)['partitions']
+        # Data-version token: any rewritten partition changes the catalog
+        self.version = hashlib.sha256(content).hexdigest()[:20]
+
+    def cities(self):
+        return sorted({entry['city'] for entry in self.entries})
+
+    def select(self, cities=None, quarter_range=None, **selections):
+        # Entries a query can need: in one of `cities`, overlapping the
+        # [first, last] quarter ordinal range, and holding at least one of the
+        # selected values of each filter column
+        selected = []
+        for entry in self.entries:
+            if cities and entry['city'] not in cities:
+                continue
+            if quarter_range is not None:
+                quarters = entry.get('quarters')
+                if not quarters or quarters[-1] < quarter_range[0] or quarters[0] > quarter_range[1]:
+                    continue
+            if any(values and not set(values) & set(entry['members'].get(column, ()))
+                   for column, values in selections.items()):
+                continue
+            selected.append(entry)
+        return selected
+
+    def path(self, entry):
+        return os.path.join(self.root, entry['path'])
+
+    def load(self, cities=None):
+        # Every row of `cities`, for consumers that need the whole frame
+        frames = [read_snapshot(self.path(entry)) for entry in self.select(cities)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+class PartitionedData:
+    # The parts of DashboardData try.py's server-side callbacks read, over a
+    # partition catalog. Quarters and filter values come from the catalog;
+    # rows are only read when a query touches their partition.
+
+    def __init__(self, catalog, cities=None):
+        self.catalog = catalog
+        self.cities = cities or None
+        self.version = catalog.version
+        entries = catalog.select(self.cities)
+        self.quarters = np.array(sorted({q for entry in entries for q in entry.get('quarters', ())}), dtype=np.int64)
+        self._members = {
+            column: sorted({value for entry in entries for value in entry['members'].get(column, ())})
+            for column in FILTER_DIMENSIONS
+        }
+        self._columnar = None
+        # Cubes of loaded partitions, by path
+        self.cache = LRUResultCache(PARTITION_CACHE_ENTRIES, PARTITION_CACHE_BYTES)
+        self.backend = PartitionedBackend(self)
+
+    def members(self, column):
+        return self._members[column]
+
+    def partition(self, entry):
+        # (cube, filter index) of one partition, read on first use
+        path = self.catalog.path(entry)
+        cached = self.cache.get(path)
+        if cached is None:
+            with current_timer().phase('load'):
+                cube = build_cube(read_snapshot(path))
+                cached = (cube, FilterIndex(cube))
+            self.cache.put(path, cached, int(cube.memory_usage(deep=True).sum()))
+        return cached
+
+    def columnar_cube(self):
+        # The clientside mode ships the whole cube, so it reads every partition
+        if self._columnar is None:
+            cubes = [self.partition(entry)[0] for entry in self.catalog.select(self.cities, (-np.inf, np.inf))]
+            cube = pd.concat(cubes, ignore_index=True).sort_values('QuarterOrdinal', kind='stable', ignore_index=True)
+            for column in FILTER_DIMENSIONS:
+                cube[column] = cube[column].astype(object).astype('category')
+            self._columnar = dict(columnar_cube(cube, self.quarters), version=self.version)
+        return self._columnar
+
+
+class PartitionedBackend:
+    # query_backends' units_by over the partitions the filters and window touch
+
+    def __init__(self, current):
+        self.current = current
+
+    def units_by(self, by, areas, developers, asset_types, start, end):
+        current = self.current
+        quarter_range = (current.quarters[start], current.quarters[end])
+        entries = current.catalog.select(current.cities, quarter_range, **{
+            'Area': areas, 'Developer Name': developers, 'Asset Type': asset_types,
+        })
+        slices = []
+        for entry in entries:
+            _, index = current.partition(entry)
+            with current_timer().phase('filter'):
+                slices.append(slice_cube(index, areas, developers, asset_types, quarter_range))
+        if not slices:
+            return pd.DataFrame(columns=by + [UNITS])
+        return rollup(pd.concat(slices, ignore_index=True), by)
+
+    def rows_scanned(self, start, end):
+        # Rows of the partitions the window touches, read before the filters apply
+        current = self.current
+        quarter_range = (current.quarters[start], current.quarters[end])
+        return sum(entry['rows'] for entry in current.catalog.select(current.cities, quarter_range))
+
+    def developer_ranking(self, k, areas, developers, asset_types, start, end):
+        return Ranking.from_totals(self.units_by(['Developer Name'], areas, developers, asset_types, start, end),
+                                   'Developer Name', k)
+
+
+# Sheets the archive can be built from: cleaner and read options
+DATASETS = {
+    'final': (clean_final_sheet, {'sheet_name': 'Final'}),
+    'demo': (clean_demo_sheet, {'header': 1}),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a city's workbook into a partitioned archive.")
+    parser.add_argument('--root', required=True, help='archive directory (holds catalog.json)')
+    parser.add_argument('--city', required=True)
+    parser.add_argument('--source', required=True, help='the city workbook')
+    parser.add_argument('--dataset', choices=sorted(DATASETS), default='final')
+    parser.add_argument('--sheet', help='sheet name, if not the dataset default')
+    args = parser.parse_args(argv)
+
+    cleaner, options = DATASETS[args.dataset]
+    if args.sheet:
+        options = dict(options, sheet_name=args.sheet)
+    frame, _ = load_dataset(args.source, cleaner, **options)
+    for entry in write_partitions(frame, args.root, args.city):
+        print(f"{entry['path']}: {entry['rows']} rows, {entry['min_date']} to {entry['max_date']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
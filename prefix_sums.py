@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from cube import UNITS, PROJECTS
+
+# Per-member prefix sums along the quarter axis. Column j of a prefix array holds
+# the total of quarters [0, j), so any [start, end] window total or cumulative
+# curve is two array lookups rather than an aggregation pass.
+
+
+class PrefixSumTable:
+
+    def __init__(self, dimension, members, n_quarters, member_codes, quarter_positions, measures):
+        self.dimension = dimension
+        self.members = pd.Index(members)
+        self.cells = {}
+        self.prefix = {}
+        keep = (member_codes >= 0) & (quarter_positions >= 0)
+        for name, values in measures.items():
+            cells = np.zeros((len(self.members), n_quarters))
+            np.add.at(cells, (member_codes[keep], quarter_positions[keep]), np.nan_to_num(values[keep]))
+            prefix = np.zeros((len(self.members), n_quarters + 1))
+            np.cumsum(cells, axis=1, out=prefix[:, 1:])
+            self.cells[name] = cells
+            self.prefix[name] = prefix
+
+    @classmethod
+    def from_cube(cls, cube, dimension, quarters):
+        # `quarters` are the distinct quarter ordinals, i.e. the slider positions.
+        # With no dimension the table holds a single all-rows series.
+        if dimension is None:
+            members, codes = ['All'], np.zeros(len(cube), dtype=np.int64)
+        else:
+            members, codes = cube[dimension].cat.categories, cube[dimension].cat.codes.to_numpy()
+        return cls(
+            dimension,
+            members,
+            len(quarters),
+            codes,
+            np.searchsorted(quarters, cube['QuarterOrdinal'].to_numpy()),
+            {UNITS: cube[UNITS].to_numpy(), PROJECTS: cube[PROJECTS].to_numpy()},
+        )
+
+    def member_rows(self, members=None):
+        if not members:
+            return np.arange(len(self.members))
+        rows = self.members.get_indexer(members)
+        return np.unique(rows[rows >= 0])
+
+    def window(self, start, end, measure=UNITS, rows=None):
+        # Totals over slider positions [start, end] for each member
+        prefix = self.prefix[measure] if rows is None else self.prefix[measure][rows]
+        return prefix[:, end + 1] - prefix[:, start]
+
+    def cumulative(self, start, end, measure=UNITS, rows=None):
+        # Running totals within [start, end] for each member
+        prefix = self.prefix[measure] if rows is None else self.prefix[measure][rows]
+        return prefix[:, start + 1:end + 2] - prefix[:, [start]]
+
+    def window_totals(self, start, end, members=None):
+        # Members with at least one project in the window and their unit totals
+        rows = self.member_rows(members)
+        units = self.window(start, end, UNITS, rows)
+        present = self.window(start, end, PROJECTS, rows) > 0
+        return pd.DataFrame({
+            self.dimension: np.asarray(self.members[rows[present]], dtype=object),
+            UNITS: units[present],
+        })
+
+    def quarter_cells(self, start, end, members=None):
+        # Long (member, quarter position, units) frame of the non-empty cells
+        rows = self.member_rows(members)
+        units = self.cells[UNITS][rows, start:end + 1]
+        member_idx, quarter_idx = np.nonzero(self.cells[PROJECTS][rows, start:end + 1] > 0)
+        return pd.DataFrame({
+            self.dimension: np.asarray(self.members[rows[member_idx]], dtype=object),
+            'Position': start + quarter_idx,
+            UNITS: units[member_idx, quarter_idx],
+        })
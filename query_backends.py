@@ -0,0 +1,281 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from cube import CUBE_DIMENSIONS, FILTER_DIMENSIONS, PROJECTS, UNITS, quarter_ordinal, rollup, slice_cube
+from heavy_hitters import Ranking, rank_cube
+from metrics import current_timer
+
+try:
+    import duckdb
+except ImportError:
+    # QUERY_BACKEND=duckdb needs the duckdb package (see requirements.txt)
+    duckdb = None
+
+# Where the dashboards' aggregations are computed. The pandas backend answers
+# them from the cube, filter bitmaps and prefix sums DashboardData builds in
+# memory at load. With QUERY_BACKEND=duckdb they run as SQL in an embedded
+# DuckDB over the memory-mapped snapshot file instead: filters and GROUP BYs
+# are pushed into the engine, which scans only the columns and pages a query
+# touches, vectorised and on several threads, and nothing is built in memory
+# (dashboard_data.SQLData). Both return the same frames; tests/ and
+# benchmarks/parity.py check that they do.
+
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'pandas')
+# Threads one DuckDB query may use
+DUCKDB_THREADS = int(os.environ.get('DUCKDB_THREADS', os.cpu_count() or 1))
+
+# Time axes at quarter granularity, which the prefix sums answer directly
+QUARTER_AXES = [['Year', 'Quarter'], ['QuarterOrdinal']]
+
+# What the cube derives QuarterOrdinal from (cube.quarter_ordinal)
+ORDINAL_SQL = '("Year" * 4 + "Quarter" - 1)'
+
+# pandas aggregations as SQL. pandas sums with Kahan compensation, as FSUM
+# does, and a pandas sum of nothing is 0 rather than NULL.
+SQL_AGGREGATES = {
+    'sum': 'COALESCE(FSUM({0}), 0)',
+    'mean': 'AVG({0})',
+    'median': 'MEDIAN({0})',
+    'min': 'MIN({0})',
+    'max': 'MAX({0})',
+}
+
+
+class PandasBackend:
+
+    def __init__(self, current):
+        self.current = current
+
+    def units_by(self, by, areas, developers, asset_types, start, end):
+        # Total units per `by` group over slider positions [start, end], sorted
+        # by `by`. Filtering on at most the one dimension grouped by, along no or
+        # a quarterly time axis, is two prefix-sum lookups; the rest is a roll-up
+        # of the sliced cube.
+        current = self.current
+        selections = {'Area': areas, 'Developer Name': developers, 'Asset Type': asset_types}
+        dimensions = [column for column in by if column in FILTER_DIMENSIONS]
+        axis = [column for column in by if column not in FILTER_DIMENSIONS]
+        filtered = {column for column, values in selections.items() if values}
+        if len(dimensions) <= 1 and filtered <= set(dimensions) and (axis in QUARTER_AXES or (dimensions and not axis)):
+            dimension = dimensions[0] if dimensions else None
+            table = current.prefix_tables[dimension]
+            members = selections.get(dimension)
+            if not axis:
+                return table.window_totals(start, end, members)
+            cells = table.quarter_cells(start, end, members)
+            cells['QuarterOrdinal'] = current.quarters[cells['Position']]
+            cells['Year'], cells['Quarter'] = cells['QuarterOrdinal'] // 4, cells['QuarterOrdinal'] % 4 + 1
+            return cells[by + [UNITS]]
+
+        with current_timer().phase('filter'):
+            quarter_range = (current.quarters[start], current.quarters[end])
+            cube = slice_cube(current.filter_index, areas, developers, asset_types, quarter_range)
+        return rollup(cube, by)
+
+    def rows_scanned(self, start, end):
+        # Cube rows in slider positions [start, end], what a query over that
+        # window reads at most; try.py sizes its background jobs by it
+        current = self.current
+        lo, hi = current.filter_index.row_range(current.quarters[start], current.quarters[end])
+        return int(hi - lo)
+
+    def developer_ranking(self, k, areas, developers, asset_types, start, end):
+        # Top `k` developers by units (heavy_hitters.Ranking). Over the whole
+        # quarter axis the rankings kept at load answer it; other windows rank
+        # the sliced cube.
+        current = self.current
+        if current.rankings is not None and start == 0 and end == len(current.quarters) - 1:
+            return current.rankings.ranking(areas, developers, asset_types, k)
+        with current_timer().phase('filter'):
+            quarter_range = (current.quarters[start], current.quarters[end])
+            cube = slice_cube(current.filter_index, areas, developers, asset_types, quarter_range)
+        return rank_cube(cube, 'Developer Name', k)
+
+
+def _quoted(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+class DuckDBBackend:
+    # Reads an Arrow snapshot (memory-mapped) or a frame. `quarter_columns` maps
+    # derived period columns, like demo.py's launch and handover quarters, to
+    # the date columns they are the quarter of.
+
+    def __init__(self, source, quarter_columns=None):
+        if duckdb is None:
+            raise RuntimeError('QUERY_BACKEND=duckdb needs the duckdb package installed')
+        self.table = feather.read_table(source, memory_map=True) if isinstance(source, str) else source
+        self.quarter_columns = quarter_columns or {}
+        # Dictionary-encoded (categorical) columns, grouped on by their labels
+        if isinstance(source, str):
+            self.encoded = {field.name for field in self.table.schema if pa.types.is_dictionary(field.type)}
+        else:
+            self.encoded = {column for column, dtype in source.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)}
+        self._quarters = None
+        self._offsets = None
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread and process; registering the table is zero-copy
+        cached = getattr(self._local, 'connection', None)
+        if cached is None or cached[0] != os.getpid():
+            db = duckdb.connect()
+            db.execute(f'SET threads TO {DUCKDB_THREADS}')
+            db.register('snapshot', self.table)
+            cached = self._local.connection = (os.getpid(), db)
+        return cached[1]
+
+    def _label(self, column):
+        # Group key expression; encoded columns come back as plain labels, like rollup's
+        if column in self.encoded:
+            return f'CAST({_quoted(column)} AS VARCHAR) AS {_quoted(column)}'
+        return _quoted(column)
+
+    def query(self, sql, params=()):
+        return self._connection().execute(sql, list(params)).df()
+
+    @property
+    def quarters(self):
+        # Distinct quarter ordinals of the cube's rows, i.e. the slider positions
+        if self._quarters is None:
+            where = ' AND '.join(f'{_quoted(column)} IS NOT NULL' for column in CUBE_DIMENSIONS)
+            counts = self.query(
+                f'SELECT {ORDINAL_SQL} AS ordinal, COUNT(*) AS n FROM snapshot WHERE {where} GROUP BY 1 ORDER BY 1'
+            )
+            # Rows before each quarter, for rows_scanned
+            self._offsets = np.concatenate([[0], np.cumsum(counts['n'].to_numpy())])
+            self._quarters = counts['ordinal'].to_numpy()
+        return self._quarters
+
+    def rows_scanned(self, start, end):
+        # Rows in slider positions [start, end], what a query over that window
+        # aggregates at most
+        self.quarters
+        return int(self._offsets[end + 1] - self._offsets[start])
+
+    def members(self, column):
+        # Distinct values of a filter column, for its dropdown
+        values = self.query(f'SELECT DISTINCT {self._label(column)} FROM snapshot WHERE {_quoted(column)} IS NOT NULL')
+        return sorted(values[column])
+
+    def _categories(self, column):
+        # An encoded column's categories in the frame's order: the dictionary
+        # values of each chunk, in order of appearance
+        if isinstance(self.table, pd.DataFrame):
+            return self.table[column].cat.categories
+        values = {}
+        for chunk in self.table.column(column).chunks:
+            values.update(dict.fromkeys(chunk.dictionary.to_pylist()))
+        return list(values)
+
+    def cube(self):
+        # cube.build_cube of the snapshot, aggregated here, with the frame's
+        # categories and rows in quarter order; small enough for the clientside
+        # mode to ship
+        keys = ', '.join(self._label(column) for column in CUBE_DIMENSIONS)
+        where = ' AND '.join(f'{_quoted(column)} IS NOT NULL' for column in CUBE_DIMENSIONS)
+        order = ', '.join(str(i + 1) for i in range(len(CUBE_DIMENSIONS)))
+        cube = self.query(
+            f'SELECT {keys}, {SQL_AGGREGATES["sum"].format(_quoted(UNITS))} AS {_quoted(UNITS)}, '
+            f'COUNT(*) AS {_quoted(PROJECTS)} FROM snapshot WHERE {where} GROUP BY {order}'
+        )
+        for column in FILTER_DIMENSIONS:
+            if column in self.encoded:
+                cube[column] = cube[column].astype(pd.CategoricalDtype(self._categories(column)))
+            else:
+                cube[column] = cube[column].astype('category')
+        cube = cube.sort_values(CUBE_DIMENSIONS, ignore_index=True)
+        cube['QuarterOrdinal'] = quarter_ordinal(cube['Year'], cube['Quarter'])
+        return cube.sort_values('QuarterOrdinal', kind='stable', ignore_index=True)
+
+    def changed_rows(self, previous):
+        # Rows of the cube's columns in only one of this snapshot and `previous`
+        # (another DuckDBBackend), counting duplicates, as DashboardData.updated
+        # finds them; with the QuarterOrdinal selection_touches reads
+        db = duckdb.connect()
+        db.execute(f'SET threads TO {DUCKDB_THREADS}')
+        db.register('new_rows', self.table)
+        db.register('old_rows', previous.table)
+        columns = ', '.join(
+            [self._label(column) for column in CUBE_DIMENSIONS]
+            + [f'CAST({_quoted(UNITS)} AS DOUBLE) AS {_quoted(UNITS)}']
+        )
+        try:
+            return db.execute(
+                f'WITH new AS (SELECT {columns} FROM new_rows), old AS (SELECT {columns} FROM old_rows) '
+                f'SELECT *, {ORDINAL_SQL} AS "QuarterOrdinal" FROM ('
+                f'(SELECT * FROM new EXCEPT ALL SELECT * FROM old) UNION ALL '
+                f'(SELECT * FROM old EXCEPT ALL SELECT * FROM new))'
+            ).df()
+        finally:
+            db.close()
+
+    def row_count(self):
+        return int(self.query('SELECT COUNT(*) AS n FROM snapshot')['n'][0])
+
+    def units_by(self, by, areas, developers, asset_types, start, end):
+        # PandasBackend.units_by: rows missing any cube dimension are left out,
+        # like the cube leaves them out
+        conditions = [f'{_quoted(column)} IS NOT NULL' for column in CUBE_DIMENSIONS]
+        conditions.append(f'{ORDINAL_SQL} BETWEEN ? AND ?')
+        params = [int(self.quarters[start]), int(self.quarters[end])]
+        for column, values in [('Area', areas), ('Developer Name', developers), ('Asset Type', asset_types)]:
+            if values:
+                conditions.append(f'{_quoted(column)} IN ({_placeholders(values)})')
+                params += list(values)
+        keys = []
+        for column in by:
+            if column == 'QuarterOrdinal':
+                keys.append(f'{ORDINAL_SQL} AS "QuarterOrdinal"')
+            else:
+                keys.append(self._label(column))
+        order = ', '.join(str(i + 1) for i in range(len(by)))
+        return self.query(
+            f'SELECT {", ".join(keys)}, {SQL_AGGREGATES["sum"].format(_quoted(UNITS))} AS {_quoted(UNITS)} '
+            f'FROM snapshot WHERE {" AND ".join(conditions)} GROUP BY {order} ORDER BY {order}',
+            params
+        )
+
+    def developer_ranking(self, k, areas, developers, asset_types, start, end):
+        return Ranking.from_totals(self.units_by(['Developer Name'], areas, developers, asset_types, start, end),
+                                   'Developer Name', k)
+
+    def grouped(self, filter, keys, measure, agg):
+        # GraphPlanner.aggregate's groupby: the row count (measure None) or the
+        # sum or median of `measure` per `keys` group of the rows matching
+        # `filter`, unstacked on the second key
+        conditions, params, columns = [], [], []
+        for column, value in filter:
+            conditions.append(f'{_quoted(column)} = ?')
+            params.append(value)
+        for key in keys:
+            source = self.quarter_columns.get(key, key)
+            conditions.append(f'{_quoted(source)} IS NOT NULL')
+            if key in self.quarter_columns:
+                columns.append(f"date_trunc('quarter', {_quoted(source)}) AS {_quoted(key)}")
+            else:
+                columns.append(self._label(key))
+        if measure is None:
+            value = 'COUNT(*)'
+        else:
+            value = SQL_AGGREGATES[agg].format(_quoted(measure))
+        order = ', '.join(str(i + 1) for i in range(len(keys)))
+        frame = self.query(
+            f'SELECT {", ".join(columns)}, {value} AS value FROM snapshot '
+            f'WHERE {" AND ".join(conditions)} GROUP BY {order} ORDER BY {order}',
+            params
+        )
+        for key in keys:
+            if key in self.quarter_columns:
+                frame[key] = frame[key].dt.to_period('Q')
+        result = frame.set_index(keys)['value'].rename(measure)
+        return result.unstack() if len(keys) > 1 else result
@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+from loader import ensure_snapshot, snapshot_key
+
+# Live data refresh. A watcher thread per process polls the source workbook;
+# when its content changes, the new version is written to its snapshot and the
+# live dataset diffs it against its own: DashboardData merges only the changed
+# rows into its aggregates, SQLData asks DuckDB for them. The new version is
+# published with one reference assignment, so a callback that already holds
+# the old one finishes on it.
+
+REFRESH_INTERVAL = float(os.environ.get('DATA_REFRESH_INTERVAL', 60))
+
+logger = logging.getLogger(__name__)
+
+
+def selection_touches(changes, quarters, areas, developers, asset_types, date_range):
+    # Whether any changed row falls inside a dashboard selection; results for
+    # selections it doesn't touch are still valid after the update
+    mask = np.ones(len(changes), dtype=bool)
+    for column, values in [('Area', areas), ('Developer Name', developers), ('Asset Type', asset_types)]:
+        if values:
+            mask &= changes[column].isin(values).to_numpy()
+    if date_range:
+        start, end = date_range
+        ordinals = changes['QuarterOrdinal'].to_numpy()
+        mask &= (ordinals >= quarters[start]) & (ordinals <= quarters[end])
+    return bool(mask.any())
+
+
+class DataRefresher:
+
+    def __init__(self, source, cleaner, current, publish, sheet_name=0, header=0, interval=REFRESH_INTERVAL):
+        # `current()` returns the live DashboardData or SQLData; `publish(new, changes)` swaps it
+        self.source = source
+        self.cleaner = cleaner
+        self.current = current
+        self.publish = publish
+        self.sheet_name = sheet_name
+        self.header = header
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def ensure_started(self):
+        # Threads don't survive gunicorn's fork, so every worker starts its own
+        # watcher on its first request
+        if self._pid == os.getpid() or self.interval <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='data-refresh', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # Keep serving the loaded version; the next poll tries again
+                logger.exception('Refreshing %s failed', self.source)
+
+    def check(self):
+        # The key only changes with the workbook's content (or the cleaning
+        # code), and costs a stat() while the file is untouched
+        if snapshot_key(self.source, self.cleaner, self.sheet_name, self.header) == self.current().version:
+            return False
+        path, version = ensure_snapshot(self.source, self.cleaner, sheet_name=self.sheet_name, header=self.header)
+        updated, changes = self.current().refreshed(path, version)
+        self.publish(updated, changes)
+        logger.info(
+            'Loaded %s version %s (%s)', self.source, version,
+            'full rebuild' if changes is None else f'{len(changes)} changed rows'
+        )
+        return True
@@ -0,0 +1,148 @@
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly
+
+# Bounded LRU memoization for dashboard callbacks. Keys are a canonical form of
+# the callback inputs plus the data-version token of the loaded dataset.
+DEFAULT_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 256))
+DEFAULT_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+
+def canonical_key(args, version):
+    # Multi-select order doesn't change what is rendered and None means "nothing
+    # selected", so both normalise to the same sorted tuple.
+    parts = []
+    for arg in args:
+        if arg is None:
+            parts.append(())
+        elif isinstance(arg, (list, tuple)):
+            parts.append(tuple(sorted(arg)))
+        else:
+            parts.append(arg)
+    return (version,) + tuple(parts)
+
+
+class _PayloadEncoder(plotly.utils.PlotlyJSONEncoder):
+    # Results may keep whole DataFrames that are sent a page at a time; they
+    # count as the records they are sent as
+
+    def default(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            return obj.to_dict('records')
+        return super().default(obj)
+
+
+def payload_size(value):
+    # Size of the JSON Dash will send back, used for the byte budget
+    return len(json.dumps(value, cls=_PayloadEncoder))
+
+
+class LRUResultCache:
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # Without touching the recency order or the hit counts
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def carry_over(self, old_version, new_version, unaffected):
+        # After an incremental data update, re-key entries of the old version
+        # whose inputs `unaffected(name, args)` says the change didn't touch; the
+        # rest are dropped rather than left to age out.
+        with self._lock:
+            entries = self._entries
+            self._entries = OrderedDict()
+            self.current_bytes = 0
+            for key, (value, size) in entries.items():
+                if key[1] == old_version:
+                    if not unaffected(key[0], key[2:]):
+                        continue
+                    key = (key[0], new_version) + key[2:]
+                elif key[1] != new_version:
+                    continue
+                self._entries[key] = (value, size)
+                self.current_bytes += size
+            return len(self._entries)
+
+    def retain(self, version):
+        # Drop every entry computed from a dataset other than `version`
+        return self.carry_over(version, version, lambda name, args: True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_MISSING = object()
+
+
+def memoize_callback(cache, version):
+    # `version` is a callable returning the current data-version token, so a
+    # reload never serves results computed from an older dataset.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            # (name, version, *args); carry_over relies on this layout
+            key = (func.__name__,) + canonical_key(args, version())
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = func(*args)
+                cache.put(key, result, payload_size(result))
+            return result
+
+        # Whether a call with `args` would be answered from the cache
+        wrapper.is_cached = lambda *args: (func.__name__,) + canonical_key(args, version()) in cache
+        return wrapper
+    return decorator
@@ -0,0 +1,252 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from result_cache import LRUResultCache
+
+# Callback results shared by every worker process through a SQLite file on
+# local disk. Each worker keeps its in-process LRU in front of the store: a miss
+# there is looked up in the store before the callback runs, and whatever a
+# worker computes is written to both, so a view rendered by one worker is served
+# by all of them. Rows are keyed by a hash of the memoization key, which holds
+# the callback name, the data-version token (the snapshot hash) and the
+# canonical inputs. Values are pickled, so the store directory must only be
+# writable by the app.
+
+RESULT_STORE_DIR = os.environ.get('RESULT_STORE_DIR')
+RESULT_STORE_TTL = float(os.environ.get('RESULT_STORE_TTL', 24 * 60 * 60))
+RESULT_STORE_MAX_BYTES = int(os.environ.get('RESULT_STORE_MAX_BYTES', 512 * 1024 * 1024))
+# Seconds a worker waits on another worker's write lock before giving up
+RESULT_STORE_TIMEOUT = float(os.environ.get('RESULT_STORE_TIMEOUT', 2))
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    args BLOB NOT NULL,
+    value BLOB NOT NULL,
+    payload_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_version ON results (version);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+'''
+
+
+def store_key(key):
+    # (name, version, *args) as a fixed-length hash; the parts are strings,
+    # numbers, None and tuples of those, whose repr is the same in every process
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+class SQLiteResultStore:
+
+    def __init__(self, path, ttl=RESULT_STORE_TTL, max_bytes=RESULT_STORE_MAX_BYTES,
+                 timeout=RESULT_STORE_TIMEOUT):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread and process: gunicorn forks after the app
+        # is imported, and a SQLite handle must not cross a fork
+        cached = getattr(self._local, 'connection', None)
+        if cached is None or cached[0] != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            # WAL lets workers read while another one writes
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            cached = self._local.connection = (os.getpid(), db)
+        return cached[1]
+
+    def _failed(self, action):
+        # A locked or unreadable store costs a recomputation, never the request
+        self.errors += 1
+        logger.warning('Result store %s: %s failed', self.path, action, exc_info=True)
+
+    def lookup(self, key):
+        # (value, payload size) of a live entry, or None
+        try:
+            db = self._connection()
+            row = db.execute(
+                'SELECT value, payload_size FROM results WHERE key = ? AND created > ?',
+                (store_key(key), time.time() - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), store_key(key)))
+            value = pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError):
+            self._failed('lookup')
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value, row[1]
+
+    def __contains__(self, key):
+        # A live entry exists; not counted as a lookup
+        try:
+            row = self._connection().execute(
+                'SELECT 1 FROM results WHERE key = ? AND created > ?', (store_key(key), time.time() - self.ttl)
+            ).fetchone()
+        except sqlite3.Error:
+            self._failed('lookup')
+            return False
+        return row is not None
+
+    def get(self, key, default=None):
+        entry = self.lookup(key)
+        return default if entry is None else entry[0]
+
+    def put(self, key, value, size):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            db = self._connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (store_key(key), key[0], str(key[1]), pickle.dumps(key[2:]), blob, size, len(blob), now, now)
+                )
+                self._trim(db, now)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            self._failed('put')
+
+    def _trim(self, db, now):
+        # Drop expired rows, then the least recently used ones past the byte cap
+        db.execute('DELETE FROM results WHERE created <= ?', (now - self.ttl,))
+        db.execute(
+            'DELETE FROM results WHERE key IN ('
+            ' SELECT key FROM (SELECT key, SUM(stored_size) OVER (ORDER BY accessed DESC, key) AS running'
+            '                  FROM results) WHERE running > ?)',
+            (self.max_bytes,)
+        )
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM results')
+        except sqlite3.Error:
+            self._failed('clear')
+
+    def carry_over(self, old_version, new_version, unaffected):
+        # LRUResultCache.carry_over for the shared rows. Every worker publishes
+        # the new version itself; the first one to get here moves the rows and
+        # the rest find nothing left of the old version.
+        old_version, new_version = str(old_version), str(new_version)
+        try:
+            db = self._connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = db.execute('SELECT key, name, args FROM results WHERE version = ?', (old_version,)).fetchall()
+                for key, name, args in rows:
+                    args = pickle.loads(args)
+                    if not unaffected(name, args):
+                        db.execute('DELETE FROM results WHERE key = ?', (key,))
+                    elif old_version != new_version:
+                        db.execute(
+                            'UPDATE OR REPLACE results SET key = ?, version = ? WHERE key = ?',
+                            (store_key((name, new_version) + args), new_version, key)
+                        )
+                db.execute('DELETE FROM results WHERE version != ?', (new_version,))
+                kept = db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            self._failed('carry_over')
+            return 0
+        return kept
+
+    def retain(self, version):
+        # Drop every row computed from a dataset other than `version`
+        return self.carry_over(version, version, lambda name, args: True)
+
+    def stats(self):
+        try:
+            entries, stored = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM results'
+            ).fetchone()
+        except sqlite3.Error:
+            self._failed('stats')
+            entries, stored = 0, 0
+        return {'entries': entries, 'bytes': stored, 'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+class TieredResultCache:
+    # The worker's LRU in front of the shared store, with LRUResultCache's
+    # interface so memoize_callback and cache_collector use it unchanged
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def __contains__(self, key):
+        return key in self.local or key in self.shared
+
+    def get(self, key, default=None):
+        value = self.local.get(key, default)
+        if value is not default:
+            return value
+        entry = self.shared.lookup(key)
+        if entry is None:
+            return default
+        self.local.put(key, *entry)
+        return entry[0]
+
+    def put(self, key, value, size):
+        self.local.put(key, value, size)
+        self.shared.put(key, value, size)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def carry_over(self, old_version, new_version, unaffected):
+        self.shared.carry_over(old_version, new_version, unaffected)
+        return self.local.carry_over(old_version, new_version, unaffected)
+
+    def retain(self, version):
+        self.shared.retain(version)
+        return self.local.retain(version)
+
+    def stats(self):
+        # Hits from either tier; a miss is one neither tier could answer
+        local, shared = self.local.stats(), self.shared.stats()
+        return dict(local, hits=local['hits'] + shared['hits'], misses=shared['misses'],
+                    store_entries=shared['entries'], store_bytes=shared['bytes'],
+                    store_hits=shared['hits'], store_errors=shared['errors'])
+
+
+def shared_result_cache(name, local=None):
+    # The app's result cache: backed by RESULT_STORE_DIR/<name>.sqlite when a
+    # store directory is configured (gunicorn.conf.py sets one), else the
+    # worker's own LRU only
+    local = local if local is not None else LRUResultCache()
+    if not RESULT_STORE_DIR:
+        return local
+    return TieredResultCache(local, SQLiteResultStore(os.path.join(RESULT_STORE_DIR, f'{name}.sqlite')))
@@ -0,0 +1,157 @@
+import math
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Server-side paging, sorting and filtering for DataTables in custom mode
+# (page_action/sort_action/filter_action='custom'). The full table stays on the
+# server as a DataFrame; each request sorts and filters it with vectorised
+# pandas operations and returns only the rows of the visible page.
+#
+# Records go out compact: short column ids (c0, c1, ...) instead of the header
+# text repeated in every row, numbers rounded to TABLE_ROUND_DIGITS and whole
+# numbers without a trailing .0. Columns carry their type, so the browser sorts
+# and filters numeric columns as numbers.
+
+PAGE_SIZE = int(os.environ.get('TABLE_PAGE_SIZE', 25))
+ROUND_DIGITS = int(os.environ.get('TABLE_ROUND_DIGITS', 2))
+
+# "{column} op value" terms joined by && in a DataTable filter_query. Operators
+# come in word and symbol form, optionally prefixed with i/s for case-(in)sensitive.
+_FILTER_TERM = re.compile(
+    r'^\{(?P<column>[^}]+)\}\s+(?P<op>[is]?(?:ge|le|lt|gt|ne|eq|contains|datestartswith|>=|<=|<|>|!=|=))\s+(?P<value>.+)$'
+)
+_COMPARISONS = {
+    'ge': '>=', 'le': '<=', 'lt': '<', 'gt': '>', 'ne': '!=', 'eq': '=',
+    '>=': '>=', '<=': '<=', '<': '<', '>': '>', '!=': '!=', '=': '=',
+}
+
+
+def column_ids(frame):
+    return [f'c{i}' for i in range(len(frame.columns))]
+
+
+def table_columns(frame):
+    # DataTable column definitions: header text, short id and type. Mixed
+    # columns (e.g. a summary's Value) are left untyped.
+    columns = []
+    for column_id, (name, values) in zip(column_ids(frame), frame.items()):
+        column = {'name': str(name), 'id': column_id}
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            column['type'] = 'numeric'
+        elif pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+            column['type'] = 'text'
+        columns.append(column)
+    return columns
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def _compact_values(values):
+    # The column's values for JSON: rounded floats, whole numbers as ints,
+    # everything else as is
+    values = np.asarray(values)
+    compact = values.astype(object)
+    if values.dtype.kind == 'f':
+        positions = np.arange(len(values))
+    elif values.dtype.kind == 'O':
+        positions = np.array([i for i, value in enumerate(compact) if _is_number(value)], dtype=np.int64)
+    else:
+        return compact
+    rounded = np.round(compact[positions].astype(float), ROUND_DIGITS)
+    whole = np.isfinite(rounded) & (rounded == np.floor(rounded))
+    compact[positions] = rounded.astype(object)
+    compact[positions[whole]] = rounded[whole].astype(np.int64).astype(object)
+    return compact
+
+
+def compact_records(frame):
+    # Records keyed by the short column ids of table_columns
+    columns = [_compact_values(values) for _, values in frame.items()]
+    ids = column_ids(frame)
+    return [dict(zip(ids, row)) for row in zip(*columns)]
+
+
+def parse_filter_query(filter_query):
+    # List of (column, operator, value, case_sensitive); terms that can't be
+    # parsed are skipped rather than failing the whole table
+    terms = []
+    for part in (filter_query or '').split(' && '):
+        match = _FILTER_TERM.match(part.strip())
+        if match is None:
+            continue
+        op, value = match.group('op'), match.group('value').strip()
+        case_sensitive = not op.startswith('i')
+        if op[0] in 'is':
+            op = op[1:]
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1]
+        terms.append((match.group('column'), _COMPARISONS.get(op, op), value, case_sensitive))
+    return terms
+
+
+def _term_mask(series, op, value, case_sensitive):
+    if op in ('contains', 'datestartswith'):
+        text = series.astype(str)
+        if op == 'datestartswith':
+            return text.str.startswith(value).to_numpy()
+        return text.str.contains(value, case=case_sensitive, regex=False).to_numpy()
+
+    if pd.api.types.is_numeric_dtype(series):
+        try:
+            value = float(value)
+        except ValueError:
+            series = series.astype(str)
+    else:
+        series = series.astype(str)
+        if not case_sensitive:
+            series, value = series.str.lower(), value.lower()
+    if op == '=':
+        return (series == value).to_numpy()
+    if op == '!=':
+        return (series != value).to_numpy()
+    if op == '>=':
+        return (series >= value).to_numpy()
+    if op == '<=':
+        return (series <= value).to_numpy()
+    if op == '<':
+        return (series < value).to_numpy()
+    return (series > value).to_numpy()
+
+
+def filter_frame(frame, filter_query):
+    mask = None
+    for column, op, value, case_sensitive in parse_filter_query(filter_query):
+        if column not in frame.columns:
+            continue
+        term = _term_mask(frame[column], op, value, case_sensitive)
+        mask = term if mask is None else mask & term
+    return frame if mask is None else frame[mask]
+
+
+def sort_frame(frame, sort_by):
+    columns = [entry for entry in sort_by or [] if entry['column_id'] in frame.columns]
+    if not columns:
+        return frame
+    return frame.sort_values(
+        [entry['column_id'] for entry in columns],
+        ascending=[entry['direction'] == 'asc' for entry in columns],
+        kind='mergesort',
+        na_position='last',
+    )
+
+
+def table_page(frame, page_current, page_size, sort_by=None, filter_query=None):
+    # Records of the requested page and the page count after filtering. Filter
+    # before sorting so only the matching rows are sorted. `frame` is labelled
+    # with the column ids, which sort_by and filter_query refer to.
+    page_size = page_size or PAGE_SIZE
+    frame = sort_frame(filter_frame(frame, filter_query), sort_by)
+    page_count = max(math.ceil(len(frame) / page_size), 1)
+    page_current = min(page_current or 0, page_count - 1)
+    start = page_current * page_size
+    return compact_records(frame.iloc[start:start + page_size]), page_count
@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_raw_frame
+from cube import CUBE_DIMENSIONS, UNITS
+from dashboard_data import DashboardData, SQLData
+from demo_graphs import GRAPH_REGISTRY, QUARTER_COLUMNS, GraphPlanner
+from loader import clean_demo_sheet, clean_final_sheet, read_snapshot, save_snapshot
+from query_backends import DuckDBBackend
+
+pytest.importorskip('duckdb')
+
+# The pandas and DuckDB backends must answer every query the dashboards make
+# with the same frame; benchmarks/parity.py runs the same checks at scale.
+
+# (areas, developers, asset_types, start, end) with positions on the quarter axis
+SELECTIONS = [
+    ([], [], [], 0, -1),
+    (['East'], [], [], 0, -1),
+    (['North', 'South'], [], ['Villa', 'Plot'], 2, 9),
+    ([], ['Developer 00000', 'Developer 00003'], [], 4, 4),
+    (['Central'], ['Developer 00001'], ['Apartment'], 0, 5),
+]
+GROUPINGS = [['Year', 'Quarter'], ['Developer Name'], ['Area', 'QuarterOrdinal'], ['Asset Type', 'Year']]
+
+
+def write_snapshot(frame, path):
+    # Stored the way loader.load_dataset stores a cleaned frame
+    save_snapshot(frame.reset_index(drop=True), path)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def final_snapshot(tmp_path_factory):
+    frame = clean_final_sheet(generate_raw_frame(20_000, seed=1))
+    return write_snapshot(frame, tmp_path_factory.mktemp('final') / 'final.feather')
+
+
+@pytest.fixture(scope='module')
+def backends(final_snapshot):
+    data = DashboardData(read_snapshot(final_snapshot), 'test')
+    return data, data.backend, DuckDBBackend(final_snapshot)
+
+
+def window(data, start, end):
+    return start % len(data.quarters), end % len(data.quarters)
+
+
+@pytest.mark.parametrize('by', GROUPINGS, ids='+'.join)
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_units_by(backends, by, selection):
+    data, pandas_backend, duckdb_backend = backends
+    areas, developers, asset_types, start, end = selection
+    start, end = window(data, start, end)
+    pd.testing.assert_frame_equal(
+        pandas_backend.units_by(by, areas, developers, asset_types, start, end).reset_index(drop=True),
+        duckdb_backend.units_by(by, areas, developers, asset_types, start, end).reset_index(drop=True),
+    )
+
+
+@pytest.mark.parametrize('selection', SELECTIONS)
+def test_developer_ranking(backends, selection):
+    data, pandas_backend, duckdb_backend = backends
+    areas, developers, asset_types, start, end = selection
+    start, end = window(data, start, end)
+    expected = pandas_backend.developer_ranking(10, areas, developers, asset_types, start, end)
+    actual = duckdb_backend.developer_ranking(10, areas, developers, asset_types, start, end)
+    pd.testing.assert_frame_equal(expected.top, actual.top)
+    assert (expected.total, expected.count, expected.minimum) == (actual.total, actual.count, actual.minimum)
+
+
+@pytest.mark.parametrize('spec', [spec for spec in GRAPH_REGISTRY if spec['chart'] != 'cumulative_lines'],
+                         ids=lambda spec: spec['value'])
+def test_grouped(tmp_path_factory, spec):
+    path = tmp_path_factory.getbasetemp() / 'demo.feather'
+    if not path.exists():
+        write_snapshot(clean_demo_sheet(generate_raw_frame(20_000, seed=1)), path)
+    expected = GraphPlanner(read_snapshot(str(path))).aggregate(spec)
+    actual = GraphPlanner(engine=DuckDBBackend(str(path), QUARTER_COLUMNS)).aggregate(spec)
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected, actual)
+    else:
+        pd.testing.assert_series_equal(expected, actual)
+
+
+def test_sql_data_axes(final_snapshot, backends):
+    data, _, _ = backends
+    sql_data = SQLData(final_snapshot, 'test')
+    assert list(sql_data.quarters) == list(data.quarters)
+    for column in ['Area', 'Developer Name', 'Asset Type']:
+        assert sql_data.members(column) == data.members(column)
+
+
+def test_sql_data_refreshed(tmp_path, final_snapshot, backends):
+    data, _, _ = backends
+    frame = read_snapshot(final_snapshot)
+    # A few rows dropped, one changed and one duplicated
+    frame = pd.concat([frame.iloc[5:], frame.iloc[[10]]], ignore_index=True)
+    frame.loc[20, UNITS] = frame.loc[20, UNITS] + 7
+    path = write_snapshot(frame, tmp_path / 'refreshed.feather')
+
+    expected_data, expected = data.updated(read_snapshot(path), 'new')
+    updated, changes = SQLData(final_snapshot, 'test').refreshed(path, 'new')
+    assert updated.version == 'new'
+    assert list(updated.quarters) == list(expected_data.quarters)
+
+    def rows(frame):
+        columns = CUBE_DIMENSIONS + [UNITS, 'QuarterOrdinal']
+        frame = frame.dropna(subset=CUBE_DIMENSIONS)[columns].astype({UNITS: 'float64'})
+        for column in columns:
+            if isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype(str)
+        return frame.sort_values(columns, ignore_index=True)
+    pd.testing.assert_frame_equal(rows(expected), rows(changes), check_dtype=False)
@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+import loader
+from benchmarks.synthetic import generate_raw_frame
+from loader import clean_demo_sheet, clean_final_sheet, ensure_snapshot, load_dataset, read_snapshot, stream_final_sheet
+
+# Snapshots are shared between worker processes by memory-mapping them, which
+# only works when each column is one contiguous buffer in the file.
+
+
+def mapped_ranges(path):
+    # Address ranges this process has mapped from `path`
+    with open('/proc/self/maps') as fh:
+        for line in fh:
+            fields = line.split(maxsplit=5)
+            if len(fields) == 6 and os.path.realpath(fields[5].strip()) == os.path.realpath(path):
+                start, end = (int(address, 16) for address in fields[0].split('-'))
+                yield start, end
+
+
+def assert_mapped(frame, path):
+    # Numeric columns without nulls convert without a copy; they must be
+    # read-only views into the mapped file, not heap arrays
+    table = feather.read_table(path, memory_map=True)
+    assert {column.num_chunks for column in table.columns} == {1}
+    ranges = list(mapped_ranges(path))
+    columns = [
+        column for column in frame.columns
+        if frame[column].dtype.kind in 'fiM' and table.column(column).null_count == 0
+    ]
+    assert columns
+    for column in columns:
+        values = frame[column].to_numpy()
+        address = values.__array_interface__['data'][0]
+        assert not values.flags.writeable, column
+        assert any(start <= address < end for start, end in ranges), column
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / 'final.xlsx'
+    generate_raw_frame(3_000, seed=2).to_excel(path, index=False)
+    return str(path)
+
+
+needs_maps = pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason='needs /proc/self/maps')
+
+
+@needs_maps
+def test_streamed_snapshot_is_mapped(tmp_path, workbook):
+    # Small chunks, so the rows are staged in several pieces across many quarters
+    path = str(tmp_path / 'final.feather')
+    stream_final_sheet(workbook, path, chunk_rows=500)
+    assert_mapped(read_snapshot(path), path)
+
+
+@needs_maps
+@pytest.mark.parametrize('cleaner, options', [
+    (clean_final_sheet, {}),
+    (clean_demo_sheet, {'header': 1}),
+], ids=['streamed', 'whole'])
+def test_load_dataset_is_mapped(tmp_path, monkeypatch, cleaner, options):
+    # The snapshot the dashboards really load, on a cold and a warm start
+    monkeypatch.setattr(loader, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    source = str(tmp_path / 'sheet.xlsx')
+    generate_raw_frame(3_000, seed=3).to_excel(source, index=False, startrow=options.get('header', 0))
+    for _ in range(2):
+        frame, _ = load_dataset(source, cleaner, **options)
+        path, _ = ensure_snapshot(source, cleaner, **options)
+        assert_mapped(frame, path)
+
+
+def test_save_snapshot_writes_one_batch(tmp_path):
+    # to_feather alone splits a frame every 64K rows
+    frame = pd.DataFrame({'value': np.arange(150_000, dtype='float64')})
+    path = str(tmp_path / 'large.feather')
+    loader.save_snapshot(frame, path)
+    assert feather.read_table(path).column('value').num_chunks == 1
+    assert not read_snapshot(path)['value'].to_numpy().flags.writeable
+
+
+def test_unmapped_snapshot_is_copied_with_warning(tmp_path, caplog):
+    frame = pd.DataFrame({'value': np.arange(150_000, dtype='float64')})
+    path = str(tmp_path / 'batches.feather')
+    frame.to_feather(path, compression='uncompressed', chunksize=50_000)
+    with caplog.at_level('WARNING', logger='loader'):
+        copied = read_snapshot(path)
+    pd.testing.assert_frame_equal(copied, frame)
+    assert 'not mapped (3 record batches' in caplog.text
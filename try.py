@@ -1,152 +1,439 @@
+import json
+import os
+
 import dash
-from dash import html, dcc, Input, Output, dash_table, State
+from dash import html, dcc, ClientsideFunction, Input, Output, dash_table, State, MATCH, Patch, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import plotly.express as px
+import numpy as np
+import plotly
 import pandas as pd
-import plotly.graph_objs as go
-from plotly.subplots import make_subplots
-
-# Load the data from the "Final" sheet
-df = pd.read_excel("./data/TruEstimate Final Sheet Project (5).xlsx", sheet_name='Final')
-
-# Data Preprocessing
-df['Launch Date'] = pd.to_datetime(df['Launch Date'], errors='coerce')
-df = df[df['Launch Date'] > '2022-01-01']
-
-df['Year'] = df['Launch Date'].dt.year
-df['Quarter'] = df['Launch Date'].dt.quarter
-df['YearQuarter'] = df['Year'].astype(str) + ' Q' + df['Quarter'].astype(str)
-
-df['Area'] = df['Area'].astype(str).str.strip().str.title()
-df['Developer Name'] = df['Developer Name'].astype(str).str.strip()
-df = df[df['Area'].notna() & (df['Area'] != 'Unknown') & (df['Area'].str.lower() != 'nan') & (df['Area'] != '')]
-
-# Standardize 'Area' names
-df['Area'] = df['Area'].str.title()
-
-# Standardize 'Asset Type' to include all variations
-df['Asset Type'] = df['Asset Type'].astype(str).str.strip().str.title()
-df['Asset Type'] = df['Asset Type'].replace({
-    'Plot': 'Plot',
-    'Land': 'Plot',
-    'Plot/Land': 'Plot',
-    'Plot Land': 'Plot',
-    'Villa': 'Villa',
-    'Apartment': 'Apartment',
-    'Flat': 'Apartment'
-})
-df = df[df['Asset Type'].isin(['Apartment', 'Villa', 'Plot'])]
-
-# Generate unique YearQuarter values for RangeSlider
-year_quarters = df['YearQuarter'].unique()
-year_quarters = sorted(year_quarters, key=lambda x: (int(x.split()[0]), int(x.split()[1][1])))
+
+from background_jobs import job_manager, job_options, reporting_progress, runs_as_job
+from component_pool import build_components, running_as_script
+from compression import install_compression
+from cube import quarter_label, quarter_labels
+from dashboard_data import DashboardData, SQLData
+from decimation import prepare_figure, zoom_patch, zoom_window
+from loader import clean_final_sheet, ensure_snapshot, load_dataset
+from metrics import MetricsRegistry, cache_collector, current_timer, install_metrics, instrument_callback, marks_output
+from partitions import PartitionCatalog, PartitionedData
+from query_backends import QUERY_BACKEND
+from refresh import REFRESH_INTERVAL, DataRefresher, selection_touches
+from result_cache import memoize_callback
+from result_store import shared_result_cache
+from table_query import PAGE_SIZE, ROUND_DIGITS, compact_records, table_columns, table_page
+from view_figures import chart_figure, developer_units_figure, panel_layout, units_layout
+
+DATA_SOURCE = "./data/TruEstimate Final Sheet Project (5).xlsx"
+
+# Clientside filtering mode: the browser gets the cube once per data version and
+# answers filter and date-range changes itself (assets/clientside_cube.js)
+CLIENTSIDE_FILTERING = os.environ.get('CLIENTSIDE_FILTERING', '0') == '1'
+
+# Partitioned archive mode: with DATA_PARTITIONS set to an archive directory
+# (partitions.py), only its catalog is read at startup and each request loads
+# the city/year partitions its filters and date range touch. DASHBOARD_CITIES
+# limits the dashboard to some of the archive's cities (comma-separated).
+DATA_PARTITIONS = os.environ.get('DATA_PARTITIONS')
+DASHBOARD_CITIES = [city for city in os.environ.get('DASHBOARD_CITIES', '').split(',') if city]
+
+
+if DATA_PARTITIONS:
+    data = PartitionedData(PartitionCatalog(DATA_PARTITIONS), DASHBOARD_CITIES)
+elif QUERY_BACKEND == 'duckdb':
+    # The snapshot of the "Final" sheet stays on disk; DuckDB answers every
+    # query from it and nothing is loaded or pre-aggregated in memory
+    data = SQLData(*ensure_snapshot(DATA_SOURCE, clean_final_sheet, sheet_name='Final'))
+else:
+    # Load the data from the "Final" sheet (served from the columnar snapshot when the workbook is unchanged)
+    df, data_version = load_dataset(DATA_SOURCE, clean_final_sheet, sheet_name='Final')
+
+    # Cube, filter bitmaps, quarter axis and prefix sums, built once at load
+    data = DashboardData(df, data_version)
+
+# Memoized callback results, keyed by normalized filter state and data version;
+# shared by all workers through the result store when one is configured, with
+# rows left by other datasets dropped
+result_cache = shared_result_cache('update_display')
+result_cache.retain(data.version)
+
+
+def publish_data(updated, changes):
+    # Swap in a new dataset. After an incremental update, cached results for
+    # selections none of the changed rows fall into stay valid, so they move to
+    # the new version instead of going cold; positions only keep their meaning
+    # while the quarter axis is unchanged.
+    global data
+    previous = data
+    if changes is not None and np.array_equal(previous.quarters, updated.quarters):
+        result_cache.carry_over(
+            previous.version, updated.version,
+            lambda name, args: not selection_touches(changes, updated.quarters, *args[1:])
+        )
+    else:
+        result_cache.retain(updated.version)
+    data = updated
+
+
+# Watches the workbook and publishes new versions without a restart; a
+# rewritten partition archive is picked up on the next restart
+refresher = None
+if not DATA_PARTITIONS:
+    refresher = DataRefresher(DATA_SOURCE, clean_final_sheet, lambda: data, publish_data, sheet_name='Final')
 
 # Initialize the app with Bootstrap theme
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
 
-# Define layout
-app.layout = dbc.Container([
-    html.H1('Real Estate Project Dashboard', className='text-center text-primary mb-4'),
-
-    dbc.Row([
-        dbc.Col([
-            html.Label('Select Graph View:', className='text-dark font-weight-bold'),
-            dcc.Dropdown(
-                id='graph-view-dropdown',
-                options=[
-                    {'label': 'Total Units by Quarter', 'value': 'QUARTERLY'},
-                    {'label': 'Developer-wise Quarterly Launches', 'value': 'DEVELOPER'},
-                    {'label': 'Units Launched in Area by Quarter', 'value': 'AREA_QUARTERLY'},
-                    {'label': 'Asset Type Launched Year-wise', 'value': 'ASSET_YEARLY'}
-                ],
-                value='QUARTERLY',
-                style={'width': '100%'}
-            )
-        ], md=3),
-
-        dbc.Col([
-            html.Label('Select Area:', className='text-dark font-weight-bold'),
-            dcc.Dropdown(
-                id='area-filter-dropdown',
-                options=[{'label': area, 'value': area} for area in sorted(df['Area'].unique())],
-                multi=True,
-                placeholder='Filter by Area',
-                style={'width': '100%'}
-            )
-        ], md=3),
-
-        dbc.Col([
-            html.Label('Select Developer:', className='text-dark font-weight-bold'),
-            dcc.Dropdown(
-                id='developer-filter-dropdown',
-                options=[{'label': dev, 'value': dev} for dev in sorted(df['Developer Name'].unique())],
-                multi=True,
-                placeholder='Filter by Developer',
-                style={'width': '100%'}
-            )
-        ], md=3),
-
-        dbc.Col([
-            html.Label('Select Asset Type:', className='text-dark font-weight-bold'),
-            dcc.Dropdown(
-                id='asset-type-dropdown',
-                options=[{'label': asset, 'value': asset} for asset in ['Apartment', 'Villa', 'Plot']],
-                multi=True,
-                placeholder='Filter by Asset Type',
-                style={'width': '100%'}
-            )
-        ], md=3),
-    ], className='mb-4'),
-
-    dbc.Row([
-        dbc.Col([
-            html.Label('Select Date Range:', className='text-dark font-weight-bold'),
-            dcc.RangeSlider(
-                id='date-range-slider',
-                min=0,
-                max=len(year_quarters) - 1,
-                value=[0, len(year_quarters) - 1],
-                marks={i: year_quarters[i] for i in range(len(year_quarters))},
-                step=1
-            )
-        ], md=12),
-    ], className='mb-4'),
-
-    dbc.Row([
-        dbc.Col([
-            html.Div(id='display-container')
-        ], md=12),
-    ])
-], fluid=True)
-
-# Callback to update display
+# Per-callback latency histograms, served on /metrics
+metrics_registry = install_metrics(app, MetricsRegistry())
+metrics_registry.add_collector(cache_collector('update_display', result_cache))
+if DATA_PARTITIONS:
+    metrics_registry.add_collector(cache_collector('partitions', data.cache))
+
+# Compressed JSON responses for clients that accept gzip/brotli
+install_compression(app)
+
+# View renders as background jobs when BACKGROUND_CALLBACKS=1 (background_jobs.py)
+jobs = job_manager('try')
+
+
+@app.server.before_request
+def start_refresher():
+    if refresher is not None:
+        refresher.ensure_started()
+
+
+def callback_when(enabled, *args, **kwargs):
+    # app.callback, registered only when `enabled`: the server and clientside
+    # filtering modes fill the same display outputs
+    if not enabled:
+        return lambda func: func
+    return app.callback(*args, **kwargs)
+
+
+def area_options(current):
+    return [{'label': area, 'value': area} for area in current.members('Area')]
+
+
+def developer_options(current):
+    return [{'label': dev, 'value': dev} for dev in current.members('Developer Name')]
+
+
+def slider_marks(current):
+    return {i: quarter_label(int(ordinal)) for i, ordinal in enumerate(current.quarters)}
+
+
+def loaded_version(current):
+    # What the page was rendered from, so sync_controls can tell when it is stale
+    return {'version': current.version, 'quarters': [int(ordinal) for ordinal in current.quarters]}
+
+
+def cube_store_data(current):
+    # The cube, and the rounding the browser's tables use to match ours
+    return dict(current.columnar_cube(), round_digits=ROUND_DIGITS)
+
+
+def paged_table_id(name):
+    return {'type': 'paged-table', 'index': name}
+
+
+# Components every view shows; refresh_view fills in their data, except the
+# rows of the paged tables, which page_table serves a page at a time. With
+# clientside filtering the browser holds whole tables and pages them itself.
+PAGED_TABLES = not CLIENTSIDE_FILTERING
+TABLE_IDS = ['summary-table', paged_table_id('main'), paged_table_id('percentage')]
+FIGURE_IDS = ['view-figure-1', 'view-figure-2', 'view-figure-3']
+
+# Styles shared by every view's tables; views vary the cells (VIEW_LAYOUTS),
+# the summary width and whether headers stay fixed
+TABLE_CONTAINER_STYLE = {'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%'}
+CELL_STYLE = {'textAlign': 'center', 'padding': '5px', 'fontSize': '12px', 'fontFamily': 'Arial'}
+SUMMARY_CELL_STYLE = dict(CELL_STYLE, textAlign='left', padding='10px', fontSize='14px')
+HEADER_STYLE = {'fontWeight': 'bold', 'color': 'white', 'textAlign': 'center'}
+HEADER_STYLES = {
+    'summary': dict(HEADER_STYLE, backgroundColor='#ffc107', color='black'),
+    'main': dict(HEADER_STYLE, backgroundColor='#17a2b8'),
+    'percentage': dict(HEADER_STYLE, backgroundColor='#28a745'),
+}
+
+
+# What differs between the views' skeletons
+VIEW_LAYOUTS = {
+    'QUARTERLY': {
+        'summary_width': '50%',
+        'main_title': 'Total Units Table',
+        'percentage_title': 'Percentage Table',
+        'cell_style': dict(CELL_STYLE, padding='10px', fontSize='14px'),
+        'fixed_headers': True,
+        'figure_rows': [[4, 4, 4]],
+    },
+    'DEVELOPER': {
+        'summary_width': '60%',
+        'main_title': 'Developers Total Units and Percentage',
+        'percentage_title': None,
+        'cell_style': dict(CELL_STYLE, padding='10px', height='auto', whiteSpace='normal'),
+        'fixed_headers': False,
+        'figure_rows': [[12], [6, 6]],
+    },
+    'AREA_QUARTERLY': {
+        'summary_width': '50%',
+        'main_title': 'Units Launched by Area',
+        'percentage_title': 'Percentage Contribution',
+        'cell_style': dict(CELL_STYLE, height='auto', whiteSpace='normal'),
+        'fixed_headers': False,
+        'figure_rows': [[12], [6, 6]],
+    },
+    'ASSET_YEARLY': {
+        'summary_width': '50%',
+        'main_title': 'Units Launched by Asset Type',
+        'percentage_title': 'Percentage Contribution',
+        'cell_style': dict(CELL_STYLE, height='auto'),
+        'fixed_headers': False,
+        'figure_rows': [[12], [6, 6]],
+    },
+}
+
+
+def data_table(table_id, kind, style_cell, fixed_headers, paged=False, **container_style):
+    if paged:
+        # Paging, sorting and filtering happen on the server; the browser only
+        # ever holds the visible page
+        actions = {'page_action': 'custom', 'sort_action': 'custom', 'filter_action': 'custom',
+                   'page_current': 0, 'page_size': PAGE_SIZE, 'sort_by': [], 'filter_query': ''}
+    else:
+        actions = {'page_action': 'none', 'sort_action': 'native'}
+    return dash_table.DataTable(
+        id=table_id,
+        data=[],
+        columns=[],
+        style_table=dict(TABLE_CONTAINER_STYLE, **container_style),
+        style_cell=style_cell,
+        style_header=HEADER_STYLES[kind],
+        **({'fixed_rows': {'headers': True}} if fixed_headers else {}),
+        **actions,
+        editable=False
+    )
+
+
+def view_skeleton(view):
+    # Static part of a view: cards, styled tables and empty graphs. It only
+    # changes with the view; filter and slider changes update data props only.
+    layout = VIEW_LAYOUTS.get(view, VIEW_LAYOUTS['QUARTERLY'])
+
+    summary_table = data_table('summary-table', 'summary', SUMMARY_CELL_STYLE, True, width=layout['summary_width'])
+    main_table = data_table(paged_table_id('main'), 'main', layout['cell_style'], layout['fixed_headers'],
+                            paged=PAGED_TABLES)
+    percentage_table = data_table(paged_table_id('percentage'), 'percentage', layout['cell_style'],
+                                  layout['fixed_headers'], paged=PAGED_TABLES, marginTop='20px')
+
+    tables = [html.H4(layout['main_title'], className='card-title'), main_table]
+    if layout['percentage_title']:
+        tables += [html.H4(layout['percentage_title'], className='card-title mt-4'), percentage_table]
+    else:
+        # Not part of this view; kept so refresh_view has one fixed set of outputs
+        tables.append(html.Div(percentage_table, style={'display': 'none'}))
+
+    figure_ids = iter(FIGURE_IDS)
+    return [
+        # The view these components belong to; a new skeleton triggers refresh_view
+        dcc.Store(id='view-state', data={'view': view}),
+        # Columns and trace layout the browser currently shows, see refresh_view
+        dcc.Store(id='view-signature'),
+        html.Div(id='view-message'),
+        html.Div([
+            dbc.Card(dbc.CardBody([
+                html.H4("Data Summary", className='card-title'),
+                summary_table,
+            ]), className='mb-4'),
+            dbc.Card(dbc.CardBody(tables), className='mb-4'),
+        ] + [
+            dbc.Row([dbc.Col(dcc.Graph(id=next(figure_ids)), md=width) for width in row])
+            for row in layout['figure_rows']
+        ], id='view-body'),
+    ]
+
+
+# Define layout; a function so every page load renders the current dataset
+def serve_layout():
+    current = data
+    return dbc.Container([
+        html.H1('Real Estate Project Dashboard', className='text-center text-primary mb-4'),
+
+        dbc.Row([
+            dbc.Col([
+                html.Label('Select Graph View:', className='text-dark font-weight-bold'),
+                dcc.Dropdown(
+                    id='graph-view-dropdown',
+                    options=[
+                        {'label': 'Total Units by Quarter', 'value': 'QUARTERLY'},
+                        {'label': 'Developer-wise Quarterly Launches', 'value': 'DEVELOPER'},
+                        {'label': 'Units Launched in Area by Quarter', 'value': 'AREA_QUARTERLY'},
+                        {'label': 'Asset Type Launched Year-wise', 'value': 'ASSET_YEARLY'}
+                    ],
+                    value='QUARTERLY',
+                    style={'width': '100%'}
+                )
+            ], md=3),
+
+            dbc.Col([
+                html.Label('Select Area:', className='text-dark font-weight-bold'),
+                dcc.Dropdown(
+                    id='area-filter-dropdown',
+                    options=area_options(current),
+                    multi=True,
+                    placeholder='Filter by Area',
+                    style={'width': '100%'}
+                )
+            ], md=3),
+
+            dbc.Col([
+                html.Label('Select Developer:', className='text-dark font-weight-bold'),
+                dcc.Dropdown(
+                    id='developer-filter-dropdown',
+                    options=developer_options(current),
+                    multi=True,
+                    placeholder='Filter by Developer',
+                    style={'width': '100%'}
+                )
+            ], md=3),
+
+            dbc.Col([
+                html.Label('Select Asset Type:', className='text-dark font-weight-bold'),
+                dcc.Dropdown(
+                    id='asset-type-dropdown',
+                    options=[{'label': asset, 'value': asset} for asset in ['Apartment', 'Villa', 'Plot']],
+                    multi=True,
+                    placeholder='Filter by Asset Type',
+                    style={'width': '100%'}
+                )
+            ], md=3),
+        ], className='mb-4'),
+
+        dbc.Row([
+            dbc.Col([
+                html.Label('Select Date Range:', className='text-dark font-weight-bold'),
+                dcc.RangeSlider(
+                    id='date-range-slider',
+                    min=0,
+                    max=len(current.quarters) - 1,
+                    value=[0, len(current.quarters) - 1],
+                    marks=slider_marks(current),
+                    step=1
+                )
+            ], md=12),
+        ], className='mb-4'),
+
+        dbc.Row([
+            dbc.Col(([
+                # Progress of the background job rendering the view, shown while it runs
+                dbc.Progress(id='view-progress', value=0, max=1, striped=True, animated=True,
+                             className='mb-2', style={'display': 'none'}),
+                # Selection refresh_view hands to refresh_view_job
+                dcc.Store(id='view-job'),
+            ] if jobs is not None else []) + [
+                html.Div(view_skeleton('QUARTERLY'), id='display-container')
+            ], md=12),
+        ]),
+
+        # Dataset version this page shows, and how often to check for a newer
+        # one; pages don't poll when refresh is off or nothing can change
+        dcc.Store(id='data-version', data=loaded_version(current)),
+        dcc.Interval(id='data-refresh-interval', interval=max(REFRESH_INTERVAL, 5) * 1000,
+                     disabled=refresher is None or REFRESH_INTERVAL <= 0),
+    ] + ([
+        # Clientside filtering: the cube the browser rolls up, and the filter
+        # state of anything it has to ask the server for
+        dcc.Store(id='cube-store', data=cube_store_data(current)),
+        dcc.Store(id='view-request'),
+    ] if CLIENTSIDE_FILTERING else []), fluid=True)
+
+
+app.layout = serve_layout
+
+
+# Bring open pages up to date after a refresh: new areas, developers and
+# quarters appear in the controls, and re-setting the slider value re-renders
+# the display from the new data
 @app.callback(
-    Output('display-container', 'children'),
-    [Input('graph-view-dropdown', 'value'),
-     Input('area-filter-dropdown', 'value'),
-     Input('developer-filter-dropdown', 'value'),
-     Input('asset-type-dropdown', 'value'),
-     Input('date-range-slider', 'value')]
+    [Output('area-filter-dropdown', 'options'),
+     Output('developer-filter-dropdown', 'options'),
+     Output('date-range-slider', 'max'),
+     Output('date-range-slider', 'marks'),
+     Output('date-range-slider', 'value'),
+     Output('data-version', 'data')]
+    + ([Output('cube-store', 'data')] if CLIENTSIDE_FILTERING else []),
+    [Input('data-refresh-interval', 'n_intervals')],
+    [State('data-version', 'data'),
+     State('date-range-slider', 'value')]
 )
-def update_display(view, selected_areas, selected_developers, selected_asset_types, date_range):
-    filtered_df = df.copy()
+def sync_controls(n_intervals, loaded, date_range):
+    current = data
+    if loaded['version'] == current.version:
+        raise PreventUpdate
+
+    # Keep the same quarters selected; a window ending on the last quarter
+    # keeps following the newest one
+    old_quarters = loaded['quarters']
+    last = len(current.quarters) - 1
+    start, end = date_range
+    start = int(np.searchsorted(current.quarters, old_quarters[start], side='left'))
+    if end == len(old_quarters) - 1:
+        end = last
+    else:
+        end = int(np.searchsorted(current.quarters, old_quarters[end], side='right')) - 1
+    start, end = min(start, last), max(min(end, last), 0)
+    if start > end:
+        start, end = 0, last
+
+    controls = (area_options(current), developer_options(current), last, slider_marks(current),
+                [start, end], loaded_version(current))
+    if CLIENTSIDE_FILTERING:
+        controls += (cube_store_data(current),)
+    return controls
 
-    # Apply filters
-    if selected_areas:
-        filtered_df = filtered_df[filtered_df['Area'].isin(selected_areas)]
-    if selected_developers:
-        filtered_df = filtered_df[filtered_df['Developer Name'].isin(selected_developers)]
-    if selected_asset_types:
-        filtered_df = filtered_df[filtered_df['Asset Type'].isin(selected_asset_types)]
 
-    selected_year_quarters = year_quarters[date_range[0]:date_range[1] + 1]
-    filtered_df = filtered_df[filtered_df['YearQuarter'].isin(selected_year_quarters)]
+NO_DATA = {'message': 'No data available for the selected filters.'}
+
+
+def table_props(frame, paged=False):
+    props = {'columns': table_columns(frame)}
+    if paged:
+        # Kept whole, labelled with the column ids, for page_table to slice
+        props['frame'] = frame.set_axis([column['id'] for column in props['columns']], axis=1)
+    else:
+        props['data'] = compact_records(frame)
+    return props
+
+
+def view_result(summary_df, main_df, percentage_df, figures):
+    # Data props for the skeleton's tables and graphs
+    tables = [table_props(summary_df), table_props(main_df, paged=PAGED_TABLES)]
+    tables.append(None if percentage_df is None else table_props(percentage_df, paged=PAGED_TABLES))
+    current_timer().mark('tables')
+    return {'message': None, 'tables': tables, 'figures': figures}
+
+
+# Computes everything a view shows for the current filters
+@instrument_callback(metrics_registry, lambda view, *filters: view)
+@memoize_callback(result_cache, lambda: data.version)
+def update_display(view, selected_areas, selected_developers, selected_asset_types, date_range):
+    # Read the dataset once so the whole call sees a single consistent version
+    current = data
+    timer = current_timer()
+    start, end = date_range
+
+    def units_by(by):
+        # Filtered, grouped unit totals from the dataset's query backend
+        return current.backend.units_by(by, selected_areas, selected_developers, selected_asset_types, start, end)
 
     # Handle different views
     if view == 'QUARTERLY':
-        total_units_df = filtered_df.groupby(['Year', 'Quarter']).agg({'Total no. of units': 'sum'}).reset_index()
+        total_units_df = units_by(['Year', 'Quarter'])
+        timer.mark('aggregate')
+        timer.rows = len(total_units_df)
         if total_units_df.empty:
-            return html.Div('No data available for the selected filters.')
+            return NO_DATA
 
         total_units_df['Quarter'] = 'Q' + total_units_df['Quarter'].astype(str)
         total_units_df['YearQuarter'] = total_units_df['Year'].astype(str) + ' ' + total_units_df['Quarter']
@@ -175,188 +462,63 @@ def update_display(view, selected_areas, selected_developers, selected_asset_typ
 
         summary_df = pd.DataFrame(summary_data)
 
-        # Generate the summary table
-        summary_table = dash_table.DataTable(
-            data=summary_df.to_dict('records'),
-            columns=[{"name": i, "id": i} for i in summary_df.columns],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '50%'},
-            style_cell={
-                'textAlign': 'left',
-                'padding': '10px',
-                'fontSize': '14px',
-                'fontFamily': 'Arial',
-            },
-            style_header={
-                'backgroundColor': '#ffc107',
-                'fontWeight': 'bold',
-                'color': 'black',
-                'textAlign': 'center'
-            },
-            fixed_rows={'headers': True},
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
-
-        # Generate the main table
-        main_table = dash_table.DataTable(
-            data=pivot_total_units_df.to_dict('records'),
-            columns=[{"name": str(i), "id": str(i)} for i in pivot_total_units_df.columns],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%'},
-            style_cell={
-                'textAlign': 'center',
-                'padding': '10px',
-                'fontSize': '14px',
-                'fontFamily': 'Arial',
-            },
-            style_header={
-                'backgroundColor': '#17a2b8',
-                'fontWeight': 'bold',
-                'color': 'white',
-                'textAlign': 'center'
-            },
-            fixed_rows={'headers': True},
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
-
-        # Generate the percentage table
-        percentage_table = dash_table.DataTable(
-            data=pivot_total_units_df_percentage.to_dict('records'),
-            columns=[{"name": str(i), "id": str(i)} for i in pivot_total_units_df_percentage.columns],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%', 'marginTop': '20px'},
-            style_cell={
-                'textAlign': 'center',
-                'padding': '10px',
-                'fontSize': '14px',
-                'fontFamily': 'Arial',
-            },
-            style_header={
-                'backgroundColor': '#28a745',
-                'fontWeight': 'bold',
-                'color': 'white',
-                'textAlign': 'center'
-            },
-            fixed_rows={'headers': True},
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
+        timer.mark('pivot')
 
         # Update graphs for readability
-        line_fig = px.line(total_units_df, x='YearQuarter', y='Total no. of units',
-                           title='Total Units by Quarter (Line Chart)', markers=True)
-        line_fig.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year-Quarter',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=400,
-            margin=dict(l=40, r=40, t=40, b=120)
-        )
-
-        bar_fig = px.bar(total_units_df, x='YearQuarter', y='Total no. of units',
-                         title='Total Units by Quarter (Bar Chart)')
-        bar_fig.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year-Quarter',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=400,
-            margin=dict(l=40, r=40, t=40, b=120)
-        )
-
-        # Replace heatmap with area chart
-        area_fig = px.area(total_units_df, x='YearQuarter', y='Total no. of units',
-                           title='Total Units by Quarter (Area Chart)')
-        area_fig.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year-Quarter',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=400,
-            margin=dict(l=40, r=40, t=40, b=120)
-        )
-
-        return [
-            dbc.Card(dbc.CardBody([
-                html.H4("Data Summary", className='card-title'),
-                summary_table,
-            ]), className='mb-4'),
-            dbc.Card(dbc.CardBody([
-                html.H4("Total Units Table", className='card-title'),
-                main_table,
-                html.H4("Percentage Table", className='card-title mt-4'),
-                percentage_table
-            ]), className='mb-4'),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=line_fig), md=4),
-                dbc.Col(dcc.Graph(figure=bar_fig), md=4),
-                dbc.Col(dcc.Graph(figure=area_fig), md=4)
-            ])
-        ]
+        layout = units_layout('Year-Quarter', height=400, bottom=120)
+        figures = build_components([
+            (chart_figure, ('line', total_units_df, dict(x='YearQuarter', y='Total no. of units',
+                                                         title='Total Units by Quarter (Line Chart)', markers=True), layout)),
+            (chart_figure, ('bar', total_units_df, dict(x='YearQuarter', y='Total no. of units',
+                                                        title='Total Units by Quarter (Bar Chart)'), layout)),
+            # Replace heatmap with area chart
+            (chart_figure, ('area', total_units_df, dict(x='YearQuarter', y='Total no. of units',
+                                                         title='Total Units by Quarter (Area Chart)'), layout)),
+        ])
+
+        timer.mark('figures')
+        return view_result(summary_df, pivot_total_units_df, pivot_total_units_df_percentage, figures)
 
     elif view == 'DEVELOPER':
-        dev_units_df = filtered_df.groupby(['Developer Name']).agg({'Total no. of units': 'sum'}).reset_index()
-        if dev_units_df.empty:
-            return html.Div('No data available for the selected filters.')
+        # Top 20 developers by partial selection, never sorting the rest
+        ranking = current.backend.developer_ranking(20, selected_areas, selected_developers, selected_asset_types,
+                                                    start, end)
+        timer.mark('aggregate')
+        timer.rows = ranking.count if ranking.count is not None else len(ranking.top)
+        if ranking.top.empty:
+            return NO_DATA
 
-        total_units_dev = dev_units_df['Total no. of units'].sum()
-        # Sort developers by total units
-        dev_units_df = dev_units_df.sort_values(by='Total no. of units', ascending=False)
+        total_units_dev = ranking.total
+        top_dev_units_df = ranking.top.copy()
 
         # Calculate summary statistics
         total_units = total_units_dev
-        total_developers = dev_units_df.shape[0]
-        total_units_top20 = dev_units_df.head(20)['Total no. of units'].sum()
+        total_developers = ranking.count if ranking.count is not None else 'n/a'
+        total_units_top20 = top_dev_units_df['Total no. of units'].sum()
         percentage_top20 = (total_units_top20 / total_units) * 100
 
-        max_units_row = dev_units_df.iloc[0]
+        max_units_row = top_dev_units_df.iloc[0]
         max_units_dev = max_units_row['Developer Name']
         max_units_value = max_units_row['Total no. of units']
-        min_units_row = dev_units_df[dev_units_df['Total no. of units'] > 0].iloc[-1]
-        min_units_dev = min_units_row['Developer Name']
-        min_units_value = min_units_row['Total no. of units']
+        min_units_dev, min_units_value = ranking.minimum if ranking.minimum is not None else ('n/a', 'n/a')
 
         summary_data = {
             'Metric': ['Total Units', 'Total Developers', 'Total Units (Top 20 Developers)', 'Percentage of Units (Top 20 Developers)', 'Developer with Max Units', 'Max Units', 'Developer with Min Units', 'Min Units'],
             'Value': [total_units, total_developers, total_units_top20, f"{percentage_top20:.2f}%", max_units_dev, max_units_value, min_units_dev, min_units_value]
         }
+        if ranking.error:
+            # Approximate ranking (too many developers to count exactly): the
+            # top developers' units may be up to this much below their totals
+            summary_data['Metric'].append('Max Undercount (Units)')
+            summary_data['Value'].append(round(ranking.error, 2))
 
         summary_df = pd.DataFrame(summary_data)
 
-        # Generate the summary table
-        summary_table = dash_table.DataTable(
-            data=summary_df.to_dict('records'),
-            columns=[{"name": i, "id": i} for i in summary_df.columns],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '60%'},
-            style_cell={
-                'textAlign': 'left',
-                'padding': '10px',
-                'fontSize': '14px',
-                'fontFamily': 'Arial',
-            },
-            style_header={
-                'backgroundColor': '#ffc107',
-                'fontWeight': 'bold',
-                'color': 'black',
-                'textAlign': 'center'
-            },
-            fixed_rows={'headers': True},
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
-
         # Calculate percentage over total units
-        dev_units_df['Percentage'] = (dev_units_df['Total no. of units'] / total_units_dev * 100).round(2)
-
-        # Select top 20 developers
-        top_dev_units_df = dev_units_df.head(20).copy()
+        top_dev_units_df['Percentage'] = (top_dev_units_df['Total no. of units'] / total_units_dev * 100).round(2)
 
         # Compute total units for other developers
-        other_dev_units = total_units_dev - top_dev_units_df['Total no. of units'].sum()
+        other_dev_units = ranking.remainder
         other_dev_percentage = (other_dev_units / total_units_dev * 100).round(2)
         other_dev_df = pd.DataFrame({
             'Developer Name': ['Other Developers'],
@@ -367,96 +529,30 @@ def update_display(view, selected_areas, selected_developers, selected_asset_typ
         # Append 'Other Developers' to the top_dev_units_df
         top_dev_units_df = pd.concat([top_dev_units_df, other_dev_df], ignore_index=True)
 
-        # Generate the main table with top 20 developers and 'Other Developers'
-        main_table = dash_table.DataTable(
-            data=top_dev_units_df.to_dict('records'),
-            columns=[{"name": i, "id": i} for i in top_dev_units_df.columns],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%'},
-            style_cell={
-                'textAlign': 'center',
-                'padding': '10px',
-                'fontSize': '12px',
-                'fontFamily': 'Arial',
-                'height': 'auto',
-                'whiteSpace': 'normal',
-            },
-            style_header={
-                'backgroundColor': '#17a2b8',
-                'fontWeight': 'bold',
-                'color': 'white',
-                'textAlign': 'center'
-            },
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
-
-        # Create dual-axis chart for total units and percentage for top 20 developers + 'Other Developers'
-        fig_dev = make_subplots(specs=[[{"secondary_y": True}]])
-
-        fig_dev.add_trace(
-            go.Bar(x=top_dev_units_df['Developer Name'], y=top_dev_units_df['Total no. of units'], name='Total Units'),
-            secondary_y=False,
-        )
+        timer.mark('pivot')
 
-        fig_dev.add_trace(
-            go.Scatter(x=top_dev_units_df['Developer Name'], y=top_dev_units_df['Percentage'], name='Percentage (%)', mode='lines+markers'),
-            secondary_y=True,
-        )
-
-        fig_dev.update_layout(
-            title_text="Developers Total Units and Percentage",
-            xaxis_tickangle=-45,
-            xaxis_title='Developer Name',
-            font=dict(size=12),
-            height=600,
-            margin=dict(l=40, r=40, t=40, b=200),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-
-        fig_dev.update_yaxes(title_text='Total Units', secondary_y=False)
-        fig_dev.update_yaxes(title_text='Percentage (%)', secondary_y=True)
-        fig_dev.update_xaxes(tickangle=45)
-
-        # Additional charts: Pie chart and Horizontal bar chart
-        pie_fig_dev = px.pie(top_dev_units_df, values='Total no. of units', names='Developer Name',
-                             title='Developers Share (Pie Chart)')
-        pie_fig_dev.update_layout(
-            font=dict(size=12),
-            height=500,
-            margin=dict(l=40, r=40, t=40, b=80)
-        )
-
-        hbar_fig_dev = px.bar(top_dev_units_df, x='Total no. of units', y='Developer Name', orientation='h',
-                              title='Developers Total Units (Horizontal Bar Chart)')
-        hbar_fig_dev.update_layout(
-            font=dict(size=12),
-            height=600,
-            margin=dict(l=120, r=40, t=40, b=80)
-        )
+        # Dual-axis chart for the top 20 developers + 'Other Developers', plus a
+        # horizontal bar chart and a pie chart
+        figures = build_components([
+            (developer_units_figure, (top_dev_units_df,)),
+            (chart_figure, ('bar', top_dev_units_df, dict(x='Total no. of units', y='Developer Name', orientation='h',
+                                                          title='Developers Total Units (Horizontal Bar Chart)'),
+                            panel_layout(600, left=120))),
+            (chart_figure, ('pie', top_dev_units_df, dict(values='Total no. of units', names='Developer Name',
+                                                          title='Developers Share (Pie Chart)'),
+                            panel_layout(500))),
+        ])
 
-        return [
-            dbc.Card(dbc.CardBody([
-                html.H4("Data Summary", className='card-title'),
-                summary_table,
-            ]), className='mb-4'),
-            dbc.Card(dbc.CardBody([
-                html.H4("Developers Total Units and Percentage", className='card-title'),
-                main_table,
-            ]), className='mb-4'),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=fig_dev), md=12)
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=hbar_fig_dev), md=6),
-                dbc.Col(dcc.Graph(figure=pie_fig_dev), md=6)
-            ])
-        ]
+        timer.mark('figures')
+        return view_result(summary_df, top_dev_units_df, None, figures)
 
     elif view == 'AREA_QUARTERLY':
-        area_units_df = filtered_df.groupby(['Area', 'YearQuarter']).agg({'Total no. of units': 'sum'}).reset_index()
+        area_units_df = units_by(['Area', 'QuarterOrdinal'])
+        timer.mark('aggregate')
+        timer.rows = len(area_units_df)
         if area_units_df.empty:
-            return html.Div('No data available for the selected filters.')
+            return NO_DATA
+        area_units_df['YearQuarter'] = quarter_labels(area_units_df['QuarterOrdinal'])
 
         # Pivot and calculate percentages
         pivot_area_df = area_units_df.pivot(index='Area', columns='YearQuarter', values='Total no. of units').fillna(0)
@@ -483,136 +579,29 @@ def update_display(view, selected_areas, selected_developers, selected_asset_typ
 
         summary_df = pd.DataFrame(summary_data)
 
-        # Generate the summary table
-        summary_table = dash_table.DataTable(
-            data=summary_df.to_dict('records'),
-            columns=[{"name": i, "id": i} for i in summary_df.columns],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '50%'},
-            style_cell={
-                'textAlign': 'left',
-                'padding': '10px',
-                'fontSize': '14px',
-                'fontFamily': 'Arial',
-            },
-            style_header={
-                'backgroundColor': '#ffc107',
-                'fontWeight': 'bold',
-                'color': 'black',
-                'textAlign': 'center'
-            },
-            fixed_rows={'headers': True},
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
-
-        # Generate the main table
-        main_table = dash_table.DataTable(
-            data=pivot_area_df.reset_index().to_dict('records'),
-            columns=[{"name": i, "id": i} for i in ['Area'] + list(pivot_area_df.columns)],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%'},
-            style_cell={
-                'textAlign': 'center',
-                'padding': '5px',
-                'fontSize': '12px',
-                'fontFamily': 'Arial',
-                'height': 'auto',
-                'whiteSpace': 'normal',
-            },
-            style_header={
-                'backgroundColor': '#17a2b8',
-                'fontWeight': 'bold',
-                'color': 'white',
-                'textAlign': 'center'
-            },
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
-
-        # Generate the percentage table
-        percentage_table = dash_table.DataTable(
-            data=pivot_area_df_percentage.reset_index().to_dict('records'),
-            columns=[{"name": i, "id": i} for i in ['Area'] + list(pivot_area_df_percentage.columns)],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%', 'marginTop': '20px'},
-            style_cell={
-                'textAlign': 'center',
-                'padding': '5px',
-                'fontSize': '12px',
-                'fontFamily': 'Arial',
-                'height': 'auto',
-                'whiteSpace': 'normal',
-            },
-            style_header={
-                'backgroundColor': '#28a745',
-                'fontWeight': 'bold',
-                'color': 'white',
-                'textAlign': 'center'
-            },
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
+        timer.mark('pivot')
 
         # Update graphs for readability
-        bar_fig_area = px.bar(area_units_df, x='YearQuarter', y='Total no. of units', color='Area',
-                              title='Units Launched in Area by Quarter (Stacked Bar)')
-        bar_fig_area.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year-Quarter',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=500,
-            margin=dict(l=40, r=40, t=40, b=120)
-        )
-
-        # Additional charts: Line chart and Area chart
-        line_fig_area = px.line(area_units_df, x='YearQuarter', y='Total no. of units', color='Area',
-                                title='Units Launched in Area by Quarter (Line Chart)', markers=True)
-        line_fig_area.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year-Quarter',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=500,
-            margin=dict(l=40, r=40, t=40, b=120)
-        )
-
-        area_fig_area = px.area(area_units_df, x='YearQuarter', y='Total no. of units', color='Area',
-                                title='Units Launched in Area by Quarter (Area Chart)')
-        area_fig_area.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year-Quarter',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=500,
-            margin=dict(l=40, r=40, t=40, b=120)
-        )
-
-        return [
-            dbc.Card(dbc.CardBody([
-                html.H4("Data Summary", className='card-title'),
-                summary_table,
-            ]), className='mb-4'),
-            dbc.Card(dbc.CardBody([
-                html.H4("Units Launched by Area", className='card-title'),
-                main_table,
-                html.H4("Percentage Contribution", className='card-title mt-4'),
-                percentage_table
-            ]), className='mb-4'),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=bar_fig_area), md=12)
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=line_fig_area), md=6),
-                dbc.Col(dcc.Graph(figure=area_fig_area), md=6)
-            ])
-        ]
+        layout = units_layout('Year-Quarter', height=500, bottom=120)
+        figures = build_components([
+            (chart_figure, ('bar', area_units_df, dict(x='YearQuarter', y='Total no. of units', color='Area',
+                                                       title='Units Launched in Area by Quarter (Stacked Bar)'), layout)),
+            # Additional charts: Line chart and Area chart
+            (chart_figure, ('line', area_units_df, dict(x='YearQuarter', y='Total no. of units', color='Area',
+                                                        title='Units Launched in Area by Quarter (Line Chart)', markers=True), layout)),
+            (chart_figure, ('area', area_units_df, dict(x='YearQuarter', y='Total no. of units', color='Area',
+                                                        title='Units Launched in Area by Quarter (Area Chart)'), layout)),
+        ])
+
+        timer.mark('figures')
+        return view_result(summary_df, pivot_area_df.reset_index(), pivot_area_df_percentage.reset_index(), figures)
 
     elif view == 'ASSET_YEARLY':
-        asset_units_df = filtered_df.groupby(['Asset Type', 'Year']).agg({'Total no. of units': 'sum'}).reset_index()
+        asset_units_df = units_by(['Asset Type', 'Year'])
+        timer.mark('aggregate')
+        timer.rows = len(asset_units_df)
         if asset_units_df.empty:
-            return html.Div('No data available for the selected filters.')
+            return NO_DATA
 
         # Pivot and calculate percentages
         pivot_asset_df = asset_units_df.pivot(index='Asset Type', columns='Year', values='Total no. of units').fillna(0)
@@ -639,133 +628,276 @@ def update_display(view, selected_areas, selected_developers, selected_asset_typ
 
         summary_df = pd.DataFrame(summary_data)
 
-        # Generate the summary table
-        summary_table = dash_table.DataTable(
-            data=summary_df.to_dict('records'),
-            columns=[{"name": i, "id": i} for i in summary_df.columns],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '50%'},
-            style_cell={
-                'textAlign': 'left',
-                'padding': '10px',
-                'fontSize': '14px',
-                'fontFamily': 'Arial',
-            },
-            style_header={
-                'backgroundColor': '#ffc107',
-                'fontWeight': 'bold',
-                'color': 'black',
-                'textAlign': 'center'
-            },
-            fixed_rows={'headers': True},
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
+        timer.mark('pivot')
 
-        # Generate the main table
-        main_table = dash_table.DataTable(
-            data=pivot_asset_df.reset_index().to_dict('records'),
-            columns=[{"name": str(i), "id": str(i)} for i in ['Asset Type'] + list(pivot_asset_df.columns)],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%'},
-            style_cell={
-                'textAlign': 'center',
-                'padding': '5px',
-                'fontSize': '12px',
-                'fontFamily': 'Arial',
-                'height': 'auto',
-            },
-            style_header={
-                'backgroundColor': '#17a2b8',
-                'fontWeight': 'bold',
-                'color': 'white',
-                'textAlign': 'center'
-            },
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
+        # Update graphs for readability
+        layout = units_layout('Year', height=500, bottom=80)
+        figures = build_components([
+            (chart_figure, ('bar', asset_units_df, dict(x='Year', y='Total no. of units', color='Asset Type',
+                                                        title='Asset Type Launched Year-wise (Stacked Bar)'), layout)),
+            # Additional charts: Line chart and Area chart
+            (chart_figure, ('line', asset_units_df, dict(x='Year', y='Total no. of units', color='Asset Type',
+                                                         title='Asset Type Launched Year-wise (Line Chart)', markers=True), layout)),
+            (chart_figure, ('area', asset_units_df, dict(x='Year', y='Total no. of units', color='Asset Type',
+                                                         title='Asset Type Launched Year-wise (Area Chart)'), layout)),
+        ])
+
+        timer.mark('figures')
+        return view_result(summary_df, pivot_asset_df.reset_index(), pivot_asset_df_percentage.reset_index(), figures)
 
-        # Generate the percentage table
-        percentage_table = dash_table.DataTable(
-            data=pivot_asset_df_percentage.reset_index().to_dict('records'),
-            columns=[{"name": str(i), "id": str(i)} for i in ['Asset Type'] + list(pivot_asset_df_percentage.columns)],
-            style_table={'overflowX': 'auto', 'border': '1px solid #ccc', 'width': '100%', 'marginTop': '20px'},
-            style_cell={
-                'textAlign': 'center',
-                'padding': '5px',
-                'fontSize': '12px',
-                'fontFamily': 'Arial',
-                'height': 'auto',
-            },
-            style_header={
-                'backgroundColor': '#28a745',
-                'fontWeight': 'bold',
-                'color': 'white',
-                'textAlign': 'center'
-            },
-            sort_action='native',
-            page_action='none',
-            editable=False
-        )
+    else:
+        return {'message': 'Select a valid graph type'}
 
-        # Update graphs for readability
-        bar_fig_asset = px.bar(asset_units_df, x='Year', y='Total no. of units', color='Asset Type',
-                               title='Asset Type Launched Year-wise (Stacked Bar)')
-        bar_fig_asset.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=500,
-            margin=dict(l=40, r=40, t=40, b=80)
-        )
+# Trace properties that carry the data; the rest only changes with the trace layout
+PATCHED_TRACE_PROPS = ['x', 'y', 'labels', 'values', 'text', 'customdata']
 
-        # Additional charts: Line chart and Area chart
-        line_fig_asset = px.line(asset_units_df, x='Year', y='Total no. of units', color='Asset Type',
-                                 title='Asset Type Launched Year-wise (Line Chart)', markers=True)
-        line_fig_asset.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=500,
-            margin=dict(l=40, r=40, t=40, b=80)
-        )
 
-        area_fig_asset = px.area(asset_units_df, x='Year', y='Total no. of units', color='Asset Type',
-                                 title='Asset Type Launched Year-wise (Area Chart)')
-        area_fig_asset.update_layout(
-            xaxis_tickangle=-45,
-            xaxis_title='Year',
-            yaxis_title='Total Units',
-            font=dict(size=12),
-            height=500,
-            margin=dict(l=40, r=40, t=40, b=80)
+def figure_signature(figure):
+    # Trace layout, and whether the x axis pins its categories (decimated traces)
+    pinned = 'categoryarray' in figure['layout'].get('xaxis', {})
+    return [[trace.get('type'), trace.get('name'), sorted(trace)] for trace in figure['data']] + [pinned]
+
+
+def figure_update(figure, signature, shown):
+    # A figure whose traces match what the browser already shows only needs its
+    # data arrays; anything else is sent whole
+    if signature != shown:
+        return figure
+    patch = Patch()
+    for i, trace in enumerate(figure['data']):
+        for prop in PATCHED_TRACE_PROPS:
+            if prop in trace:
+                patch['data'][i][prop] = trace[prop]
+    if signature[-1]:
+        patch['layout']['xaxis']['categoryarray'] = figure['layout']['xaxis']['categoryarray']
+    return patch
+
+
+# Switching views swaps the skeleton; its new view-state store triggers refresh_view
+@app.callback(
+    Output('display-container', 'children'),
+    [Input('graph-view-dropdown', 'value')],
+    prevent_initial_call=True
+)
+def render_view(view):
+    return view_skeleton(view)
+
+
+# update_display's phases on a full computation, the steps of its job progress
+VIEW_PHASES = ['filter', 'aggregate', 'pivot', 'figures', 'tables']
+
+
+# What refresh_view fills: one output per table and figure
+REFRESH_OUTPUTS = (
+    [('view-message', 'children'), ('view-body', 'style'), ('summary-table', 'data')]
+    + [(table_id, 'columns') for table_id in TABLE_IDS]
+    + [(table_id, 'page_current') for table_id in TABLE_IDS[1:]]
+    + [(figure_id, 'figure') for figure_id in FIGURE_IDS]
+    + [('view-signature', 'data')]
+)
+FILTER_INPUTS = [
+    Input('area-filter-dropdown', 'value'),
+    Input('developer-filter-dropdown', 'value'),
+    Input('asset-type-dropdown', 'value'),
+    Input('date-range-slider', 'value'),
+]
+
+
+# Callback to update display. With background jobs on, renders too large for
+# the request thread are handed to refresh_view_job through the view-job store
+@callback_when(
+    not CLIENTSIDE_FILTERING,
+    [Output(component_id, prop) for component_id, prop in REFRESH_OUTPUTS]
+    + ([Output('view-job', 'data')] if jobs is not None else []),
+    [Input('view-state', 'data')] + FILTER_INPUTS,
+    [State('view-signature', 'data')]
+)
+@marks_output
+def refresh_view(view_state, selected_areas, selected_developers, selected_asset_types, date_range, signature):
+    request = [view_state, selected_areas, selected_developers, selected_asset_types, date_range]
+    if jobs is None:
+        return view_outputs(*request, signature)
+    start, end = date_range
+    cached = update_display.is_cached(view_state['view'], selected_areas, selected_developers,
+                                      selected_asset_types, date_range)
+    if runs_as_job(jobs, data.backend.rows_scanned(start, end), cached):
+        # The outputs keep showing the previous render until the job is done
+        return [no_update] * len(REFRESH_OUTPUTS) + [request]
+    return view_outputs(*request, signature) + [no_update]
+
+
+@callback_when(
+    not CLIENTSIDE_FILTERING and jobs is not None,
+    [Output(component_id, prop, allow_duplicate=True) for component_id, prop in REFRESH_OUTPUTS],
+    [Input('view-job', 'data')],
+    [State('view-signature', 'data')],
+    prevent_initial_call=True,
+    **job_options(
+        jobs,
+        progress=[Output('view-progress', 'value'), Output('view-progress', 'max'), Output('view-progress', 'label')],
+        running=[(Output('view-progress', 'style'), {}, {'display': 'none'})],
+        # A newer selection answered on the request thread must not be overwritten
+        cancel=[Input('view-state', 'data')] + FILTER_INPUTS
+    )
+)
+@reporting_progress(jobs, lambda *args: len(VIEW_PHASES), lambda done, total: f'{100 * done // total}%')
+def refresh_view_job(request, signature):
+    return view_outputs(*request, signature)
+
+
+def view_outputs(view_state, selected_areas, selected_developers, selected_asset_types, date_range, signature):
+    # REFRESH_OUTPUTS for a selection: only what changed from the browser's signature
+    result = update_display(view_state['view'], selected_areas, selected_developers, selected_asset_types, date_range)
+    if result['message'] is not None:
+        unchanged = [no_update] * (2 * len(TABLE_IDS) + len(FIGURE_IDS))
+        return [result['message'], {'display': 'none'}] + unchanged + [None]
+
+    signature = signature or {}
+    shown_columns = signature.get('columns') or [None] * len(TABLE_IDS)
+    shown_figures = signature.get('figures') or [None] * len(FIGURE_IDS)
+    tables = result['tables']
+    # Dense traces go out as WebGL and decimated; zooming re-fetches them
+    figures = [prepare_figure(figure) for figure in result['figures']]
+
+    view_columns = [
+        no_update if table is None or table['columns'] == shown else table['columns']
+        for table, shown in zip(tables, shown_columns)
+    ]
+    # Round-tripped through JSON so it compares equal to what the store sends back
+    signature = json.loads(json.dumps({
+        'columns': [None if table is None else table['columns'] for table in tables],
+        'figures': [figure_signature(figure) for figure in figures],
+    }, cls=plotly.utils.PlotlyJSONEncoder))
+    figure_updates = [
+        figure_update(figure, new, shown)
+        for figure, new, shown in zip(figures, signature['figures'], shown_figures)
+    ]
+    # New filters start the paged tables from their first page
+    first_pages = [0] * (len(TABLE_IDS) - 1)
+    return [None, None, tables[0]['data']] + view_columns + first_pages + figure_updates + [signature]
+
+
+# Rows of one paged table: the visible page of the view's full table after the
+# table's own filter and sort, taken from the memoized view result
+@callback_when(
+    PAGED_TABLES,
+    [Output(paged_table_id(MATCH), 'data'),
+     Output(paged_table_id(MATCH), 'page_count')],
+    [Input('view-state', 'data'),
+     Input('area-filter-dropdown', 'value'),
+     Input('developer-filter-dropdown', 'value'),
+     Input('asset-type-dropdown', 'value'),
+     Input('date-range-slider', 'value'),
+     Input(paged_table_id(MATCH), 'page_current'),
+     Input(paged_table_id(MATCH), 'page_size'),
+     Input(paged_table_id(MATCH), 'sort_by'),
+     Input(paged_table_id(MATCH), 'filter_query')],
+    [State(paged_table_id(MATCH), 'id')]
+)
+@instrument_callback(metrics_registry, lambda view_state, *args: view_state['view'])
+def page_table(view_state, selected_areas, selected_developers, selected_asset_types, date_range,
+               page_current, page_size, sort_by, filter_query, table_id):
+    if jobs is not None and not {'page_current', 'page_size', 'sort_by', 'filter_query'} & {
+            prop_id.rsplit('.', 1)[-1] for prop_id in dash.callback_context.triggered_prop_ids}:
+        # The view's job is computing it; resetting page_current when it is done
+        # brings this callback back for the result
+        raise PreventUpdate
+    # The memoized layer only, so a miss is timed as part of this callback
+    result = update_display.__wrapped__(
+        view_state['view'], selected_areas, selected_developers, selected_asset_types, date_range
+    )
+    if result['message'] is not None:
+        raise PreventUpdate
+    table = result['tables'][TABLE_IDS.index(table_id)]
+    if table is None:
+        return [], 1
+    rows, page_count = table_page(table['frame'], page_current, page_size, sort_by, filter_query)
+    current_timer().mark('page')
+    return rows, page_count
+
+
+# Clientside filtering: the browser rolls up the cube for filter and range
+# changes, and sets view-request for what the cube can't answer
+DISPLAY_OUTPUTS = (
+    [('view-message', 'children'), ('view-body', 'style')]
+    + [(table_id, 'data') for table_id in TABLE_IDS]
+    + [(table_id, 'columns') for table_id in TABLE_IDS]
+    + [(figure_id, 'figure') for figure_id in FIGURE_IDS]
+)
+
+if CLIENTSIDE_FILTERING:
+    app.clientside_callback(
+        ClientsideFunction(namespace='cube', function_name='render'),
+        [Output(component_id, prop) for component_id, prop in DISPLAY_OUTPUTS]
+        + [Output('view-request', 'data')],
+        [Input('view-state', 'data'),
+         Input('area-filter-dropdown', 'value'),
+         Input('developer-filter-dropdown', 'value'),
+         Input('asset-type-dropdown', 'value'),
+         Input('date-range-slider', 'value'),
+         Input('cube-store', 'data')],
+        [State(figure_id, 'figure') for figure_id in FIGURE_IDS]
+        + [State('view-request', 'data')]
+    )
+
+
+# Server side of the clientside mode: whole tables and figures for a request
+@callback_when(
+    CLIENTSIDE_FILTERING,
+    [Output(component_id, prop, allow_duplicate=True) for component_id, prop in DISPLAY_OUTPUTS],
+    [Input('view-request', 'data')],
+    prevent_initial_call=True
+)
+@marks_output
+def answer_view_request(request):
+    if not request:
+        raise PreventUpdate
+    result = update_display(request['view'], request['areas'], request['developers'],
+                            request['asset_types'], request['date_range'])
+    if result['message'] is not None:
+        return [result['message'], {'display': 'none'}] + [no_update] * (2 * len(TABLE_IDS) + len(FIGURE_IDS))
+    tables = result['tables']
+    return ([None, None]
+            + [no_update if table is None else table['data'] for table in tables]
+            + [no_update if table is None else table['columns'] for table in tables]
+            + [prepare_figure(figure) for figure in result['figures']])
+
+
+def zoom_callback(figure_id, index):
+    # Re-fetch a figure's dense traces at the resolution of the zoomed x range
+    @app.callback(
+        Output(figure_id, 'figure', allow_duplicate=True),
+        [Input(figure_id, 'relayoutData')],
+        [State('view-state', 'data'),
+         State('area-filter-dropdown', 'value'),
+         State('developer-filter-dropdown', 'value'),
+         State('asset-type-dropdown', 'value'),
+         State('date-range-slider', 'value')],
+        prevent_initial_call=True
+    )
+    @instrument_callback(metrics_registry, lambda relayout, view_state, *filters: view_state['view'])
+    def refine_figure(relayout, view_state, selected_areas, selected_developers, selected_asset_types, date_range):
+        # Autosize, legend and drag-mode events leave the x axis alone; nothing to compute
+        handled, _ = zoom_window(relayout)
+        if not handled:
+            raise PreventUpdate
+        result = update_display.__wrapped__(
+            view_state['view'], selected_areas, selected_developers, selected_asset_types, date_range
         )
+        if result['message'] is not None:
+            raise PreventUpdate
+        patch = zoom_patch(result['figures'][index], relayout)
+        if patch is None:
+            raise PreventUpdate
+        return patch
+    return refine_figure
 
-        return [
-            dbc.Card(dbc.CardBody([
-                html.H4("Data Summary", className='card-title'),
-                summary_table,
-            ]), className='mb-4'),
-            dbc.Card(dbc.CardBody([
-                html.H4("Units Launched by Asset Type", className='card-title'),
-                main_table,
-                html.H4("Percentage Contribution", className='card-title mt-4'),
-                percentage_table
-            ]), className='mb-4'),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=bar_fig_asset), md=12)
-            ]),
-            dbc.Row([
-                dbc.Col(dcc.Graph(figure=line_fig_asset), md=6),
-                dbc.Col(dcc.Graph(figure=area_fig_asset), md=6)
-            ])
-        ]
 
-    else:
-        return html.Div('Select a valid graph type')
+for figure_index, figure_id in enumerate(FIGURE_IDS):
+    zoom_callback(figure_id, figure_index)
+
 
 # Run the app
 if __name__ == "__main__":
+    running_as_script()
     app.run_server(host='0.0.0.0', port=10000, debug=True)
@@ -0,0 +1,45 @@
+from figure_dicts import express_figure, figure, merge_layout
+
+# Figure builders for the try.py views. They are module-level functions of
+# plain frames and dicts so component_pool can run them on worker threads or
+# processes, and each returns the figure's plotly JSON, built as dicts from the
+# shared layouts below rather than through plotly's validating objects.
+
+
+def panel_layout(height, bottom=80, left=40):
+    # Font, height and margins every view figure is styled with
+    return {'font': {'size': 12}, 'height': height, 'margin': {'l': left, 'r': 40, 't': 40, 'b': bottom}}
+
+
+def units_layout(x_title, height, bottom):
+    # Total units along time or years: slanted x labels for readability
+    return merge_layout(panel_layout(height, bottom), {
+        'xaxis': {'tickangle': -45, 'title': {'text': x_title}},
+        'yaxis': {'title': {'text': 'Total Units'}},
+    })
+
+
+def chart_figure(kind, frame, options, layout):
+    # A plotly express style chart (line, bar, area or pie) with the view's layout
+    fig = express_figure(kind, frame, **options)
+    return dict(fig, layout=merge_layout(fig['layout'], layout))
+
+
+def developer_units_figure(top_dev_units_df):
+    # Create dual-axis chart for total units and percentage for top 20 developers + 'Other Developers'
+    developers = top_dev_units_df['Developer Name'].to_numpy()
+    data = [
+        {'name': 'Total Units', 'x': developers, 'y': top_dev_units_df['Total no. of units'].to_numpy(),
+         'type': 'bar', 'xaxis': 'x', 'yaxis': 'y'},
+        {'mode': 'lines+markers', 'name': 'Percentage (%)', 'x': developers,
+         'y': top_dev_units_df['Percentage'].to_numpy(), 'type': 'scatter', 'xaxis': 'x', 'yaxis': 'y2'},
+    ]
+    layout = merge_layout(panel_layout(600, bottom=200), {
+        'title': {'text': 'Developers Total Units and Percentage'},
+        # The secondary y axis takes the right-hand edge of the plot area
+        'xaxis': {'anchor': 'y', 'domain': [0.0, 0.94], 'tickangle': 45, 'title': {'text': 'Developer Name'}},
+        'yaxis': {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': 'Total Units'}},
+        'yaxis2': {'anchor': 'x', 'overlaying': 'y', 'side': 'right', 'title': {'text': 'Percentage (%)'}},
+        'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+    })
+    return figure(data, layout)
@@ -0,0 +1,7 @@
+import importlib
+
+# WSGI entry point for production serving: `gunicorn -c gunicorn.conf.py wsgi:server`.
+# try.py can't be imported with a plain import statement (`try` is a keyword).
+dashboard = importlib.import_module('try')
+
+server = dashboard.app.server